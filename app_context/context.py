@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from database import Database
-from services import AIImageService, OCRService, PaymentService
+from services import AIImageService, OCRService, PaymentService, BroadcastService, StyleCatalog
 
 
 @dataclass
@@ -9,3 +9,5 @@ class AppContext:
     ai_service: AIImageService
     ocr_service: OCRService
     payment_service: PaymentService
+    broadcast_service: BroadcastService
+    style_catalog: StyleCatalog
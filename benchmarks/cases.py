@@ -0,0 +1,190 @@
+# benchmarks/cases.py
+"""
+The benchmarked operations. Each `@bench` function sets up its fixtures and
+returns the operation to time: a plain function or a coroutine function,
+called with no arguments. Cheap operations are timed in batches of `batch`
+calls and reported per call.
+"""
+import itertools
+import json
+from datetime import datetime
+from typing import Awaitable, Callable, Dict
+
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from benchmarks import doubles
+from database.memory import MemoryDatabase
+from handlers.admin.dashboard import format_ocr_data
+from handlers.admin.manual_queue import render_manual_task_caption
+from handlers.admin.payments import render_payment_caption
+from handlers.user.handlers import build_style_card_keyboard, photo_received, start_command
+from keyboards.inline import get_language_keyboard, get_packages_keyboard
+from keyboards.reply import get_main_menu_keyboard
+from middlewares.throttling_middleware import ThrottlingMiddleware
+from services.ocr import parse_payment_text
+from states import UserStates
+from utils.helpers import get_text
+
+BENCHMARKS: Dict[str, Callable[[], Awaitable[Callable]]] = {}
+# calls per timed op for (sub-)microsecond cases, so loop overhead and timer jitter stay small next to the work
+BATCHES: Dict[str, int] = {}
+
+
+def bench(name: str, batch: int = 1):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        BATCHES[name] = batch
+        return setup
+    return register
+
+
+OCR_TEXT = (
+    "Telebirr\nPayment successful\nTransaction: CX7Y0QK2LM\nFrom: Abebe Kebede\n"
+    "To: Flexa AI\nAmount 150.00 Birr\nService fee 0 Birr\nDate 2026-10-19 10:42\n"
+) * 3
+
+
+# --- reference: pure-Python work used to scale baselines between machines ---
+@bench("reference")
+async def reference():
+    def op():
+        total = 0
+        for i in range(200):
+            total += i * i % 7
+        return total
+    return op
+
+
+# --- i18n ---
+@bench("get_text.plain", batch=100)
+async def get_text_plain():
+    return lambda: get_text("processing", "am")
+
+
+@bench("get_text.format", batch=100)
+async def get_text_format():
+    return lambda: get_text("main_menu", "en", balance=12)
+
+
+# --- keyboards ---
+@bench("keyboard.main_menu", batch=100)
+async def keyboard_main_menu():
+    return lambda: get_main_menu_keyboard("am")
+
+
+@bench("keyboard.packages", batch=100)
+async def keyboard_packages():
+    return lambda: get_packages_keyboard("en")
+
+
+@bench("keyboard.language", batch=100)
+async def keyboard_language():
+    return get_language_keyboard
+
+
+@bench("keyboard.style_card")
+async def keyboard_style_card():
+    index = itertools.cycle(range(10))
+    return lambda: build_style_card_keyboard("5f0c2a43-8d1e-4f7a-9a55-0d2b7c1e9f10", next(index), 10, "en")
+
+
+# --- admin captions ---
+@bench("caption.manual_task")
+async def caption_manual_task():
+    task = {
+        "id": "5f0c2a43", "user_id": 412345678, "first_name": "Abebe", "username": "abebe",
+        "style_name": "Studio Portrait", "status": "manual_queue", "created_at": datetime(2026, 10, 19, 10, 42),
+        "credits_spent": 2, "prompt_template": "Professional studio portrait, soft key light, neutral grey "
+                                                "background, sharp focus on the eyes, natural skin texture " * 3,
+    }
+    return lambda: render_manual_task_caption(task, 3, 12)
+
+
+@bench("caption.payment")
+async def caption_payment():
+    payment = {
+        "id": "9a1b", "user_id": 412345678, "first_name": "Abebe", "package_type": "10_images", "amount_birr": 150,
+        "status": "pending", "created_at": datetime(2026, 10, 19, 10, 42),
+        "ocr_data": {**parse_payment_text(OCR_TEXT), "confidence": 0.82},
+    }
+    return lambda: render_payment_caption(payment, 1, 4)
+
+
+@bench("format_ocr_data")
+async def format_ocr():
+    data = json.dumps(parse_payment_text(OCR_TEXT))
+    return lambda: format_ocr_data(data)
+
+
+@bench("ocr.parse_payment_text")
+async def ocr_parse():
+    return lambda: parse_payment_text(OCR_TEXT)
+
+
+# --- middleware ---
+@bench("throttling.allowed", batch=100)
+async def throttling_allowed():
+    bot = doubles.make_bot()
+    # buckets refill almost instantly: every event takes the allowed path (the denied one sleeps)
+    middleware = ThrottlingMiddleware(message_interval=1e-9, callback_interval=1e-9)
+    events = itertools.cycle([doubles.message(bot, 700_000 + i, text="hi") for i in range(1000)])
+
+    async def handler(event, data):
+        return None
+
+    async def op():
+        await middleware(handler, next(events), {})
+    return op
+
+
+# --- handlers ---
+@bench("handler.start_command.new_user")
+async def start_new_user():
+    bot = doubles.make_bot()
+    db = MemoryDatabase()
+    app_context = doubles.make_app_context(db)
+    storage = MemoryStorage()
+    state = doubles.make_state(bot, storage, 800_001)
+    event = doubles.command(bot, 800_001, "/start")
+
+    async def op():
+        await start_command(event, state, app_context)
+    return op
+
+
+@bench("handler.start_command.returning")
+async def start_returning():
+    bot = doubles.make_bot()
+    db = MemoryDatabase()
+    await db.create_user(800_002, "bench", "Bench", "en", 3)
+    app_context = doubles.make_app_context(db)
+    state = doubles.make_state(bot, MemoryStorage(), 800_002)
+    event = doubles.command(bot, 800_002, "/start")
+
+    async def op():
+        await start_command(event, state, app_context)
+    return op
+
+
+@bench("handler.photo_received")
+async def photo_generation():
+    bot = doubles.make_bot()
+    db = MemoryDatabase()
+    await db.create_user(800_003, "bench", "Bench", "en", 10 ** 9)
+    style_id = await db.create_style("Studio", None, None, None, "Professional studio portrait", 1)
+    style = await db.get_style(style_id)
+    style["id"] = str(style["id"])
+    app_context = doubles.make_app_context(db)
+    state = doubles.make_state(bot, MemoryStorage(), 800_003)
+    await state.update_data(selected_style=style)
+    event = doubles.photo(bot, 800_003)
+
+    async def op():
+        await state.set_state(UserStates.uploading_photo)
+        await photo_received(event, state, app_context)
+
+    # the handler logs and swallows errors: make sure the timed path is the successful one
+    await op()
+    if [g["status"] for g in db.generations.values()] != ["completed"]:
+        raise RuntimeError("photo_received did not complete a generation against the doubles")
+    return op
@@ -0,0 +1,116 @@
+# benchmarks/doubles.py
+"""
+In-process stand-ins for handler benchmarks and update replays: a Bot whose
+session answers from loadtest.fake_bot_api without any network (after the
+fake's latency, if set), AI and OCR services with fixed results, and an
+AppContext over MemoryDatabase.
+"""
+import asyncio
+import itertools
+import json
+import random
+from typing import Any, AsyncGenerator, Dict, Optional
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Update
+
+from app_context import AppContext
+from database.memory import MemoryDatabase
+from loadtest.fake_bot_api import FakeBotAPI
+from services.ocr import parse_payment_text
+
+IMAGE = b"\xff\xd8\xff\xe0" + bytes(4096)
+TOKEN = "123456:benchmark"
+RECEIPT_TEXT = "Telebirr\nTransaction: CX7Y0QK2LM\nFrom: Abebe Kebede\nAmount 150.00 Birr\n"
+
+_ids = itertools.count(1)
+
+
+class LocalSession(BaseSession):
+    """Answers Bot API calls with FakeBotAPI results; the response still goes through aiogram's parsing."""
+
+    def __init__(self, api: Optional[FakeBotAPI] = None):
+        super().__init__()
+        # BaseSession.api is the server URL config; the fake lives next to it
+        self.fake = api or FakeBotAPI()
+        self.fake.image = IMAGE
+
+    async def make_request(self, bot: Bot, method, timeout: Optional[int] = None):
+        if self.fake.latency or self.fake.jitter:
+            await asyncio.sleep(self.fake.latency + random.random() * self.fake.jitter)
+        self.fake.methods[method.__api_method__] += 1
+        params = {k: v for k, v in method.model_dump(warnings=False).items() if v is not None}
+        content = json.dumps({"ok": True, "result": self.fake.result(method.__api_method__, params)})
+        return self.check_response(bot, method, 200, content).result
+
+    async def stream_content(self, url: str, headers: Optional[Dict[str, Any]] = None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+        yield self.fake.image
+
+    async def close(self) -> None:
+        pass
+
+
+class FakeAIService:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    async def download_telegram_file(self, bot, file_id: str) -> bytes:
+        file = await bot.get_file(file_id)
+        return (await bot.download_file(file.file_path)).read()
+
+    async def generate_image(self, image_bytes: bytes, prompt: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return IMAGE, None, "gemini", 1
+
+
+class FakeOCRService:
+    async def extract_payment_info(self, image_bytes: bytes):
+        return parse_payment_text(RECEIPT_TEXT)
+
+
+def make_bot(api: Optional[FakeBotAPI] = None) -> Bot:
+    return Bot(token=TOKEN, session=LocalSession(api))
+
+
+def make_app_context(db: MemoryDatabase) -> AppContext:
+    # services the benchmarked handlers never touch stay None
+    return AppContext(db=db, ai_service=FakeAIService(), ocr_service=None, payment_service=None,
+                      broadcast_service=None, style_catalog=None)
+
+
+def make_state(bot: Bot, storage: MemoryStorage, user_id: int) -> FSMContext:
+    return FSMContext(storage=storage, key=StorageKey(bot_id=bot.id, chat_id=user_id, user_id=user_id))
+
+
+def _user(user_id: int) -> Dict[str, Any]:
+    return {"id": user_id, "is_bot": False, "first_name": "Bench", "username": f"bench{user_id}", "language_code": "en"}
+
+
+def message(bot: Bot, user_id: int, **content):
+    update = Update.model_validate({"update_id": next(_ids), "message": {
+        "message_id": next(_ids), "date": 0, "chat": {"id": user_id, "type": "private"},
+        "from": _user(user_id), **content}}, context={"bot": bot})
+    return update.message
+
+
+def command(bot: Bot, user_id: int, text: str):
+    return message(bot, user_id, text=text, entities=[{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}])
+
+
+def photo(bot: Bot, user_id: int):
+    file_id = f"bench-{next(_ids)}"
+    return message(bot, user_id, photo=[{"file_id": file_id, "file_unique_id": file_id, "width": 1024, "height": 1024}])
+
+
+def callback(bot: Bot, user_id: int, data: str):
+    update = Update.model_validate({"update_id": next(_ids), "callback_query": {
+        "id": str(next(_ids)), "from": _user(user_id), "chat_instance": "bench", "data": data,
+        "message": {"message_id": next(_ids), "date": 1, "chat": {"id": user_id, "type": "private"}, "text": "menu"}}},
+        context={"bot": bot})
+    return update.callback_query
@@ -0,0 +1,194 @@
+# benchmarks/run.py
+"""
+Micro-benchmarks for hot paths, compared against stored baselines.
+
+    python -m benchmarks.run                    # run, compare, exit 1 on regression
+    python -m benchmarks.run -k handler         # only names containing "handler"
+    python -m benchmarks.run --update-baseline  # record current numbers
+
+Every benchmark is run in several rounds. The fastest round's time per call
+(the one least disturbed by other processes) is compared with
+benchmarks/baseline.json. A result slower than baseline * (1 + threshold)
+is measured again (--retries times) and fails the run if it stays slow.
+A slowdown below the baseline's noise_floor_us per timed op never fails,
+however large it is in percent. Cases batched N calls per op (see BATCHES)
+get a floor of noise_floor_us / N per call, so sub-microsecond cases are
+held to the percentage threshold like everything else.
+
+Results are scaled by the `reference` benchmark (plain Python arithmetic)
+before comparing, so a baseline recorded on one machine still holds on a
+faster or slower one. flexa_ai INFO logs are turned off while timing: a
+benchmark measures the code path, not the log writer.
+"""
+import argparse
+import asyncio
+import gc
+import inspect
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.cases import BATCHES, BENCHMARKS
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+REFERENCE = "reference"
+# slowdowns smaller than this per timed op (in baseline units) are timer noise, whatever the percentage
+NOISE_FLOOR_US = 1.0
+
+
+async def measure(op: Callable, rounds: int, min_round_time: float) -> float:
+    """Fastest seconds per call over `rounds` rounds, each at least `min_round_time` long."""
+    is_async = inspect.iscoroutinefunction(op)
+
+    async def run(n: int) -> float:
+        started = time.perf_counter()
+        if is_async:
+            for _ in range(n):
+                await op()
+        else:
+            for _ in range(n):
+                op()
+        return time.perf_counter() - started
+
+    # warm-up, then grow the loop count until one round is long enough to time
+    await run(3)
+    n = 1
+    while (elapsed := await run(n)) < min_round_time:
+        n = max(n * 2, int(n * min_round_time / max(elapsed, 1e-9)))
+    gc.collect()
+    return min([await run(n) / n for _ in range(rounds)])
+
+
+def batched(op: Callable, batch: int) -> Callable:
+    if batch == 1:
+        return op
+    if inspect.iscoroutinefunction(op):
+        async def run():
+            for _ in range(batch):
+                await op()
+        return run
+
+    def run():
+        for _ in range(batch):
+            op()
+    return run
+
+
+async def run_all(names, rounds: int, min_round_time: float) -> Dict[str, float]:
+    results = {}
+    for name in names:
+        op = batched(await BENCHMARKS[name](), BATCHES[name])
+        results[name] = await measure(op, rounds, min_round_time) / BATCHES[name]
+        print(f"  {name:36} {results[name] * 1e6:>12.2f} us", file=sys.stderr)
+    if REFERENCE in results:
+        # timed again at the end: the machine's speed often drifts during the first seconds
+        results[REFERENCE] = min(results[REFERENCE], await measure(await BENCHMARKS[REFERENCE](), rounds, min_round_time))
+    return results
+
+
+def load_baseline() -> Dict:
+    try:
+        with open(BASELINE, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"threshold": 0.25, "noise_floor_us": NOISE_FLOOR_US, "results_us": {}}
+
+
+def _scale(results: Dict[str, float], stored: Dict[str, float]) -> float:
+    if REFERENCE in results and stored.get(REFERENCE):
+        return results[REFERENCE] * 1e6 / stored[REFERENCE]
+    return 1.0
+
+
+def regressions(results: Dict[str, float], baseline: Dict, threshold: float) -> List[str]:
+    stored = baseline.get("results_us", {})
+    scale = _scale(results, stored)
+    floor = baseline.get("noise_floor_us", NOISE_FLOOR_US) * scale
+    slow = []
+    for name, seconds in results.items():
+        if name == REFERENCE or name not in stored:
+            continue
+        expected = stored[name] * scale
+        if seconds * 1e6 > expected * (1 + threshold) and seconds * 1e6 - expected > floor / BATCHES[name]:
+            slow.append(name)
+    return slow
+
+
+def report(results: Dict[str, float], baseline: Dict, threshold: float) -> None:
+    stored = baseline.get("results_us", {})
+    scale = _scale(results, stored)
+    slow = set(regressions(results, baseline, threshold))
+    print(f"\n{'benchmark':36} {'us/call':>10} {'baseline':>10} {'change':>8}")
+    for name, seconds in results.items():
+        us = seconds * 1e6
+        if name not in stored:
+            print(f"{name:36} {us:>10.2f} {'new':>10}")
+            continue
+        expected = stored[name] * scale
+        flag = "  REGRESSION" if name in slow else ""
+        print(f"{name:36} {us:>10.2f} {expected:>10.2f} {us / expected - 1:>+7.0%}{flag}")
+    if scale != 1.0:
+        print(f"(baselines scaled by {scale:.2f} for this machine's reference speed)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Flexa AI hot-path benchmarks")
+    parser.add_argument("-k", dest="pattern", default="", help="only benchmarks whose name contains this")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--min-round-ms", type=float, default=50.0)
+    parser.add_argument("--threshold", type=float, default=None, help="allowed slowdown, e.g. 0.25 for 25%%")
+    parser.add_argument("--retries", type=int, default=2, help="re-measure apparent regressions this many times")
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--baseline-runs", type=int, default=3, help="full runs whose median becomes the baseline")
+    args = parser.parse_args()
+
+    logging.getLogger("flexa_ai").setLevel(logging.WARNING)
+    names = [n for n in BENCHMARKS if args.pattern in n]
+    if args.pattern and REFERENCE not in names:
+        names.insert(0, REFERENCE)
+    print(f"running {len(names)} benchmarks", file=sys.stderr)
+    results = asyncio.run(run_all(names, args.rounds, args.min_round_ms / 1000))
+
+    baseline = load_baseline()
+    threshold = args.threshold if args.threshold is not None else baseline.get("threshold", 0.25)
+    if args.update_baseline:
+        # a typical run, not the luckiest one: the median of several full runs
+        runs = [results] + [asyncio.run(run_all(names, args.rounds, args.min_round_ms / 1000))
+                            for _ in range(args.baseline_runs - 1)]
+        results = {name: statistics.median(run[name] for run in runs) for name in names}
+        stored = baseline.get("results_us", {})
+        scale = results[REFERENCE] * 1e6 / stored[REFERENCE] if stored.get(REFERENCE) and args.pattern else 1.0
+        # a partial run is stored in the units of the existing baseline
+        stored.update({name: round(seconds * 1e6 / scale, 3) for name, seconds in results.items()
+                       if not (args.pattern and name == REFERENCE)})
+        baseline = {"threshold": threshold, "noise_floor_us": baseline.get("noise_floor_us", NOISE_FLOOR_US),
+                    "python": platform.python_version(), "results_us": dict(sorted(stored.items()))}
+        with open(BASELINE, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {BASELINE}")
+        return
+
+    # a regression has to show up again when re-measured; one disturbed run is not enough
+    for _ in range(args.retries):
+        slow = regressions(results, baseline, threshold)
+        if not slow:
+            break
+        print(f"re-measuring {', '.join(slow)}", file=sys.stderr)
+        again = asyncio.run(run_all(slow, args.rounds, args.min_round_ms / 1000))
+        results.update({name: min(results[name], again[name]) for name in slow})
+
+    report(results, baseline, threshold)
+    slow = regressions(results, baseline, threshold)
+    if slow:
+        print(f"\n{len(slow)} benchmark(s) slower than baseline by more than {threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,62 @@
 import asyncio
-import logging
+import hmac
 import os
 import sys
+from typing import Optional
 from aiohttp import web
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import BotCommand, BotCommandScopeDefault, BotCommandScopeChat
-from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiogram.webhook.aiohttp_server import setup_application
 
 from config.settings import settings
 from database import Database
-from services import AIImageService, OCRService, PaymentService
+from database.instrumentation import db_stats
+from services.ai_image import provider_health
+from services import AIImageService, OCRService, PaymentService, BroadcastService, StyleCatalog
 from app_context import AppContext
 from handlers import user_router, admin_router
+from handlers.user.handlers import GENERATIONS_IN_FLIGHT
+from keyboards.render_cache import render_cache
 from middlewares.error_handling_middleware import ErrorHandlingMiddleware
+from middlewares.log_context_middleware import LogContextMiddleware
+from middlewares.metrics_middleware import MetricsMiddleware
+from middlewares.recorder_middleware import UpdateRecorderMiddleware
 from middlewares.throttling_middleware import ThrottlingMiddleware
+from middlewares.tracing_middleware import TracingMiddleware
+from utils.error_reporter import error_aggregator
 from utils.logger import logger
-
-logging.basicConfig(level=logging.INFO)
+from utils.health import ReadinessProbe
+from utils.metrics import REGISTRY
+from utils.loop_monitor import loop_monitor
+from utils.outbound import outbound
+from utils.shutdown import shutdown
+from utils.supervisor import Phase, supervisor
+from utils.tracing import TracingRequestMiddleware, tracer
+from utils.update_recorder import update_recorder
+from utils.webhook import BoundedRequestHandler
+from utils.ratelimit import MemoryRateLimitStore, PostgresRateLimitStore, TokenBucketPolicy
 
 # --- Global objects ---
-bot = Bot(token=settings.BOT_TOKEN)
+api_session = AiohttpSession(api=TelegramAPIServer.from_base(settings.TELEGRAM_API_URL)) if settings.TELEGRAM_API_URL else None
+bot = Bot(token=settings.BOT_TOKEN, session=api_session)
+# Registered first so it is outermost: Bot API spans include time spent queued for pacing
+bot.session.middleware(TracingRequestMiddleware())
+# Every outgoing send is queued per chat and paced to Bot API limits
+bot.session.middleware(outbound)
 storage = MemoryStorage()
 dp = Dispatcher(storage=storage)
 db = Database(settings.DATABASE_URL)
+broadcast_service = BroadcastService(db, bot)
+ocr_service = OCRService()
+style_catalog = StyleCatalog(db)
+# rendered style cards and keyboards are dropped whenever the catalog reloads
+style_catalog.subscribe(render_cache.on_styles_changed)
+readiness = ReadinessProbe(db, loop_monitor, generations=GENERATIONS_IN_FLIGHT.get,
+                           provider=provider_health, backlog=outbound.backlog,
+                           draining=lambda: shutdown.draining, supervisor=supervisor)
 
 # --- Middleware setup ---
 def setup_middlewares(app_context: AppContext):
@@ -35,12 +68,32 @@ def setup_middlewares(app_context: AppContext):
             data['app_context'] = self.app_context
             return await handler(event, data)
 
+    # outermost, so recorded handling times include every middleware below
+    if update_recorder.enabled:
+        dp.update.outer_middleware(UpdateRecorderMiddleware(update_recorder))
+    # log context and root span per update, set before anything else runs
+    dp.update.outer_middleware(LogContextMiddleware())
+    dp.update.outer_middleware(TracingMiddleware())
     dp.message.middleware(AppContextMiddleware(app_context))
     dp.callback_query.middleware(AppContextMiddleware(app_context))
-    dp.message.middleware(ThrottlingMiddleware(message_interval=1.5, callback_interval=0.5))
-    dp.callback_query.middleware(ThrottlingMiddleware(message_interval=1.5, callback_interval=0.5))
+    # One throttling instance for both observers so limits and memory are shared
+    policies = {
+        # photo uploads trigger downloads, OCR and generation
+        "upload": TokenBucketPolicy.every(10.0, burst=2),
+    }
+    store = MemoryRateLimitStore(ttl=60.0, max_entries=settings.THROTTLE_MAX_ENTRIES)
+    if settings.THROTTLE_BACKEND == "postgres":
+        store = PostgresRateLimitStore(app_context.db, ttl=60.0, fallback=store)
+    throttling = ThrottlingMiddleware(message_interval=1.5, callback_interval=0.5, policies=policies, store=store)
+    dp.message.middleware(throttling)
+    dp.callback_query.middleware(throttling)
     dp.message.middleware(ErrorHandlingMiddleware())
     dp.callback_query.middleware(ErrorHandlingMiddleware())
+    # innermost: times the handler itself and sees its exceptions
+    dp.message.middleware(MetricsMiddleware())
+    dp.callback_query.middleware(MetricsMiddleware())
+    dp.message.middleware(TracingMiddleware())
+    dp.callback_query.middleware(TracingMiddleware())
 
 # --- Routers ---
 dp.include_router(user_router)
@@ -56,26 +109,92 @@ async def set_commands(bot, admin_ids: list[int]):
 
     admin_commands = user_commands + [
         BotCommand(command="admin", description="🔐 Admin Command Center"),
+        BotCommand(command="broadcast_status", description="📣 Broadcast progress"),
+        BotCommand(command="dbstats", description="🗄 Database timings"),
     ]
     for admin_id in admin_ids:
         await bot.set_my_commands(admin_commands, scope=BotCommandScopeChat(chat_id=admin_id), request_timeout=30)
 
+# --- Background tasks ---
+def start_background_tasks(bot: Bot, webhook_handler: Optional[BoundedRequestHandler] = None):
+    # restarted with backoff if they crash; broadcast_service.run_forever resumes broadcasts
+    # interrupted by a restart, style_catalog.run_forever keeps the LISTEN connection for style changes
+    supervisor.supervise("error_digest", lambda: error_aggregator.run(bot))
+    supervisor.supervise("broadcasts", broadcast_service.run_forever)
+    if webhook_handler is not None:
+        # updates a stopping instance accepted but never started
+        supervisor.supervise("deferred_updates", lambda: webhook_handler.replay_deferred(bot, db.take_deferred_updates))
+    supervisor.supervise("style_catalog", style_catalog.run_forever)
+    supervisor.supervise("loop_monitor", loop_monitor.run)
+    if tracer.enabled:
+        supervisor.supervise("tracing", tracer.run)
+
 # --- Startup / Shutdown ---
-async def on_startup(bot: Bot):
+def build_app_context() -> AppContext:
+    return AppContext(db=db, ai_service=AIImageService(), ocr_service=ocr_service, payment_service=PaymentService(),
+                      broadcast_service=broadcast_service, style_catalog=style_catalog)
+
+def startup_phases(bot: Bot, webhook_url: Optional[str] = None,
+                   webhook_handler: Optional[BoundedRequestHandler] = None) -> list[Phase]:
+    # Telegram is only pointed at this instance (or polled) once everything before it succeeded
+    phases = [
+        Phase("database", db.connect, timeout=30),
+        Phase("middlewares", lambda: setup_middlewares(build_app_context())),
+        Phase("background_tasks", lambda: start_background_tasks(bot, webhook_handler)),
+        Phase("commands", lambda: set_commands(bot, settings.ADMIN_IDS), timeout=60, required=False),
+    ]
+    if webhook_url:
+        # resolve_used_update_types includes chat_member, which Telegram only sends when asked
+        phases.append(Phase("webhook", lambda: bot.set_webhook(
+            webhook_url, drop_pending_updates=True, allowed_updates=dp.resolve_used_update_types()
+        ), timeout=20))
+    else:
+        phases.append(Phase("delete_webhook", lambda: bot.delete_webhook(drop_pending_updates=True), timeout=20))
+    return phases
+
+async def on_startup(bot: Bot, webhook_handler: Optional[BoundedRequestHandler] = None):
     logger.info("🚀 Starting Flexa AI bot...")
-    await db.connect()
-    ai_service = AIImageService()
-    ocr_service = OCRService()
-    payment_service = PaymentService()
-    app_context = AppContext(db=db, ai_service=ai_service, ocr_service=ocr_service, payment_service=payment_service)
-    setup_middlewares(app_context)
-    await set_commands(bot, settings.ADMIN_IDS)
     webhook_url = f"{os.getenv('WEBHOOK_BASE_URL')}/webhook"
-    await bot.set_webhook(webhook_url, drop_pending_updates=True)
+    await supervisor.run_phases(startup_phases(bot, webhook_url, webhook_handler))
     logger.info(f"Webhook set to: {webhook_url}")
 
-async def on_shutdown(bot: Bot):
+async def on_shutdown(bot: Bot, webhook_handler: Optional[BoundedRequestHandler] = None):
     logger.info("🛑 Shutting down Flexa AI bot...")
+    # 1) stop intake: readiness turns 503 and new webhook requests are left to Telegram's redelivery
+    waiters = []
+    if webhook_handler is not None:
+        webhook_handler.accepting = False
+        waiters.append(webhook_handler.drain(shutdown.grace))
+    # 2) let accepted updates, generations and OCR finish; past the grace period they re-queue
+    #    (manual queue / pending payment) while the database is still open, and queued updates
+    #    that never started are stored for the next instance to replay
+    await shutdown.drain(*waiters)
+    if webhook_handler is not None:
+        unstarted = await webhook_handler.stop(timeout=2.0)
+        try:
+            await db.defer_updates(unstarted)
+        except Exception:
+            logger.exception(f"[shutdown] could not defer updates {[u.get('update_id') for u in unstarted][:20]}")
+        else:
+            if unstarted:
+                logger.warning(f"[shutdown] deferred {len(unstarted)} update(s) to the next instance")
+    # 3) stop background work and flush buffers; broadcasts resume from their checkpoint on restart.
+    #    Each flush is bounded: with the default grace and re-queue windows everything here
+    #    has to finish within Render's ~30s after SIGTERM
+    await supervisor.stop()
+    await broadcast_service.close()
+    ocr_service.close()
+    await style_catalog.close()
+    for name, flush in (("error digest", error_aggregator.flush(bot)), ("traces", tracer.close())):
+        try:
+            await asyncio.wait_for(flush, 2.0)
+        except Exception:
+            logger.exception(f"[shutdown] could not flush {name}")
+    await asyncio.to_thread(update_recorder.close, 1.0)
+    # admin notices still queued (e.g. for interrupted generations) go out now, without per-chat pacing
+    await outbound.flush(2.0)
+    outbound.close()
+    # 4) close connections
     await db.close()
     await bot.session.close()
 
@@ -83,28 +202,64 @@ async def on_shutdown(bot: Bot):
 async def health_check(request):
     return web.Response(text="OK")
 
+async def health_live(request):
+    return web.json_response({"status": "alive"})
+
+async def health_ready(request):
+    status, body = await readiness.check()
+    return web.json_response(body, status=status)
+
+# --- Diagnostics ---
+def stats_authorized(request) -> bool:
+    # closed unless a token is configured: these expose SQL text and traffic numbers
+    if not settings.STATS_TOKEN:
+        return False
+    token = request.query.get("token") or request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    return hmac.compare_digest(token.encode(), settings.STATS_TOKEN.encode())
+
+async def metrics(request):
+    if not stats_authorized(request):
+        return web.Response(status=401, text="Unauthorized")
+    return web.Response(body=REGISTRY.render().encode(), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+async def dbstats(request):
+    if not stats_authorized(request):
+        return web.Response(status=401, text="Unauthorized")
+    return web.json_response(db_stats(db.pool))
+
 # --- Webhook app factory ---
 async def create_app() -> web.Application:
     app = web.Application()
     app.router.add_get("/health", health_check)
-    webhook_handler = SimpleRequestHandler(dispatcher=dp, bot=bot)
+    app.router.add_get("/health/live", health_live)
+    app.router.add_get("/health/ready", health_ready)
+    app.router.add_get("/dbstats", dbstats)
+    app.router.add_get("/metrics", metrics)
+    # answers Telegram immediately; a bounded worker pool processes the updates
+    webhook_handler = BoundedRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        max_in_flight=settings.WEBHOOK_MAX_IN_FLIGHT,
+        queue_size=settings.WEBHOOK_QUEUE_SIZE,
+        overflow=settings.WEBHOOK_OVERFLOW,
+        overflow_timeout=settings.WEBHOOK_OVERFLOW_TIMEOUT,
+        drain_timeout=settings.SHUTDOWN_GRACE_SECONDS,
+    )
+    # registered before the handler's own hook, so updates drain before its session closes
+    app.on_shutdown.append(lambda app: on_shutdown(bot, webhook_handler))
     webhook_handler.register(app, path="/webhook")
     setup_application(app, dp, bot=bot)
-    app.on_startup.append(lambda app: asyncio.create_task(on_startup(bot)))
-    app.on_cleanup.append(lambda app: asyncio.create_task(on_shutdown(bot)))
+    # awaited: the server only starts listening once every required startup phase succeeded
+    app.on_startup.append(lambda app: on_startup(bot, webhook_handler))
     return app
 
 # --- Polling mode ---
 async def start_polling():
-    await db.connect()
-    ai_service = AIImageService()
-    ocr_service = OCRService()
-    payment_service = PaymentService()
-    app_context = AppContext(db=db, ai_service=ai_service, ocr_service=ocr_service, payment_service=payment_service)
-    setup_middlewares(app_context)
-    await set_commands(bot, settings.ADMIN_IDS)
-    await bot.delete_webhook(drop_pending_updates=True)
-    await dp.start_polling(bot)
+    await supervisor.run_phases(startup_phases(bot))
+    try:
+        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+    finally:
+        await on_shutdown(bot)
 
 # --- Entrypoint ---
 if __name__ == "__main__":
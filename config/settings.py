@@ -7,9 +7,15 @@ load_dotenv()
 
 class Settings:
     BOT_TOKEN: str = os.getenv('BOT_TOKEN', '')
+    # Bot API server base URL; empty means api.telegram.org (load tests point it at loadtest.fake_bot_api)
+    TELEGRAM_API_URL: str = os.getenv('TELEGRAM_API_URL', '')
     ADMIN_IDS: List[int] = [int(id.strip()) for id in os.getenv('ADMIN_IDS', '').split(',') if id.strip()]
 
     DATABASE_URL: str = os.getenv('DATABASE_URL', '')
+    # Statements slower than this are logged with SQL and parameters
+    DB_SLOW_QUERY_MS: float = float(os.getenv('DB_SLOW_QUERY_MS', '200'))
+    # /dbstats and /metrics require ?token= or a Bearer header with this; unset, they answer 401
+    STATS_TOKEN: str = os.getenv('STATS_TOKEN', '')
     SUPABASE_URL: str = os.getenv('SUPABASE_URL', '')
     SUPABASE_KEY: str = os.getenv('SUPABASE_KEY', '')
 
@@ -20,11 +26,68 @@ class Settings:
     ADMIN_MANUAL_GROUP_ID: int = int(os.getenv('ADMIN_MANUAL_GROUP_ID', '-5084517269'))
     ADMIN_DAILY_GROUP_ID: int = int(os.getenv('ADMIN_DAILY_GROUP_ID', '-5164478198'))
     ADMIN_ERROR_GROUP_ID: int = int(os.getenv('ADMIN_ERROR_GROUP_ID', '-5271996630'))
+    # Seconds between error digests sent to ADMIN_ERROR_GROUP_ID
+    ERROR_DIGEST_INTERVAL: float = float(os.getenv('ERROR_DIGEST_INTERVAL', '60'))
     CHANNEL_USERNAME: str = os.getenv('CHANNEL_USERNAME', '@FlexaAI')
+    # Seconds a channel membership check is cached: members / non-members
+    MEMBERSHIP_TTL: float = float(os.getenv('MEMBERSHIP_TTL', '3600'))
+    MEMBERSHIP_NEGATIVE_TTL: float = float(os.getenv('MEMBERSHIP_NEGATIVE_TTL', '10'))
+
+    # Threads running Tesseract for payment screenshots
+    OCR_WORKERS: int = int(os.getenv('OCR_WORKERS', '2'))
 
     BONUS_CREDITS: int = int(os.getenv('BONUS_CREDITS', '3'))
     DEFAULT_LANGUAGE: str = os.getenv('DEFAULT_LANGUAGE', 'en')
     LOG_LEVEL: str = os.getenv('LOG_LEVEL', 'INFO')
+    # 'json' (one object per line, with user_id/update_id/generation_id) or 'text'
+    LOG_FORMAT: str = os.getenv('LOG_FORMAT', 'json')
+    # Share of DEBUG/INFO records kept per logger, e.g. 'aiogram.event=0.1,flexa_ai=1'
+    LOG_SAMPLE_RATES: str = os.getenv('LOG_SAMPLE_RATES', 'aiogram.event=0.1')
+    # Records waiting for the writer thread; beyond this they are dropped, not blocked on
+    LOG_QUEUE_SIZE: int = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+    # 'memory' keeps rate limits per process, 'postgres' shares them across replicas
+    THROTTLE_BACKEND: str = os.getenv('THROTTLE_BACKEND', 'memory')
+    THROTTLE_MAX_ENTRIES: int = int(os.getenv('THROTTLE_MAX_ENTRIES', '100000'))
+
+    # 'carousel' shows one style card edited in place, 'pages' sends 4 cards per page
+    STYLE_BROWSER_MODE: str = os.getenv('STYLE_BROWSER_MODE', 'carousel')
+
+    # Webhook workers: updates processed at once, accepted updates waiting, and what to do
+    # when the queue is full ('wait' up to WEBHOOK_OVERFLOW_TIMEOUT, or 'reject' with 503)
+    WEBHOOK_MAX_IN_FLIGHT: int = int(os.getenv('WEBHOOK_MAX_IN_FLIGHT', '32'))
+    WEBHOOK_QUEUE_SIZE: int = int(os.getenv('WEBHOOK_QUEUE_SIZE', '500'))
+    WEBHOOK_OVERFLOW: str = os.getenv('WEBHOOK_OVERFLOW', 'wait')
+    WEBHOOK_OVERFLOW_TIMEOUT: float = float(os.getenv('WEBHOOK_OVERFLOW_TIMEOUT', '5'))
+    # Shutdown: seconds to let accepted updates, generations and OCR finish, then
+    # seconds for unfinished ones to re-queue themselves before the database closes.
+    # Render kills the process ~30s after SIGTERM and the cleanup after these takes up to ~10s
+    SHUTDOWN_GRACE_SECONDS: float = float(os.getenv('SHUTDOWN_GRACE_SECONDS', '12'))
+    SHUTDOWN_REQUEUE_SECONDS: float = float(os.getenv('SHUTDOWN_REQUEUE_SECONDS', '4'))
+
+    # Readiness (/health/ready): limits past which the instance reports not ready
+    READY_MAX_GENERATIONS: int = int(os.getenv('READY_MAX_GENERATIONS', '50'))
+    READY_MAX_LOOP_LAG_MS: float = float(os.getenv('READY_MAX_LOOP_LAG_MS', '500'))
+    # Seconds a readiness DB ping is reused, and how long it may wait for a connection
+    READY_DB_CACHE_SECONDS: float = float(os.getenv('READY_DB_CACHE_SECONDS', '2'))
+    READY_DB_TIMEOUT: float = float(os.getenv('READY_DB_TIMEOUT', '1'))
+
+    # Event loop blocked longer than this gets its stack captured and reported to admins
+    LOOP_BLOCK_THRESHOLD_MS: float = float(os.getenv('LOOP_BLOCK_THRESHOLD_MS', '300'))
+
+    # Tracing: 'none', 'jsonl' (TRACING_FILE) or 'otlp' (TRACING_ENDPOINT, OTLP/JSON over HTTP)
+    TRACING_EXPORTER: str = os.getenv('TRACING_EXPORTER', 'none')
+    TRACING_FILE: str = os.getenv('TRACING_FILE', 'traces.jsonl')
+    TRACING_ENDPOINT: str = os.getenv('TRACING_ENDPOINT', 'http://localhost:4318/v1/traces')
+    # Share of traces kept; failed traces and ones slower than TRACE_SLOW_MS are always kept
+    TRACE_SAMPLE_RATE: float = float(os.getenv('TRACE_SAMPLE_RATE', '0.01'))
+    TRACE_SLOW_MS: float = float(os.getenv('TRACE_SLOW_MS', '1000'))
+
+    # Update recording for replay: gzip JSONL path (strftime pattern, empty = off) and share of users recorded
+    RECORD_UPDATES_FILE: str = os.getenv('RECORD_UPDATES_FILE', '')
+    RECORD_SAMPLE_RATE: float = float(os.getenv('RECORD_SAMPLE_RATE', '0.05'))
+    # Key for pseudonymous user/chat ids; keep it fixed to keep ids stable across restarts
+    RECORD_SALT: str = os.getenv('RECORD_SALT', '')
 
     CREDIT_PACKAGES = {
         '5_images': {'credits': 5, 'price': 100, 'name_en': '5 Images', 'name_am': '5 ፎቶዎች'},
@@ -1,3 +1,4 @@
 from .db import Database
+from .memory import MemoryDatabase
 
-__all__ = ['Database']
+__all__ = ['Database', 'MemoryDatabase']
@@ -0,0 +1,284 @@
+# database/conformance.py
+"""
+Behaviour checks that every `Database` backend has to pass.
+
+    python -m database.conformance                      # MemoryDatabase only
+    python -m database.conformance --postgres "$URL"    # ...and Postgres
+
+The Postgres run writes real rows: point it at a scratch database. It uses
+user ids from 990000000 upwards and deletes what it created at the end.
+
+Each check gets a connected backend and a fresh user id range; a check fails
+by raising AssertionError. Exit status is non-zero when any check failed.
+"""
+import argparse
+import asyncio
+import itertools
+import sys
+import time
+import traceback
+import uuid
+from typing import Awaitable, Callable, List
+
+from database.db import Database
+from database.memory import MemoryDatabase
+
+FIRST_USER_ID = 990_000_000
+_user_ids = itertools.count(FIRST_USER_ID)
+
+CHECKS: List[Callable[..., Awaitable[None]]] = []
+
+
+def check(fn):
+    CHECKS.append(fn)
+    return fn
+
+
+def new_user_id() -> int:
+    return next(_user_ids)
+
+
+async def make_user(db, credits: int = 3, language: str = "en") -> int:
+    user_id = new_user_id()
+    await db.create_user(user_id, f"u{user_id}", "Conformance", language, credits)
+    return user_id
+
+
+async def make_style(db, name: str = "Conformance style", cost: int = 1, order: int = 0, active: bool = True):
+    return await db.create_style(name, None, None, None, "prompt", cost, is_active=active, display_order=order)
+
+
+# --- users ---
+@check
+async def create_user_is_an_upsert(db):
+    user_id = new_user_id()
+    user = await db.create_user(user_id, "first", "Ann", "am", 3)
+    assert user["credit_balance"] == 3 and user["language"] == "am" and user["is_active"]
+    again = await db.create_user(user_id, "second", "Other", "en", 5)
+    assert again["username"] == "second", "conflict updates username"
+    assert again["first_name"] == "Ann" and again["language"] == "am", "conflict keeps other columns"
+    assert again["credit_balance"] == 3
+
+
+@check
+async def get_user_and_language(db):
+    assert await db.get_user(new_user_id()) is None
+    user_id = await make_user(db)
+    await db.update_user_language(user_id, "am")
+    assert (await db.get_user(user_id))["language"] == "am"
+
+
+# --- credits ---
+@check
+async def deduct_credits_never_goes_negative(db):
+    user_id = await make_user(db, credits=3)
+    assert await db.deduct_credits(user_id, 2)
+    assert not await db.deduct_credits(user_id, 2)
+    user = await db.get_user(user_id)
+    assert user["credit_balance"] == 1 and user["total_generations"] == 1
+    assert not await db.deduct_credits(new_user_id(), 1), "unknown user"
+
+
+@check
+async def concurrent_deductions_are_atomic(db):
+    user_id = await make_user(db, credits=5)
+    results = await asyncio.gather(*(db.deduct_credits(user_id, 1) for _ in range(12)))
+    assert sum(results) == 5, f"{sum(results)} deductions succeeded on a balance of 5"
+    assert (await db.get_user(user_id))["credit_balance"] == 0
+
+
+@check
+async def add_credits_returns_new_balance(db):
+    user_id = await make_user(db, credits=1)
+    assert await db.add_credits(user_id, 4, "admin_adjustment") == 5
+    results = await asyncio.gather(*(db.add_credits(user_id, 1, "bonus") for _ in range(10)))
+    assert max(results) == 15 and len(set(results)) == 10
+
+
+# --- styles ---
+@check
+async def styles_order_and_pagination(db):
+    before = len(await db.get_all_styles())
+    ids = [await make_style(db, f"zz conformance {i}", order=10_000 + i, active=i % 2 == 0) for i in range(5)]
+    styles = await db.get_all_styles()
+    assert len(styles) == before + 5
+    tail = [s["id"] for s in styles[-5:]]
+    assert tail == ids, "ordered by display_order, name_en"
+    active_ids = [s["id"] for s in await db.get_active_styles()]
+    assert [i for i in ids if i in active_ids] == ids[::2]
+    pages = []
+    page = 0
+    while True:
+        rows = await db.get_styles_paginated(page, 2)
+        if not rows:
+            break
+        pages.extend(r["id"] for r in rows)
+        page += 1
+    assert pages == [s["id"] for s in styles]
+
+
+@check
+async def update_and_delete_style(db):
+    style_id = await make_style(db, cost=2)
+    assert isinstance(style_id, uuid.UUID)
+    style = await db.get_style(str(style_id))
+    await db.update_style(style_id, **{**style, "credit_cost": 4, "description_en": None})
+    updated = await db.get_style(style_id)
+    assert updated["credit_cost"] == 4 and updated["name_en"] == style["name_en"]
+
+    user_id = await make_user(db)
+    gen_id = await db.create_generation(user_id, str(style_id), "file", 4)
+    await db.delete_style(str(style_id))
+    assert await db.get_style(style_id) is None
+    assert (await db.get_generation(gen_id))["style_id"] is None, "ON DELETE SET NULL"
+
+
+# --- generations ---
+@check
+async def generation_lifecycle(db):
+    user_id = await make_user(db)
+    style_id = await make_style(db)
+    gen_id = await db.create_generation(user_id, str(style_id), "file", 1)
+    assert isinstance(gen_id, str)
+    assert await db.user_has_active_generation(user_id)
+    await db.update_generation(gen_id, "completed", "result", api_provider="gemini", processing_time_ms=10)
+    gen = await db.get_generation(gen_id)
+    assert gen["status"] == "completed" and gen["completed_at"] is not None and gen["api_provider"] == "gemini"
+    assert not await db.user_has_active_generation(user_id)
+
+
+@check
+async def manual_queue_pagination(db):
+    user_id = await make_user(db)
+    style_id = await make_style(db)
+    _, before = await db.get_manual_queue_paginated(0, 5)
+    created = []
+    for _ in range(3):
+        gen_id = await db.create_generation(user_id, str(style_id), "file", 1)
+        await db.update_generation(gen_id, "manual_queue", error_message="provider down")
+        created.append(gen_id)
+    rows, total = await db.get_manual_queue_paginated(0, before + 3)
+    assert total == before + 3
+    assert [str(r["id"]) for r in rows[-3:]] == created, "oldest first"
+    assert rows[-1]["style_name"] == "Conformance style" and rows[-1]["prompt_template"] == "prompt"
+    task = await db.get_manual_task(created[0])
+    assert task["first_name"] == "Conformance"
+    assert (await db.get_stats())["manual_queue"] >= 3
+
+
+# --- payments ---
+@check
+async def payment_approval_is_once_only(db):
+    user_id = await make_user(db, credits=0)
+    pid = await db.create_payment(user_id, "5_images", 100, 5, "file", {"amount": 100})
+    pending = [str(p["id"]) for p in await db.get_pending_payments(limit=1000)]
+    assert pid in pending
+    results = await asyncio.gather(*(db.approve_payment(pid, user_id) for _ in range(4)))
+    assert sum(results) == 1, "approved more than once"
+    assert (await db.get_user(user_id))["credit_balance"] == 5
+    payment = await db.get_payment(pid)
+    assert payment["status"] == "approved" and payment["reviewed_at"] is not None
+    assert isinstance(payment["ocr_extracted_data"], str)
+
+
+@check
+async def payment_rejection(db):
+    user_id = await make_user(db)
+    pid = await db.create_payment(user_id, "10_images", 150, 10, "file")
+    rows, total = await db.get_pending_payments_paginated(0, 1000)
+    assert pid in [str(r["id"]) for r in rows] and total >= 1
+    await db.reject_payment(pid, user_id, "blurry")
+    assert not await db.approve_payment(pid, user_id)
+    payment = await db.get_payment(pid)
+    assert payment["status"] == "rejected" and payment["admin_note"] == "blurry" and payment["ocr_extracted_data"] is None
+
+
+# --- broadcasts ---
+@check
+async def broadcast_leases(db):
+    bid = await db.create_broadcast(1, 1, 1)
+    assert (await db.get_broadcast(bid))["status"] == "draft"
+    await db.set_broadcast_status(bid, "running")
+    claimed = [str(r["id"]) for r in await db.claim_broadcasts(60)]
+    assert bid in claimed
+    assert bid not in [str(r["id"]) for r in await db.claim_broadcasts(60)], "lease held"
+    assert await db.checkpoint_broadcast(bid, 10, 3, 1, 0, 60) == "running"
+    assert await db.checkpoint_broadcast(bid, 20, 2, 0, 1, 60) == "running"
+    row = await db.get_broadcast(bid)
+    assert (row["last_user_id"], row["sent"], row["failed"], row["blocked"]) == (20, 5, 1, 1)
+    await db.release_broadcast(bid)
+    assert bid in [str(r["id"]) for r in await db.claim_broadcasts(60)]
+    await db.set_broadcast_status(bid, "cancelled")
+    row = await db.get_broadcast(bid)
+    assert row["finished_at"] is not None and row["locked_until"] is None
+
+
+@check
+async def broadcast_audience_keyset(db):
+    ids = [await make_user(db, language="am") for _ in range(5)]
+    await db.deactivate_users([ids[1]])
+    page = await db.get_broadcast_user_ids(ids[0] - 1, 3, "am")
+    assert page == [ids[0], ids[2], ids[3]]
+    assert await db.get_broadcast_user_ids(ids[3], 1, "am") == [ids[4]]
+    assert await db.count_broadcast_audience("am") >= 4
+
+
+# --- deferred updates ---
+@check
+async def deferred_updates_replay_once_in_order(db):
+    first = new_user_id() * 10
+    updates = [{"update_id": first + i, "message": {"text": f"m{i}"}} for i in (2, 0, 1)]
+    await db.defer_updates(updates)
+    await db.defer_updates(updates[:1])
+    taken = [u for u in await db.take_deferred_updates(1000) if first <= u["update_id"] < first + 3]
+    assert [u["update_id"] for u in taken] == [first, first + 1, first + 2], "once each, oldest first"
+    assert taken[0]["message"] == {"text": "m0"}
+    assert not [u for u in await db.take_deferred_updates(1000) if first <= u["update_id"] < first + 3]
+
+
+# --- runner ---
+async def cleanup_postgres(db: Database) -> None:
+    last = next(_user_ids)
+    await db.pool.execute("DELETE FROM users WHERE id >= $1 AND id < $2", FIRST_USER_ID, last)
+    await db.pool.execute("DELETE FROM styles WHERE name_en LIKE 'Conformance style' OR name_en LIKE 'zz conformance %'")
+    await db.pool.execute("DELETE FROM broadcasts WHERE created_by = 1 AND from_chat_id = 1")
+
+
+async def run_backend(name: str, db) -> int:
+    await db.connect()
+    failures = 0
+    try:
+        for fn in CHECKS:
+            started = time.perf_counter()
+            try:
+                await fn(db)
+            except Exception:
+                failures += 1
+                print(f"FAIL {name} {fn.__name__}")
+                traceback.print_exc()
+            else:
+                print(f"ok   {name} {fn.__name__} ({(time.perf_counter() - started) * 1000:.1f} ms)")
+    finally:
+        if isinstance(db, Database):
+            await cleanup_postgres(db)
+        await db.close()
+    return failures
+
+
+async def main_async(postgres_url: str) -> int:
+    failures = await run_backend("memory", MemoryDatabase())
+    if postgres_url:
+        failures += await run_backend("postgres", Database(postgres_url))
+    print(f"\n{len(CHECKS)} checks per backend, {failures} failed")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Database backend conformance checks")
+    parser.add_argument("--postgres", default="", help="also run against this Postgres URL (writes rows)")
+    args = parser.parse_args()
+    sys.exit(1 if asyncio.run(main_async(args.postgres)) else 0)
+
+
+if __name__ == "__main__":
+    main()
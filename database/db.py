@@ -2,21 +2,31 @@ import asyncpg
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 import json
+import sys
+from utils.cache import user_languages
 from utils.logger import logger
+from utils.singleflight import invalidates_flights, single_flight
+from database.instrumentation import InstrumentedPool, instrument_methods
 
+def _remember_language(user) -> None:
+    if user['language']:
+        user_languages.set(user['id'], sys.intern(user['language']))
+
+
+@instrument_methods
 class Database:
     def __init__(self, database_url: str):
         self.database_url = database_url
-        self.pool: Optional[asyncpg.Pool] = None
+        self.pool: Optional[InstrumentedPool] = None
 
     async def connect(self):
         try:
-            self.pool = await asyncpg.create_pool(
+            self.pool = InstrumentedPool(await asyncpg.create_pool(
                 self.database_url,
                 min_size=5,
                 max_size=20,
                 command_timeout=60
-            )
+            ))
             logger.info("Database connection pool established")
 
             # Ensure tables exist
@@ -107,7 +117,21 @@ class Database:
         """)
 
         # CREDIT TRANSACTIONS
-        await conn.execute(""" CREATE TABLE IF NOT EXISTS credit_transactions ( id UUID PRIMARY KEY DEFAULT gen_random_uuid(), user_id BIGINT REFERENCES users(id) ON DELETE CASCADE, amount INT NOT NULL, transaction_type TEXT CHECK (transaction_type IN ('bonus','purchase','generation','admin_adjustment')), reference_id UUID, balance_after INT NOT NULL, note TEXT, created_at TIMESTAMPTZ DEFAULT now() ); """)
+        await conn.execute(""" CREATE TABLE IF NOT EXISTS credit_transactions ( id UUID PRIMARY KEY DEFAULT gen_random_uuid(), user_id BIGINT REFERENCES users(id) ON DELETE CASCADE, amount INT NOT NULL, transaction_type TEXT CHECK (transaction_type IN ('bonus','purchase','generation','admin_adjustment','refund')), reference_id UUID, balance_after INT NOT NULL, note TEXT, created_at TIMESTAMPTZ DEFAULT now() ); """)
+        # 'refund' (credits returned for a generation that never started) came later; widen older CHECKs once
+        await conn.execute("""
+            DO $$ BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM pg_constraint
+                    WHERE conname = 'credit_transactions_transaction_type_check'
+                      AND pg_get_constraintdef(oid) LIKE '%refund%'
+                ) THEN
+                    ALTER TABLE credit_transactions DROP CONSTRAINT IF EXISTS credit_transactions_transaction_type_check;
+                    ALTER TABLE credit_transactions ADD CONSTRAINT credit_transactions_transaction_type_check
+                        CHECK (transaction_type IN ('bonus','purchase','generation','admin_adjustment','refund'));
+                END IF;
+            END $$;
+        """)
         await conn.execute(""" ALTER TABLE styles ADD COLUMN IF NOT EXISTS preview_image_url TEXT; ALTER TABLE styles ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now(); """)
         await conn.execute(""" ALTER TABLE payments
 ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
@@ -115,11 +139,49 @@ ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
         await conn.execute(""" ALTER TABLE users
 ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
  """)
-        
+
+        # RATE LIMITS (shared throttling buckets, safe to lose on crash)
+        await conn.execute("""
+            CREATE UNLOGGED TABLE IF NOT EXISTS rate_limits (
+                key TEXT PRIMARY KEY,
+                tokens DOUBLE PRECISION NOT NULL,
+                updated_at DOUBLE PRECISION NOT NULL,
+                allowed BOOLEAN NOT NULL DEFAULT TRUE
+            );
+        """)
+
+        # BROADCASTS (progress checkpoint so a job resumes after restart)
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS broadcasts (
+                id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                created_by BIGINT NOT NULL,
+                from_chat_id BIGINT NOT NULL,
+                message_id BIGINT NOT NULL,
+                language TEXT,
+                status TEXT CHECK (status IN ('draft','running','completed','cancelled')) DEFAULT 'draft',
+                last_user_id BIGINT DEFAULT 0,
+                sent INT DEFAULT 0,
+                failed INT DEFAULT 0,
+                blocked INT DEFAULT 0,
+                locked_until TIMESTAMPTZ,
+                created_at TIMESTAMPTZ DEFAULT now(),
+                finished_at TIMESTAMPTZ
+            );
+        """)
+
+        # DEFERRED UPDATES (accepted webhook updates a stopping instance never started; replayed by the next one)
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS deferred_updates (
+                update_id BIGINT PRIMARY KEY,
+                payload JSONB NOT NULL,
+                created_at TIMESTAMPTZ DEFAULT now()
+            );
+        """)
 
         logger.info("Ensured required tables exist")
         
     
+    @invalidates_flights()
     async def reset_schema(self):
         """
         Drops all tables in the schema and recreates them.
@@ -139,6 +201,7 @@ ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
 
         logger.warning("Schema has been reset: all tables dropped and recreated")
 
+    @invalidates_flights("users", per_user=True)
     async def create_user(self, user_id: int, username: Optional[str], first_name: str, language: str, bonus_credits: int) -> Dict[str, Any]:
         async with self.pool.acquire() as conn:
             async with conn.transaction():
@@ -157,9 +220,11 @@ ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
                         VALUES ($1, $2, $3, $4, $5)
                     """, user_id, bonus_credits, 'bonus', bonus_credits, 'Welcome bonus')
 
+                _remember_language(user)
                 return dict(user)
             
     
+    @single_flight(reads=("generations",), per_user=True)
     async def user_has_active_generation(self, user_id: int) -> bool:
         """
         Check if the user has any generation still pending/processing/manual_queue.
@@ -179,6 +244,7 @@ ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
 
     
     
+    @invalidates_flights("styles")
     async def create_style(
         self,
         name_en: str,
@@ -223,32 +289,43 @@ ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
                     is_active,
                     display_order,
                 )
+                # delivered on commit
+                await conn.execute("SELECT pg_notify('styles_changed', $1)", str(style["id"]))
                 return style["id"]
 
 
+    @single_flight(reads=("users",), per_user=True)
     async def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
         async with self.pool.acquire() as conn:
             user = await conn.fetchrow("SELECT * FROM users WHERE id = $1", user_id)
-            return dict(user) if user else None
+            if not user:
+                return None
+            _remember_language(user)
+            return dict(user)
 
+    @invalidates_flights("users", per_user=True)
     async def update_user_language(self, user_id: int, language: str):
         async with self.pool.acquire() as conn:
             await conn.execute("UPDATE users SET language = $1 WHERE id = $2", language, user_id)
+        user_languages.set(user_id, sys.intern(language))
 
     async def update_last_active(self, user_id: int):
         async with self.pool.acquire() as conn:
             await conn.execute("UPDATE users SET last_active = now() WHERE id = $1", user_id)
 
+    @single_flight(reads=("styles",))
     async def get_active_styles(self) -> List[Dict[str, Any]]:
         async with self.pool.acquire() as conn:
             styles = await conn.fetch("SELECT * FROM styles WHERE is_active = true ORDER BY display_order ASC")
             return [dict(style) for style in styles]
 
+    @single_flight(reads=("styles",))
     async def get_style(self, style_id: str) -> Optional[Dict[str, Any]]:
         async with self.pool.acquire() as conn:
             style = await conn.fetchrow("SELECT * FROM styles WHERE id = $1", style_id)
             return dict(style) if style else None
 
+    @invalidates_flights("users", per_user=True)
     async def deduct_credits(self, user_id: int, amount: int) -> bool:
         async with self.pool.acquire() as conn:
             async with conn.transaction():
@@ -258,6 +335,7 @@ ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
                 await conn.execute("INSERT INTO credit_transactions (user_id, amount, transaction_type, balance_after, note) VALUES ($1, $2, $3, $4, $5)", user_id, -amount, 'generation', user['credit_balance'], 'Photo generation')
                 return True
 
+    @invalidates_flights("users", per_user=True)
     async def add_credits(self, user_id: int, amount: int, transaction_type: str) -> int:
         async with self.pool.acquire() as conn:
             async with conn.transaction():
@@ -266,26 +344,31 @@ ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
                 await conn.execute("INSERT INTO credit_transactions (user_id, amount, transaction_type, balance_after) VALUES ($1, $2, $3, $4)", user_id, amount, transaction_type, new_balance)
                 return new_balance
 
+    @invalidates_flights("generations", per_user=True)
     async def create_generation(self, user_id: int, style_id: str, original_photo_url: str, credits_spent: int) -> str:
         async with self.pool.acquire() as conn:
             gen_id = await conn.fetchval("INSERT INTO generations (user_id, style_id, original_photo_url, status, credits_spent) VALUES ($1, $2, $3, $4, $5) RETURNING id", user_id, style_id, original_photo_url, 'pending', credits_spent)
             return str(gen_id)
 
+    @invalidates_flights("generations")
     async def update_generation(self, generation_id: str, status: str, generated_photo_url: Optional[str] = None, error_message: Optional[str] = None, api_provider: Optional[str] = None, processing_time_ms: Optional[int] = None):
         async with self.pool.acquire() as conn:
             completed_at = datetime.utcnow() if status in ['completed', 'failed'] else None
             await conn.execute("UPDATE generations SET status = $1, generated_photo_url = $2, error_message = $3, api_provider = $4, processing_time_ms = $5, completed_at = $6 WHERE id = $7", status, generated_photo_url, error_message, api_provider, processing_time_ms, completed_at, generation_id)
 
+    @single_flight(reads=("generations",))
     async def get_generation(self, generation_id: str) -> Optional[Dict[str, Any]]:
         async with self.pool.acquire() as conn:
             gen = await conn.fetchrow("SELECT * FROM generations WHERE id = $1", generation_id)
             return dict(gen) if gen else None
 
+    @single_flight(reads=("generations", "users", "styles"))
     async def get_manual_queue(self) -> List[Dict[str, Any]]:
         async with self.pool.acquire() as conn:
             gens = await conn.fetch("SELECT g.*, u.first_name, u.username, s.name_en as style_name FROM generations g JOIN users u ON g.user_id = u.id JOIN styles s ON g.style_id = s.id WHERE g.status = 'manual_queue' ORDER BY g.created_at ASC LIMIT 10")
             return [dict(g) for g in gens]
 
+    @invalidates_flights("payments", per_user=True)
     async def create_payment(
         self,
         user_id: int,
@@ -312,16 +395,19 @@ ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
             return str(pid)
 
 
+    @single_flight(reads=("payments", "users"))
     async def get_pending_payments(self, limit: int = 10) -> List[Dict[str, Any]]:
         async with self.pool.acquire() as conn:
             payments = await conn.fetch("SELECT p.*, u.first_name, u.username FROM payments p JOIN users u ON p.user_id = u.id WHERE p.status = 'pending' ORDER BY p.submitted_at ASC LIMIT $1", limit)
             return [dict(p) for p in payments]
 
+    @single_flight(reads=("payments",))
     async def get_payment(self, payment_id: str) -> Optional[Dict[str, Any]]:
         async with self.pool.acquire() as conn:
             p = await conn.fetchrow("SELECT * FROM payments WHERE id = $1", payment_id)
             return dict(p) if p else None
 
+    @invalidates_flights("payments", "users")
     async def approve_payment(self, payment_id: str, admin_id: int) -> bool:
         async with self.pool.acquire() as conn:
             async with conn.transaction():
@@ -331,10 +417,12 @@ ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
                 await self.add_credits(payment['user_id'], payment['credits_amount'], 'purchase')
                 return True
 
+    @invalidates_flights("payments")
     async def reject_payment(self, payment_id: str, admin_id: int, note: str):
         async with self.pool.acquire() as conn:
             await conn.execute("UPDATE payments SET status = 'rejected', admin_id = $1, admin_note = $2, reviewed_at = now() WHERE id = $3", admin_id, note, payment_id)
 
+    @single_flight(reads=("users", "generations", "payments"), ttl=1.0)
     async def get_stats(self) -> Dict[str, Any]:
         async with self.pool.acquire() as conn:
             total_users = await conn.fetchval("SELECT COUNT(*) FROM users")
@@ -343,12 +431,14 @@ ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
             manual_queue = await conn.fetchval("SELECT COUNT(*) FROM generations WHERE status = 'manual_queue'")
             return {'total_users': total_users, 'total_generations': total_gens, 'pending_payments': pending_payments, 'manual_queue': manual_queue}
 
+    @single_flight(reads=("users",))
     async def get_all_users(self, limit: int = 50) -> List[Dict[str, Any]]:
         async with self.pool.acquire() as conn:
             users = await conn.fetch("SELECT id, username, first_name, language, credit_balance, total_generations, is_active, joined_at FROM users ORDER BY joined_at DESC LIMIT $1", limit)
             return [dict(u) for u in users]
         
     
+    @single_flight(reads=("styles",))
     async def get_all_styles(self) -> List[Dict[str, Any]]:
         """
         Return all styles (no filtering). Each row is returned as a dict.
@@ -358,6 +448,7 @@ ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
             rows = await conn.fetch("SELECT * FROM styles ORDER BY display_order ASC, name_en ASC")
             return [dict(r) for r in rows]
 
+    @single_flight(reads=("styles",))
     async def get_styles_paginated(self, page: int = 0, page_size: int = 10) -> List[Dict[str, Any]]:
         """
         Return a page of styles for listing UIs.
@@ -373,6 +464,7 @@ ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
             return [dict(r) for r in rows]
 
     # You already have get_style; keep it as-is. If you want a defensive wrapper:
+    @single_flight(reads=("styles",))
     async def get_style(self, style_id: str) -> Optional[Dict[str, Any]]:
         """
         Return a single style by id (UUID string). Returns None if not found.
@@ -381,6 +473,7 @@ ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
             row = await conn.fetchrow("SELECT * FROM styles WHERE id = $1", style_id)
             return dict(row) if row else None
     
+    @single_flight(reads=("generations", "users", "styles"))
     async def get_manual_queue_paginated(
         self, 
         page: int = 0, 
@@ -411,6 +504,7 @@ ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
             )
             return [dict(r) for r in rows], (total or 0)
 
+    @single_flight(reads=("generations", "users", "styles"))
     async def get_manual_task(self, generation_id: str) -> Optional[Dict[str, Any]]:
         """
         Return a single generation row with joined user and style info for admin manual processing.
@@ -431,6 +525,7 @@ ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
     
         
         # in db.py or wherever your Database class lives
+    @single_flight(reads=("payments", "users"))
     async def get_pending_payments_paginated(
         self,
         page: int = 0,
@@ -462,6 +557,7 @@ ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
 
     
     
+    @single_flight(reads=("users", "generations"))
     async def get_users_paginated(
         self,
         page: int = 0,
@@ -487,6 +583,7 @@ ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
             return [dict(r) for r in rows], (total or 0)
         
     
+    @invalidates_flights("styles")
     async def update_style(self, style_id: int, **fields) -> None:
         """
         Update an existing style by ID.
@@ -517,13 +614,171 @@ ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
             fields.get("preview_image_url"),
             style_id,
         )
+        await self.notify_styles_changed(style_id)
 
+    @invalidates_flights("styles", "generations")
     async def delete_style(self, style_id: str) -> None:
         query = "DELETE FROM styles WHERE id = $1"
         await self.pool.execute(query, style_id)
+        await self.notify_styles_changed(style_id)
 
+    async def notify_styles_changed(self, style_id=None) -> None:
+        """Tell every replica's StyleCatalog to reload."""
+        await self.pool.execute("SELECT pg_notify('styles_changed', $1)", str(style_id or ""))
 
+    # -------------------------
+    # Broadcasts
+    # -------------------------
+    @invalidates_flights("broadcasts")
+    async def create_broadcast(self, created_by: int, from_chat_id: int, message_id: int, language: Optional[str] = None) -> str:
+        async with self.pool.acquire() as conn:
+            bid = await conn.fetchval(
+                """
+                INSERT INTO broadcasts (created_by, from_chat_id, message_id, language)
+                VALUES ($1, $2, $3, $4)
+                RETURNING id
+                """,
+                created_by, from_chat_id, message_id, language
+            )
+            return str(bid)
 
-    
+    @single_flight(reads=("broadcasts",))
+    async def get_broadcast(self, broadcast_id: str) -> Optional[Dict[str, Any]]:
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow("SELECT * FROM broadcasts WHERE id = $1", broadcast_id)
+            return dict(row) if row else None
+
+    @single_flight(reads=("broadcasts",))
+    async def get_recent_broadcasts(self, limit: int = 5) -> List[Dict[str, Any]]:
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("SELECT * FROM broadcasts ORDER BY created_at DESC LIMIT $1", limit)
+            return [dict(r) for r in rows]
+
+    @invalidates_flights("broadcasts")
+    async def set_broadcast_status(self, broadcast_id: str, status: str) -> None:
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                """
+                UPDATE broadcasts
+                SET status = $1,
+                    finished_at = CASE WHEN $1 IN ('completed','cancelled') THEN now() ELSE finished_at END,
+                    locked_until = CASE WHEN $1 = 'running' THEN locked_until ELSE NULL END
+                WHERE id = $2
+                """,
+                status, broadcast_id
+            )
+
+    @invalidates_flights("broadcasts")
+    async def claim_broadcasts(self, lease_seconds: float) -> List[Dict[str, Any]]:
+        """
+        Take a lease on every running broadcast that no live instance owns.
+        Returns the claimed rows; the caller must keep the lease alive through checkpoints.
+        """
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                UPDATE broadcasts
+                SET locked_until = now() + make_interval(secs => $1)
+                WHERE status = 'running' AND (locked_until IS NULL OR locked_until < now())
+                RETURNING *
+                """,
+                float(lease_seconds)
+            )
+            return [dict(r) for r in rows]
+
+    @invalidates_flights("broadcasts")
+    async def release_broadcast(self, broadcast_id: str) -> None:
+        async with self.pool.acquire() as conn:
+            await conn.execute("UPDATE broadcasts SET locked_until = NULL WHERE id = $1", broadcast_id)
 
+    @invalidates_flights("broadcasts")
+    async def checkpoint_broadcast(
+        self,
+        broadcast_id: str,
+        last_user_id: int,
+        sent: int,
+        failed: int,
+        blocked: int,
+        lease_seconds: float
+    ) -> Optional[str]:
+        """
+        Record progress after a batch (counters are increments) and extend the lease.
+        Returns the current status so a cancelled job can stop.
+        """
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval(
+                """
+                UPDATE broadcasts
+                SET last_user_id = $2,
+                    sent = sent + $3,
+                    failed = failed + $4,
+                    blocked = blocked + $5,
+                    locked_until = now() + make_interval(secs => $6)
+                WHERE id = $1
+                RETURNING status
+                """,
+                broadcast_id, last_user_id, sent, failed, blocked, float(lease_seconds)
+            )
+
+    @single_flight(reads=("users",))
+    async def count_broadcast_audience(self, language: Optional[str] = None) -> int:
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval(
+                "SELECT COUNT(*) FROM users WHERE is_active = TRUE AND ($1::text IS NULL OR language = $1)",
+                language
+            ) or 0
 
+    async def get_broadcast_user_ids(self, after_id: int, limit: int, language: Optional[str] = None) -> List[int]:
+        """
+        Keyset page of active user ids (id > after_id, ascending) for broadcasting.
+        Uses the primary key index, so cost does not grow with the offset.
+        """
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT id FROM users
+                WHERE id > $1 AND is_active = TRUE AND ($3::text IS NULL OR language = $3)
+                ORDER BY id
+                LIMIT $2
+                """,
+                after_id, limit, language
+            )
+            return [r["id"] for r in rows]
+
+    @invalidates_flights("users")
+    async def deactivate_users(self, user_ids: List[int]) -> None:
+        if not user_ids:
+            return
+        async with self.pool.acquire() as conn:
+            await conn.execute("UPDATE users SET is_active = FALSE WHERE id = ANY($1::bigint[])", user_ids)
+
+    # -------------------------
+    # Deferred webhook updates
+    # -------------------------
+    async def defer_updates(self, updates: List[Dict[str, Any]]) -> None:
+        """Store accepted updates for another instance to process; an update stored twice is kept once."""
+        if not updates:
+            return
+        async with self.pool.acquire() as conn:
+            await conn.executemany(
+                "INSERT INTO deferred_updates (update_id, payload) VALUES ($1, $2) ON CONFLICT (update_id) DO NOTHING",
+                [(u["update_id"], json.dumps(u)) for u in updates]
+            )
+
+    async def take_deferred_updates(self, limit: int) -> List[Dict[str, Any]]:
+        """Remove and return up to `limit` deferred updates, oldest update_id first."""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                DELETE FROM deferred_updates
+                WHERE update_id IN (
+                    SELECT update_id FROM deferred_updates
+                    ORDER BY update_id
+                    LIMIT $1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING update_id, payload
+                """,
+                limit
+            )
+            return [json.loads(r["payload"]) for r in sorted(rows, key=lambda r: r["update_id"])]
@@ -0,0 +1,217 @@
+# database/instrumentation.py
+"""
+Timing for everything that touches Postgres.
+
+- `instrument_methods` wraps every public coroutine of `Database`: latency
+  histogram, error count and a slow-call log per method.
+  Inside a traced update each call is also a `db.<method>` span.
+- `InstrumentedPool` wraps the asyncpg pool: time spent waiting in
+  `acquire()`, and every statement run on an acquired connection is timed,
+  counted (rows returned/affected) and attributed to the calling method.
+  Statements slower than the threshold are logged with SQL and parameters.
+
+`db_stats()` returns a JSON-ready summary for the /dbstats route and the
+admin command.
+"""
+import functools
+import inspect
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Optional
+
+from config.settings import settings
+from utils.logger import logger
+from utils.metrics import Counter, Gauge, Histogram
+from utils.tracing import tracer
+
+DB_METHOD_SECONDS = Histogram("flexa_db_method_seconds", "Database method latency, including pool wait", ["method"])
+DB_METHOD_ERRORS = Counter("flexa_db_method_errors_total", "Database methods that raised", ["method"])
+DB_QUERY_SECONDS = Histogram("flexa_db_query_seconds", "Single statement latency", ["method"])
+DB_ROWS = Counter("flexa_db_rows_total", "Rows returned or affected", ["method"])
+DB_POOL_WAIT = Histogram(
+    "flexa_db_pool_wait_seconds", "Time spent waiting for a pooled connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+DB_POOL_SIZE = Gauge("flexa_db_pool_size", "Open pooled connections")
+DB_POOL_MAX = Gauge("flexa_db_pool_max", "Pool max_size")
+DB_POOL_IN_USE = Gauge("flexa_db_pool_in_use", "Pooled connections currently acquired")
+
+# Database method currently running in this task, for statement attribution
+current_method: ContextVar[str] = ContextVar("current_db_method", default="other")
+
+_QUERY_METHODS = ("execute", "executemany", "fetch", "fetchrow", "fetchval")
+
+
+class _SlowLog:
+    def __init__(self, threshold: float = 0.2, keep: int = 50):
+        self.threshold = threshold
+        self.entries: Deque[Dict[str, Any]] = deque(maxlen=keep)
+
+    def record(self, method: str, sql: str, args: tuple, elapsed: float) -> None:
+        sql = " ".join(sql.split())
+        params = ", ".join(repr(a)[:80] for a in args)
+        logger.warning(f"[db] slow query in {method}: {elapsed * 1000:.0f} ms: {sql[:500]} | params: ({params[:500]})")
+        # params stay in the log only; the stats endpoint shows SQL text
+        self.entries.append({"method": method, "ms": round(elapsed * 1000, 1), "sql": sql[:300], "at": time.time()})
+
+
+slow_log = _SlowLog(threshold=settings.DB_SLOW_QUERY_MS / 1000)
+
+
+def _row_count(name: str, result: Any) -> int:
+    if name == "fetch":
+        return len(result)
+    if name == "fetchrow":
+        return 0 if result is None else 1
+    if name == "fetchval":
+        return 0 if result is None else 1
+    if name == "execute" and isinstance(result, str):
+        # command tag, e.g. "UPDATE 3", "INSERT 0 1", "SELECT 1"
+        last = result.rsplit(" ", 1)[-1]
+        return int(last) if last.isdigit() else 0
+    return 0
+
+
+class InstrumentedConnection:
+    """Proxy for an asyncpg connection that times each statement."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        attr = getattr(self._conn, name)
+        if name not in _QUERY_METHODS:
+            return attr
+
+        async def timed(query, *args, **kwargs):
+            method = current_method.get()
+            started = time.perf_counter()
+            try:
+                return_value = await attr(query, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                DB_QUERY_SECONDS.labels(method).observe(elapsed)
+                if elapsed >= slow_log.threshold:
+                    slow_log.record(method, query, args, elapsed)
+            DB_ROWS.labels(method).inc(_row_count(name, return_value))
+            return return_value
+
+        return timed
+
+
+class InstrumentedPool:
+    """Proxy for an asyncpg pool: measures acquire wait and hands out instrumented connections."""
+
+    def __init__(self, pool):
+        self._pool = pool
+        DB_POOL_SIZE.set_function(pool.get_size)
+        DB_POOL_MAX.set_function(pool.get_max_size)
+        DB_POOL_IN_USE.set_function(lambda: pool.get_size() - pool.get_idle_size())
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+    @asynccontextmanager
+    async def acquire(self, timeout: Optional[float] = None):
+        started = time.perf_counter()
+        async with self._pool.acquire(timeout=timeout) as conn:
+            DB_POOL_WAIT.observe(time.perf_counter() - started)
+            yield InstrumentedConnection(conn)
+
+    async def _run(self, name: str, query: str, *args, **kwargs):
+        async with self.acquire() as conn:
+            return await getattr(conn, name)(query, *args, **kwargs)
+
+    async def execute(self, query: str, *args, **kwargs):
+        return await self._run("execute", query, *args, **kwargs)
+
+    async def fetch(self, query: str, *args, **kwargs):
+        return await self._run("fetch", query, *args, **kwargs)
+
+    async def fetchrow(self, query: str, *args, **kwargs):
+        return await self._run("fetchrow", query, *args, **kwargs)
+
+    async def fetchval(self, query: str, *args, **kwargs):
+        return await self._run("fetchval", query, *args, **kwargs)
+
+
+def _instrument(fn):
+    method = fn.__name__
+    span_name = f"db.{method}"
+    latency = DB_METHOD_SECONDS.labels(method)
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        token = current_method.set(method)
+        started = time.perf_counter()
+        try:
+            with tracer.span(span_name):
+                return await fn(*args, **kwargs)
+        except Exception:
+            DB_METHOD_ERRORS.labels(method).inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            latency.observe(elapsed)
+            current_method.reset(token)
+            if elapsed >= slow_log.threshold * 2:
+                logger.warning(f"[db] slow call {method}: {elapsed * 1000:.0f} ms")
+
+    return wrapper
+
+
+def instrument_methods(cls):
+    """Class decorator: instrument every public coroutine method except connect/close."""
+    for name, fn in list(vars(cls).items()):
+        if name.startswith("_") or name in ("connect", "close") or not inspect.iscoroutinefunction(fn):
+            continue
+        setattr(cls, name, _instrument(fn))
+    return cls
+
+
+def _ms(seconds: float) -> Optional[float]:
+    """Bucket bound in ms; None when the value is past the last bucket."""
+    return None if seconds == float("inf") else round(seconds * 1000, 3)
+
+
+def db_stats(pool=None, top: int = 15) -> Dict[str, Any]:
+    methods = []
+    for (method,), child in DB_METHOD_SECONDS._children.items():
+        if not child.count:
+            continue
+        rows = DB_ROWS._children.get((method,))
+        errors = DB_METHOD_ERRORS._children.get((method,))
+        methods.append({
+            "method": method,
+            "calls": child.count,
+            "total_ms": round(child.sum * 1000, 1),
+            "avg_ms": round(child.sum / child.count * 1000, 2),
+            "p50_ms": _ms(child.quantile(0.5)),
+            "p95_ms": _ms(child.quantile(0.95)),
+            "p99_ms": _ms(child.quantile(0.99)),
+            "rows": int(rows.value) if rows else 0,
+            "errors": int(errors.value) if errors else 0,
+        })
+    methods.sort(key=lambda m: m["total_ms"], reverse=True)
+
+    wait = DB_POOL_WAIT.labels()
+    stats: Dict[str, Any] = {
+        "methods": methods[:top],
+        "pool_wait": {
+            "acquires": wait.count,
+            "avg_ms": round(wait.sum / wait.count * 1000, 3) if wait.count else 0.0,
+            "p95_ms": _ms(wait.quantile(0.95)),
+            "p99_ms": _ms(wait.quantile(0.99)),
+        },
+        "slow_threshold_ms": slow_log.threshold * 1000,
+        "slow_queries": list(slow_log.entries)[-10:],
+    }
+    if pool is not None:
+        try:
+            stats["pool"] = {"size": pool.get_size(), "idle": pool.get_idle_size(), "max": pool.get_max_size()}
+        except Exception:
+            pass
+    return stats
@@ -0,0 +1,498 @@
+# database/memory.py
+"""
+In-memory implementation of the `Database` interface.
+
+For benchmarks and tests of the handler layer without Postgres:
+
+    db = MemoryDatabase()
+    await db.connect()
+    app_context = AppContext(db=db, ...)
+
+Rows are plain dicts shaped like the asyncpg rows `Database` returns: UUID
+ids, TIMESTAMPTZ columns as aware datetimes, the later `created_at` columns
+as naive ones, and JSONB as a JSON string. Every method runs without
+awaiting in between, so credit updates and lease claims are atomic, the same
+way the SQL statements are. Orderings, limits and quirks follow the SQL,
+including the ones that look odd (see `create_user` and
+`get_users_paginated`). `python -m database.conformance` checks that both
+backends agree.
+
+Not modelled: foreign keys (except ON DELETE SET NULL for styles), the
+`rate_limits` table and NOTIFY. `notify_styles_changed` does nothing, and
+`pool` stays None.
+"""
+import json
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from utils.cache import user_languages
+from utils.logger import logger
+from utils.singleflight import invalidates_flights, single_flight
+from database.db import _remember_language
+from database.instrumentation import instrument_methods
+
+_USER_DEFAULTS = {"language": "en", "credit_balance": 0, "total_generations": 0, "is_active": True, "is_admin": False}
+_STYLE_REQUIRED = ("name_en", "prompt_template", "credit_cost")
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _local_now() -> datetime:
+    # the columns added later are TIMESTAMP (without time zone), filled by now() in the server zone
+    return datetime.now()
+
+
+def _uuid(value) -> uuid.UUID:
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+
+def _check_not_null(style: Dict[str, Any]) -> None:
+    for column in _STYLE_REQUIRED:
+        if style.get(column) is None:
+            raise ValueError(f'null value in column "{column}" of relation "styles" violates not-null constraint')
+
+
+@instrument_methods
+class MemoryDatabase:
+    def __init__(self, database_url: str = "memory://"):
+        self.database_url = database_url
+        self.pool = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self.users: Dict[int, Dict[str, Any]] = {}
+        self.styles: Dict[uuid.UUID, Dict[str, Any]] = {}
+        self.generations: Dict[uuid.UUID, Dict[str, Any]] = {}
+        self.payments: Dict[uuid.UUID, Dict[str, Any]] = {}
+        self.credit_transactions: List[Dict[str, Any]] = []
+        self.broadcasts: Dict[uuid.UUID, Dict[str, Any]] = {}
+        self.deferred_updates: Dict[int, str] = {}
+
+    async def connect(self):
+        logger.info("In-memory database ready")
+
+    async def close(self):
+        pass
+
+    @invalidates_flights()
+    async def reset_schema(self):
+        broadcasts, deferred = self.broadcasts, self.deferred_updates
+        self._reset()
+        # reset_schema leaves the broadcasts and deferred_updates tables alone
+        self.broadcasts, self.deferred_updates = broadcasts, deferred
+        logger.warning("Schema has been reset: all tables dropped and recreated")
+
+    # -------------------------
+    # Users
+    # -------------------------
+    def _add_transaction(self, user_id: int, amount: int, transaction_type: str, balance_after: int,
+                         note: Optional[str] = None) -> None:
+        self.credit_transactions.append({
+            "id": uuid.uuid4(), "user_id": user_id, "amount": amount, "transaction_type": transaction_type,
+            "reference_id": None, "balance_after": balance_after, "note": note, "created_at": _now(),
+        })
+
+    @invalidates_flights("users", per_user=True)
+    async def create_user(self, user_id: int, username: Optional[str], first_name: str, language: str, bonus_credits: int) -> Dict[str, Any]:
+        user = self.users.get(user_id)
+        if user is None:
+            now = _now()
+            user = self.users[user_id] = {
+                "id": user_id, "username": username, "first_name": first_name, **_USER_DEFAULTS,
+                "language": language, "credit_balance": bonus_credits,
+                "joined_at": now, "last_active": now, "created_at": _local_now(),
+            }
+        else:
+            user.update(username=username, last_active=_now())
+
+        # same check as the SQL: an existing user whose balance equals the bonus gets another bonus row
+        if user["credit_balance"] == bonus_credits:
+            self._add_transaction(user_id, bonus_credits, "bonus", bonus_credits, "Welcome bonus")
+        _remember_language(user)
+        return dict(user)
+
+    @single_flight(reads=("generations",), per_user=True)
+    async def user_has_active_generation(self, user_id: int) -> bool:
+        return any(g["user_id"] == user_id and g["status"] in ("pending", "processing", "manual_queue")
+                   for g in self.generations.values())
+
+    @single_flight(reads=("users",), per_user=True)
+    async def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
+        user = self.users.get(user_id)
+        if not user:
+            return None
+        _remember_language(user)
+        return dict(user)
+
+    @invalidates_flights("users", per_user=True)
+    async def update_user_language(self, user_id: int, language: str):
+        if user_id in self.users:
+            self.users[user_id]["language"] = language
+        user_languages.set(user_id, sys.intern(language))
+
+    async def update_last_active(self, user_id: int):
+        if user_id in self.users:
+            self.users[user_id]["last_active"] = _now()
+
+    @single_flight(reads=("users",))
+    async def get_all_users(self, limit: int = 50) -> List[Dict[str, Any]]:
+        columns = ("id", "username", "first_name", "language", "credit_balance", "total_generations", "is_active", "joined_at")
+        users = sorted(self.users.values(), key=lambda u: u["joined_at"], reverse=True)[:limit]
+        return [{c: u[c] for c in columns} for u in users]
+
+    @single_flight(reads=("users", "generations"))
+    async def get_users_paginated(
+        self,
+        page: int = 0,
+        page_size: int = 5
+    ) -> tuple[list[dict], int]:
+        offset = page * page_size
+        users = sorted(self.users.values(), key=lambda u: u["created_at"])[offset:offset + page_size]
+        # the SQL selects u.* and then a generations count under the same name; the count wins
+        counts: Dict[int, int] = {}
+        for g in self.generations.values():
+            counts[g["user_id"]] = counts.get(g["user_id"], 0) + 1
+        return [{**u, "total_generations": counts.get(u["id"], 0)} for u in users], len(self.users)
+
+    # -------------------------
+    # Credits
+    # -------------------------
+    @invalidates_flights("users", per_user=True)
+    async def deduct_credits(self, user_id: int, amount: int) -> bool:
+        user = self.users.get(user_id)
+        if not user or user["credit_balance"] < amount:
+            return False
+        user["credit_balance"] -= amount
+        user["total_generations"] += 1
+        self._add_transaction(user_id, -amount, "generation", user["credit_balance"], "Photo generation")
+        return True
+
+    @invalidates_flights("users", per_user=True)
+    async def add_credits(self, user_id: int, amount: int, transaction_type: str) -> int:
+        user = self.users.get(user_id)
+        if user is None:
+            # the SQL version fails the same way: RETURNING gives no row
+            raise TypeError("'NoneType' object is not subscriptable")
+        user["credit_balance"] += amount
+        self._add_transaction(user_id, amount, transaction_type, user["credit_balance"])
+        return user["credit_balance"]
+
+    # -------------------------
+    # Styles
+    # -------------------------
+    @invalidates_flights("styles")
+    async def create_style(
+        self,
+        name_en: str,
+        name_am: Optional[str],
+        description_en: Optional[str],
+        description_am: Optional[str],
+        prompt_template: str,
+        credit_cost: int,
+        preview_image_url: Optional[str] = None,
+        is_active: bool = True,
+        display_order: int = 0,
+    ) -> int:
+        style = {
+            "id": uuid.uuid4(), "name_en": name_en, "name_am": name_am,
+            "description_en": description_en, "description_am": description_am,
+            "prompt_template": prompt_template, "credit_cost": credit_cost, "is_active": is_active,
+            "display_order": display_order, "preview_image_url": preview_image_url, "created_at": _local_now(),
+        }
+        _check_not_null(style)
+        self.styles[style["id"]] = style
+        await self.notify_styles_changed(style["id"])
+        return style["id"]
+
+    @single_flight(reads=("styles",))
+    async def get_active_styles(self) -> List[Dict[str, Any]]:
+        styles = sorted((s for s in self.styles.values() if s["is_active"]), key=lambda s: s["display_order"])
+        return [dict(s) for s in styles]
+
+    def _sorted_styles(self) -> List[Dict[str, Any]]:
+        return sorted(self.styles.values(), key=lambda s: (s["display_order"], s["name_en"]))
+
+    @single_flight(reads=("styles",))
+    async def get_all_styles(self) -> List[Dict[str, Any]]:
+        return [dict(s) for s in self._sorted_styles()]
+
+    @single_flight(reads=("styles",))
+    async def get_styles_paginated(self, page: int = 0, page_size: int = 10) -> List[Dict[str, Any]]:
+        offset = page * page_size
+        return [dict(s) for s in self._sorted_styles()[offset:offset + page_size]]
+
+    @single_flight(reads=("styles",))
+    async def get_style(self, style_id: str) -> Optional[Dict[str, Any]]:
+        style = self.styles.get(_uuid(style_id))
+        return dict(style) if style else None
+
+    @invalidates_flights("styles")
+    async def update_style(self, style_id: int, **fields) -> None:
+        style = self.styles.get(_uuid(style_id))
+        if style is not None:
+            # every column is written; missing fields become NULL, as in the SQL
+            updated = {**style, **{c: fields.get(c) for c in (
+                "name_en", "name_am", "description_en", "description_am", "prompt_template",
+                "credit_cost", "is_active", "display_order", "preview_image_url")}}
+            _check_not_null(updated)
+            style.update(updated)
+        await self.notify_styles_changed(style_id)
+
+    @invalidates_flights("styles", "generations")
+    async def delete_style(self, style_id: str) -> None:
+        key = _uuid(style_id)
+        if self.styles.pop(key, None) is not None:
+            for g in self.generations.values():
+                if g["style_id"] == key:
+                    g["style_id"] = None
+        await self.notify_styles_changed(style_id)
+
+    async def notify_styles_changed(self, style_id=None) -> None:
+        """Nothing listens in memory; StyleCatalog users call `refresh()` themselves."""
+
+    # -------------------------
+    # Generations
+    # -------------------------
+    @invalidates_flights("generations", per_user=True)
+    async def create_generation(self, user_id: int, style_id: str, original_photo_url: str, credits_spent: int) -> str:
+        gen_id = uuid.uuid4()
+        self.generations[gen_id] = {
+            "id": gen_id, "user_id": user_id, "style_id": _uuid(style_id) if style_id is not None else None,
+            "status": "pending", "original_photo_url": original_photo_url, "generated_photo_url": None,
+            "credits_spent": credits_spent, "error_message": None, "api_provider": None,
+            "processing_time_ms": None, "created_at": _now(), "completed_at": None,
+        }
+        return str(gen_id)
+
+    @invalidates_flights("generations")
+    async def update_generation(self, generation_id: str, status: str, generated_photo_url: Optional[str] = None, error_message: Optional[str] = None, api_provider: Optional[str] = None, processing_time_ms: Optional[int] = None):
+        gen = self.generations.get(_uuid(generation_id))
+        if gen is not None:
+            gen.update(
+                status=status, generated_photo_url=generated_photo_url, error_message=error_message,
+                api_provider=api_provider, processing_time_ms=processing_time_ms,
+                completed_at=_now() if status in ("completed", "failed") else None,
+            )
+
+    @single_flight(reads=("generations",))
+    async def get_generation(self, generation_id: str) -> Optional[Dict[str, Any]]:
+        gen = self.generations.get(_uuid(generation_id))
+        return dict(gen) if gen else None
+
+    def _manual_rows(self, inner: bool) -> List[Dict[str, Any]]:
+        rows = []
+        for g in sorted(self.generations.values(), key=lambda g: g["created_at"]):
+            if g["status"] != "manual_queue":
+                continue
+            row = self._generation_row(g, inner)
+            if row is not None:
+                rows.append(row)
+        return rows
+
+    def _generation_row(self, g: Dict[str, Any], inner: bool) -> Optional[Dict[str, Any]]:
+        user = self.users.get(g["user_id"])
+        style = self.styles.get(g["style_id"]) if g["style_id"] is not None else None
+        if inner and (user is None or style is None):
+            return None
+        row = {**g, "first_name": user and user["first_name"], "username": user and user["username"],
+               "style_name": style and style["name_en"]}
+        if not inner:
+            row["prompt_template"] = style and style["prompt_template"]
+        return row
+
+    @single_flight(reads=("generations", "users", "styles"))
+    async def get_manual_queue(self) -> List[Dict[str, Any]]:
+        return self._manual_rows(inner=True)[:10]
+
+    @single_flight(reads=("generations", "users", "styles"))
+    async def get_manual_queue_paginated(
+        self,
+        page: int = 0,
+        page_size: int = 5
+    ) -> tuple[list[dict[str, Any]], int]:
+        offset = page * page_size
+        rows = self._manual_rows(inner=False)
+        return rows[offset:offset + page_size], len(rows)
+
+    @single_flight(reads=("generations", "users", "styles"))
+    async def get_manual_task(self, generation_id: str) -> Optional[Dict[str, Any]]:
+        gen = self.generations.get(_uuid(generation_id))
+        return self._generation_row(gen, inner=False) if gen else None
+
+    # -------------------------
+    # Payments
+    # -------------------------
+    @invalidates_flights("payments", per_user=True)
+    async def create_payment(
+        self,
+        user_id: int,
+        package_type: str,
+        amount_birr: int,
+        credits_amount: int,
+        screenshot_url: str,
+        ocr_data: Optional[Dict] = None,
+        status: str = "pending"
+    ) -> str:
+        pid = uuid.uuid4()
+        self.payments[pid] = {
+            "id": pid, "user_id": user_id, "package_type": package_type, "amount_birr": amount_birr,
+            "credits_amount": credits_amount, "screenshot_url": screenshot_url,
+            "ocr_extracted_data": json.dumps(ocr_data) if ocr_data else None, "status": status,
+            "admin_id": None, "admin_note": None, "submitted_at": _now(), "reviewed_at": None,
+            "created_at": _local_now(),
+        }
+        return str(pid)
+
+    def _pending_payments(self, order_by: str) -> List[Dict[str, Any]]:
+        rows = []
+        for p in sorted(self.payments.values(), key=lambda p: p[order_by]):
+            if p["status"] == "pending":
+                user = self.users.get(p["user_id"])
+                rows.append({**p, "first_name": user and user["first_name"], "username": user and user["username"]})
+        return rows
+
+    @single_flight(reads=("payments", "users"))
+    async def get_pending_payments(self, limit: int = 10) -> List[Dict[str, Any]]:
+        # inner join: payments of deleted users are skipped
+        rows = [p for p in self._pending_payments("submitted_at") if p["user_id"] in self.users]
+        return rows[:limit]
+
+    @single_flight(reads=("payments", "users"))
+    async def get_pending_payments_paginated(
+        self,
+        page: int = 0,
+        page_size: int = 5
+    ) -> tuple[list[dict[str, Any]], int]:
+        offset = page * page_size
+        rows = self._pending_payments("created_at")
+        return rows[offset:offset + page_size], len(rows)
+
+    @single_flight(reads=("payments",))
+    async def get_payment(self, payment_id: str) -> Optional[Dict[str, Any]]:
+        payment = self.payments.get(_uuid(payment_id))
+        return dict(payment) if payment else None
+
+    @invalidates_flights("payments", "users")
+    async def approve_payment(self, payment_id: str, admin_id: int) -> bool:
+        payment = self.payments.get(_uuid(payment_id))
+        if payment is None or payment["status"] != "pending":
+            return False
+        payment.update(status="approved", admin_id=admin_id, reviewed_at=_now())
+        await self.add_credits(payment["user_id"], payment["credits_amount"], "purchase")
+        return True
+
+    @invalidates_flights("payments")
+    async def reject_payment(self, payment_id: str, admin_id: int, note: str):
+        payment = self.payments.get(_uuid(payment_id))
+        if payment is not None:
+            payment.update(status="rejected", admin_id=admin_id, admin_note=note, reviewed_at=_now())
+
+    @single_flight(reads=("users", "generations", "payments"), ttl=1.0)
+    async def get_stats(self) -> Dict[str, Any]:
+        return {
+            "total_users": len(self.users),
+            "total_generations": len(self.generations),
+            "pending_payments": sum(p["status"] == "pending" for p in self.payments.values()),
+            "manual_queue": sum(g["status"] == "manual_queue" for g in self.generations.values()),
+        }
+
+    # -------------------------
+    # Broadcasts
+    # -------------------------
+    @invalidates_flights("broadcasts")
+    async def create_broadcast(self, created_by: int, from_chat_id: int, message_id: int, language: Optional[str] = None) -> str:
+        bid = uuid.uuid4()
+        self.broadcasts[bid] = {
+            "id": bid, "created_by": created_by, "from_chat_id": from_chat_id, "message_id": message_id,
+            "language": language, "status": "draft", "last_user_id": 0, "sent": 0, "failed": 0, "blocked": 0,
+            "locked_until": None, "created_at": _now(), "finished_at": None,
+        }
+        return str(bid)
+
+    @single_flight(reads=("broadcasts",))
+    async def get_broadcast(self, broadcast_id: str) -> Optional[Dict[str, Any]]:
+        row = self.broadcasts.get(_uuid(broadcast_id))
+        return dict(row) if row else None
+
+    @single_flight(reads=("broadcasts",))
+    async def get_recent_broadcasts(self, limit: int = 5) -> List[Dict[str, Any]]:
+        rows = sorted(self.broadcasts.values(), key=lambda b: b["created_at"], reverse=True)[:limit]
+        return [dict(r) for r in rows]
+
+    @invalidates_flights("broadcasts")
+    async def set_broadcast_status(self, broadcast_id: str, status: str) -> None:
+        row = self.broadcasts.get(_uuid(broadcast_id))
+        if row is None:
+            return
+        if status in ("completed", "cancelled"):
+            row["finished_at"] = _now()
+        if status != "running":
+            row["locked_until"] = None
+        row["status"] = status
+
+    @invalidates_flights("broadcasts")
+    async def claim_broadcasts(self, lease_seconds: float) -> List[Dict[str, Any]]:
+        now = _now()
+        claimed = []
+        for row in self.broadcasts.values():
+            if row["status"] == "running" and (row["locked_until"] is None or row["locked_until"] < now):
+                row["locked_until"] = now + timedelta(seconds=float(lease_seconds))
+                claimed.append(dict(row))
+        return claimed
+
+    @invalidates_flights("broadcasts")
+    async def release_broadcast(self, broadcast_id: str) -> None:
+        row = self.broadcasts.get(_uuid(broadcast_id))
+        if row is not None:
+            row["locked_until"] = None
+
+    @invalidates_flights("broadcasts")
+    async def checkpoint_broadcast(
+        self,
+        broadcast_id: str,
+        last_user_id: int,
+        sent: int,
+        failed: int,
+        blocked: int,
+        lease_seconds: float
+    ) -> Optional[str]:
+        row = self.broadcasts.get(_uuid(broadcast_id))
+        if row is None:
+            return None
+        row["last_user_id"] = last_user_id
+        row["sent"] += sent
+        row["failed"] += failed
+        row["blocked"] += blocked
+        row["locked_until"] = _now() + timedelta(seconds=float(lease_seconds))
+        return row["status"]
+
+    def _audience(self, language: Optional[str]):
+        return (u for u in self.users.values() if u["is_active"] and (language is None or u["language"] == language))
+
+    @single_flight(reads=("users",))
+    async def count_broadcast_audience(self, language: Optional[str] = None) -> int:
+        return sum(1 for _ in self._audience(language))
+
+    async def get_broadcast_user_ids(self, after_id: int, limit: int, language: Optional[str] = None) -> List[int]:
+        return sorted(u["id"] for u in self._audience(language) if u["id"] > after_id)[:limit]
+
+    @invalidates_flights("users")
+    async def deactivate_users(self, user_ids: List[int]) -> None:
+        for user_id in user_ids:
+            if user_id in self.users:
+                self.users[user_id]["is_active"] = False
+
+    # -------------------------
+    # Deferred webhook updates
+    # -------------------------
+    async def defer_updates(self, updates: List[Dict[str, Any]]) -> None:
+        for update in updates:
+            self.deferred_updates.setdefault(update["update_id"], json.dumps(update))
+
+    async def take_deferred_updates(self, limit: int) -> List[Dict[str, Any]]:
+        taken = sorted(self.deferred_updates)[:limit]
+        return [json.loads(self.deferred_updates.pop(update_id)) for update_id in taken]
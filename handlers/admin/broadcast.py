@@ -0,0 +1,122 @@
+# handlers/admin/broadcast.py
+from aiogram import Router, F
+from aiogram.filters import Command, CommandObject
+from aiogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKeyboardButton
+
+from config.settings import settings
+from app_context import AppContext
+from utils.logger import logger
+
+router = Router()
+
+def is_admin(user_id: int) -> bool:
+    return user_id in settings.ADMIN_IDS
+
+STATUS_ICONS = {
+    "draft": "📝",
+    "running": "🚀",
+    "completed": "✅",
+    "cancelled": "🛑",
+}
+
+def render_broadcast_line(b: dict) -> str:
+    icon = STATUS_ICONS.get(b["status"], "•")
+    created = b["created_at"].strftime("%Y-%m-%d %H:%M") if b.get("created_at") else "—"
+    lang = b.get("language") or "all"
+    return (
+        f"{icon} <code>{str(b['id'])[:8]}</code> {b['status']} ({lang}) — {created}\n"
+        f"    ✅ {b['sent']}  🚫 {b['blocked']}  ⚠️ {b['failed']}"
+    )
+
+
+@router.message(Command("broadcast"))
+async def broadcast_command(message: Message, command: CommandObject, app_context: AppContext):
+    if not is_admin(message.from_user.id):
+        await message.answer("❌ You are not authorized to use this command.")
+        return
+
+    if not message.reply_to_message:
+        await message.answer(
+            "📣 Reply to the message you want to broadcast with /broadcast\n"
+            "Use <code>/broadcast en</code> or <code>/broadcast am</code> to target one language.",
+            parse_mode="HTML"
+        )
+        return
+
+    language = (command.args or "").strip().lower() or None
+    if language and language not in ("en", "am"):
+        await message.answer("⚠️ Language must be <code>en</code> or <code>am</code>.", parse_mode="HTML")
+        return
+
+    audience = await app_context.db.count_broadcast_audience(language)
+    broadcast_id = await app_context.db.create_broadcast(
+        created_by=message.from_user.id,
+        from_chat_id=message.chat.id,
+        message_id=message.reply_to_message.message_id,
+        language=language
+    )
+    kb = InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="🚀 Send", callback_data=f"broadcast:confirm:{broadcast_id}"),
+        InlineKeyboardButton(text="❌ Cancel", callback_data=f"broadcast:cancel:{broadcast_id}"),
+    ]])
+    await message.answer(
+        f"📣 Send the replied message to <b>{audience}</b> active user(s) ({language or 'all languages'})?",
+        reply_markup=kb,
+        parse_mode="HTML"
+    )
+
+
+@router.callback_query(F.data.startswith("broadcast:"))
+async def broadcast_callback(callback: CallbackQuery, app_context: AppContext):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("❌ Not authorized", show_alert=True)
+        return
+
+    _, action, broadcast_id = callback.data.split(":", 2)
+    broadcast = await app_context.db.get_broadcast(broadcast_id)
+    if not broadcast:
+        await callback.answer("Broadcast not found", show_alert=True)
+        return
+
+    if action == "confirm":
+        if broadcast["status"] != "draft":
+            await callback.answer(f"Already {broadcast['status']}", show_alert=True)
+            return
+        await app_context.broadcast_service.start(broadcast_id)
+        logger.info(f"[broadcast] {broadcast_id} started by admin {callback.from_user.id}")
+        stop_kb = InlineKeyboardMarkup(inline_keyboard=[[
+            InlineKeyboardButton(text="🛑 Stop", callback_data=f"broadcast:stop:{broadcast_id}"),
+        ]])
+        await callback.message.edit_text(
+            "🚀 Broadcast started. You'll get a report when it finishes.\n"
+            "Progress: /broadcast_status",
+            reply_markup=stop_kb
+        )
+        await callback.answer()
+
+    elif action in ("cancel", "stop"):
+        if broadcast["status"] not in ("draft", "running"):
+            await callback.answer(f"Already {broadcast['status']}", show_alert=True)
+            return
+        # a running job sees the new status at its next checkpoint and stops
+        await app_context.db.set_broadcast_status(broadcast_id, "cancelled")
+        await callback.message.edit_text("🛑 Broadcast cancelled.")
+        await callback.answer()
+
+    else:
+        await callback.answer()
+
+
+@router.message(Command("broadcast_status"))
+async def broadcast_status(message: Message, app_context: AppContext):
+    if not is_admin(message.from_user.id):
+        await message.answer("❌ You are not authorized to use this command.")
+        return
+
+    broadcasts = await app_context.db.get_recent_broadcasts(limit=5)
+    if not broadcasts:
+        await message.answer("No broadcasts yet.")
+        return
+    lines = ["📣 <b>Recent broadcasts</b>", ""]
+    lines.extend(render_broadcast_line(b) for b in broadcasts)
+    await message.answer("\n".join(lines), parse_mode="HTML")
@@ -1,8 +1,10 @@
 from aiogram import Router, F
-from aiogram.types import Message
+from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
-from telegram import CallbackQuery
+from html import escape
+
 from config.settings import settings
+from database.instrumentation import db_stats
 from handlers.admin.users import render_users
 from keyboards.inline import get_admin_reply_keyboard, get_payment_review_keyboard
 from app_context import AppContext
@@ -47,6 +49,31 @@ def format_ocr_data(ocr_data) -> str:
     return "\n".join(lines) if lines else "Could not extract payment details"
 
 
+def render_db_stats(stats: dict) -> str:
+    def ms(value) -> str:
+        return "—" if value is None else f"{value:g}"
+
+    lines = ["🗄 <b>Database</b>", ""]
+    pool = stats.get("pool")
+    if pool:
+        lines.append(f"Pool: {pool['size'] - pool['idle']}/{pool['max']} busy, {pool['idle']} idle")
+    wait = stats["pool_wait"]
+    lines.append(f"Acquire wait: avg {wait['avg_ms']} ms, p95 ≤ {ms(wait['p95_ms'])} ms ({wait['acquires']} acquires)")
+    lines.append("")
+    lines.append("<b>Slowest methods (total time)</b>")
+    for m in stats["methods"][:10]:
+        lines.append(
+            f"<code>{m['method']}</code> ×{m['calls']}: avg {m['avg_ms']} ms, "
+            f"p95 ≤ {ms(m['p95_ms'])} ms, rows {m['rows']}" + (f", ❌ {m['errors']}" if m['errors'] else "")
+        )
+    if stats["slow_queries"]:
+        lines.append("")
+        lines.append(f"<b>Recent slow queries (≥ {stats['slow_threshold_ms']:g} ms)</b>")
+        for q in stats["slow_queries"][-5:]:
+            lines.append(f"{q['ms']} ms <code>{q['method']}</code>: <code>{escape(q['sql'][:120])}</code>")
+    return "\n".join(lines)
+
+
 # ---------- HANDLERS ----------
 
 @router.message(Command("admin"))
@@ -67,6 +94,14 @@ async def admin_command(message: Message, app_context: AppContext):
     await message.answer(stats_text, reply_markup=get_admin_reply_keyboard(), parse_mode="HTML")
 
 
+@router.message(Command("dbstats"))
+async def dbstats_command(message: Message, app_context: AppContext):
+    if not is_admin(message.from_user.id):
+        await message.answer("❌ You are not authorized to use this command.")
+        return
+    await message.answer(render_db_stats(db_stats(app_context.db.pool)), parse_mode="HTML")
+
+
 @router.message(F.text.in_(["📊 Stats", "💳 Payments", "🎨 Manual Queue", "👥 Users"]))
 async def admin_menu_handler(message: Message, app_context: AppContext, state: FSMContext):
     if not is_admin(message.from_user.id):
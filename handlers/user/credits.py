@@ -42,7 +42,7 @@ async def package_selected(callback: CallbackQuery, state: FSMContext, app_conte
     await callback.answer()
     
     
-@router.message(UserStates.uploading_payment, F.photo)
+@router.message(UserStates.uploading_payment, F.photo, flags={"rate_limit": "upload"})
 async def payment_screenshot_received(message: Message, state: FSMContext, app_context: AppContext):
     user = await app_context.db.get_user(message.from_user.id)
     lang = user.get('language', 'en')
@@ -99,7 +99,7 @@ async def payment_screenshot_received(message: Message, state: FSMContext, app_c
         # Notify admins with OCR details
         user = await app_context.db.get_user(message.from_user.id)
         payment = await app_context.db.get_payment(payment_id)
-        await notify_admins_new_payment(
+        notify_admins_new_payment(
             bot=message.bot,
             payment_id=payment_id,
             payment=payment,
@@ -1,37 +1,48 @@
 import asyncio
-import io
+import time
 from aiogram import Router, F
 from aiogram.filters import CommandStart
-from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.types import Message, CallbackQuery, ChatMemberUpdated, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
-from telegram import InputFile, InputMediaPhoto
+from aiogram.types import BufferedInputFile, InputMediaPhoto
 from states import UserStates
 from aiogram.exceptions import TelegramBadRequest
 from keyboards.reply import get_main_menu_keyboard, get_cancel_keyboard
 from keyboards.inline import get_styles_keyboard, get_packages_keyboard, get_language_keyboard
+from keyboards.render_cache import render_cache
 from utils.helpers import TEXTS, get_text, get_button
 from config.settings import settings
 from app_context import AppContext
-from utils.logger import logger
-from typing import List, Optional
-
+from utils.cache import user_languages
+from utils.logger import bind_log_context, logger
+from utils.membership import MEMBER_STATUSES, MembershipCache
+from utils.metrics import Counter, Gauge
+from services.ai_image import PROVIDER_ERRORS, PROVIDER_SECONDS, provider_health
+from typing import Mapping, Optional, Sequence
+
+from utils.shutdown import ShutdownDeadline, shutdown
 from utils.tasks import notify_admin_manual_queue, notify_admins_new_user
 router = Router()
 
+GENERATIONS_IN_FLIGHT = Gauge("flexa_generations_in_flight", "Photo generations being processed")
+GENERATIONS = Counter("flexa_generations_total", "Finished photo generations by outcome", ["outcome"])
+
 CHANNEL_USERNAME = settings.CHANNEL_USERNAME  # from .env
 
+membership = MembershipCache(
+    CHANNEL_USERNAME,
+    positive_ttl=settings.MEMBERSHIP_TTL,
+    negative_ttl=settings.MEMBERSHIP_NEGATIVE_TTL
+)
+
 async def check_membership(bot, user_id: int) -> bool:
-    try:
-        member = await bot.get_chat_member(CHANNEL_USERNAME, user_id)
-        return member.status in ("member", "administrator", "creator")
-    except TelegramBadRequest as e:
-        # Print the error details for debugging
-        print(f"TelegramBadRequest while checking membership: {e}")
-        return False
-    except Exception as e:
-        # Catch any other unexpected errors
-        print(f"Unexpected error while checking membership: {e}")
-        return False
+    return await membership.check(bot, user_id)
+
+# Join/leave events for the channel keep the membership cache current.
+# Delivered only while the bot is a channel admin and "chat_member" is in allowed_updates.
+@router.chat_member(F.chat.username == CHANNEL_USERNAME.lstrip('@'))
+async def channel_member_updated(event: ChatMemberUpdated):
+    membership.set(event.new_chat_member.user.id, event.new_chat_member.status in MEMBER_STATUSES)
 @router.message(CommandStart())
 async def start_command(message: Message, state: FSMContext, app_context: AppContext):
     user = await app_context.db.get_user(message.from_user.id)
@@ -114,7 +125,7 @@ async def language_selected(callback: CallbackQuery, state: FSMContext, app_cont
             parse_mode="HTML"
 )
 
-    await notify_admins_new_user(callback.bot, user)
+    notify_admins_new_user(callback.bot, user)
     await state.set_state(UserStates.main_menu)
 @router.callback_query(F.data == "check_joined")
 async def check_joined(callback: CallbackQuery, state: FSMContext, app_context: AppContext):
@@ -133,7 +144,7 @@ async def check_joined(callback: CallbackQuery, state: FSMContext, app_context:
             reply_markup=get_main_menu_keyboard(lang),
             parse_mode="HTML"
 )
-        await notify_admins_new_user(callback.bot, user)
+        notify_admins_new_user(callback.bot, user)
         await state.set_state(UserStates.main_menu)
     else:
         # ❌ Show alert if still not joined
@@ -160,36 +171,43 @@ def short_description(desc: Optional[str], max_chars: int = 100) -> str:
 # -------------------------
 # Page sender: send N style cards per page
 # -------------------------
-async def send_styles_cards_page(message_or_callback, styles: List[dict], page: int, lang: str, page_size: int = 4):
+def _render_page_card(s: Mapping, lang: str) -> tuple[str, InlineKeyboardMarkup]:
+    name = s.get("name_am") if lang == 'am' else s.get("name_en") or s.get("name_am") or "Untitled"
+    emoji = s.get("emoji_tag") or "🎨"
+    desc = s.get("description_am") if lang == 'am' else s.get("description_en") or ""
+    desc_short = short_description(desc, max_chars=90)  # keep it concise
+    cost = s.get("credit_cost", 1)
+
+    caption = (
+        f"{emoji} <b>{name}</b>\n\n"
+        f"{desc_short}\n\n"
+        f"💎 <b>Cost:</b> {cost} credit{'s' if cost != 1 else ''}"
+    )
+
+    card_kb = InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text=get_button('view', lang), callback_data=f"style_view:{s['id']}"),
+            InlineKeyboardButton(text=get_button('choose_style', lang), callback_data=f"style_choose:{s['id']}")
+        ]
+    ])
+    return caption, card_kb
+
+async def send_styles_cards_page(message_or_callback, styles: Sequence[Mapping], page: int, lang: str, page_size: int = 4,
+                                 version: Optional[int] = None):
     """
     Send compact style cards per page.
     Each card shows photo (if available), emoji+name, short description teaser, cost,
     and inline buttons (View / Choose).
     After the cards, send a navigation keyboard (Prev / Next / Back).
+    `version` is the catalog snapshot `styles` came from; cards are cached under it.
     """
     start = page * page_size
     end = start + page_size
     subset = styles[start:end]
 
     for s in subset:
-        name = s.get("name_am") if lang == 'am' else s.get("name_en") or s.get("name_am") or "Untitled"
-        emoji = s.get("emoji_tag") or "🎨"
-        desc = s.get("description_am") if lang == 'am' else s.get("description_en") or ""
-        desc_short = short_description(desc, max_chars=90)  # keep it concise
-        cost = s.get("credit_cost", 1)
-
-        caption = (
-            f"{emoji} <b>{name}</b>\n\n"
-            f"{desc_short}\n\n"
-            f"💎 <b>Cost:</b> {cost} credit{'s' if cost != 1 else ''}"
-        )
-
-        card_kb = InlineKeyboardMarkup(inline_keyboard=[
-            [
-                InlineKeyboardButton(text=get_button('view', lang), callback_data=f"style_view:{s['id']}"),
-                InlineKeyboardButton(text=get_button('choose_style', lang), callback_data=f"style_choose:{s['id']}")
-            ]
-        ])
+        caption, card_kb = render_cache.get("styles", (lang, "page_card", str(s['id'])), lambda s=s: _render_page_card(s, lang),
+                                            version=version)
 
         if s.get('preview_image_url'):
             try:
@@ -228,6 +246,106 @@ async def send_styles_cards_page(message_or_callback, styles: List[dict], page:
         except Exception:
             pass
 
+# -------------------------
+# Carousel: one card per message, Prev/Next edit it in place
+# -------------------------
+def render_style_card_caption(style: Mapping, index: int, total: int, lang: str) -> str:
+    name = style.get("name_am") if lang == 'am' else style.get("name_en") or style.get("name_am") or "Untitled"
+    emoji = style.get("emoji_tag") or "🎨"
+    desc = style.get("description_am") if lang == 'am' else style.get("description_en") or ""
+    cost = style.get("credit_cost", 1)
+    return (
+        f"{emoji} <b>{name}</b>  ·  {index + 1}/{total}\n\n"
+        f"{short_description(desc, max_chars=300)}\n\n"
+        f"💎 <b>Cost:</b> {cost} credit{'s' if cost != 1 else ''}"
+    )
+
+def build_style_card_keyboard(style_id: str, index: int, total: int, lang: str) -> InlineKeyboardMarkup:
+    nav = []
+    if total > 1:
+        nav.append(InlineKeyboardButton(text=get_button('prev', lang), callback_data=f"style_card:{(index - 1) % total}"))
+        nav.append(InlineKeyboardButton(text=f"{index + 1}/{total}", callback_data="style_card:noop"))
+        nav.append(InlineKeyboardButton(text=get_button('next', lang), callback_data=f"style_card:{(index + 1) % total}"))
+    rows = [nav] if nav else []
+    rows.append([
+        InlineKeyboardButton(text=get_button('view', lang), callback_data=f"style_view:{style_id}"),
+        InlineKeyboardButton(text=get_button('choose_style', lang), callback_data=f"style_choose:{style_id}"),
+    ])
+    rows.append([InlineKeyboardButton(text=get_button('back', lang), callback_data="style_list:back")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+def render_style_card(style: Mapping, index: int, total: int, lang: str,
+                      version: Optional[int] = None) -> tuple[str, InlineKeyboardMarkup]:
+    """(caption, keyboard) for a carousel card, shared by every user on the same catalog version."""
+    style_id = str(style['id'])
+    return render_cache.get("styles", (lang, "card", style_id, index, total), lambda: (
+        render_style_card_caption(style, index, total, lang),
+        build_style_card_keyboard(style_id, index, total, lang),
+    ), version=version)
+
+async def send_style_card(message: Message, styles: Sequence[Mapping], index: int, lang: str,
+                          version: Optional[int] = None):
+    style = styles[index]
+    caption, kb = render_style_card(style, index, len(styles), lang, version)
+    if style.get('preview_image_url'):
+        try:
+            await message.answer_photo(style['preview_image_url'], caption=caption, reply_markup=kb, parse_mode="HTML")
+            return
+        except Exception:
+            pass
+    await message.answer(caption, reply_markup=kb, parse_mode="HTML")
+
+async def show_style_card(message: Message, styles: Sequence[Mapping], index: int, lang: str,
+                          version: Optional[int] = None):
+    """
+    Replace the card in `message` with styles[index] using a single Bot API call
+    when possible: photo -> photo via edit_message_media, text -> text via
+    edit_message_text. Switching between photo and text cards cannot be done by
+    editing, so a new card is sent and the old one deleted.
+    """
+    style = styles[index]
+    caption, kb = render_style_card(style, index, len(styles), lang, version)
+    photo = style.get('preview_image_url')
+
+    try:
+        if photo and message.photo:
+            await message.edit_media(InputMediaPhoto(media=photo, caption=caption, parse_mode="HTML"), reply_markup=kb)
+            return
+        if not photo and not message.photo:
+            await message.edit_text(caption, reply_markup=kb, parse_mode="HTML")
+            return
+    except TelegramBadRequest as e:
+        if "message is not modified" in str(e):
+            return
+        logger.warning(f"[styles] carousel edit failed, sending a new card: {e}")
+
+    await send_style_card(message, styles, index, lang, version)
+    try:
+        await message.delete()
+    except Exception:
+        pass
+
+@router.callback_query(F.data.startswith("style_card:"))
+async def style_card_navigation(callback: CallbackQuery, app_context: AppContext):
+    target = callback.data.split(":", 1)[1]
+    if target == "noop":
+        await callback.answer()
+        return
+
+    lang = user_languages.get(callback.from_user.id)
+    if lang is None:
+        user = await app_context.db.get_user(callback.from_user.id)
+        lang = user.get('language', 'en') if user else 'en'
+
+    snapshot = await app_context.style_catalog.snapshot()
+    styles = snapshot.active
+    if not styles:
+        await callback.answer(get_text('error_general', lang), show_alert=True)
+        return
+    # the catalog may have shrunk since this keyboard was rendered
+    await show_style_card(callback.message, styles, int(target) % len(styles), lang, snapshot.version)
+    await callback.answer()
+
 # -------------------------
 # Handlers: entry, pagination, view, choose
 # -------------------------
@@ -250,13 +368,17 @@ async def start_generation_preview(message: Message, state: FSMContext, app_cont
         await message.answer(get_text('already_pending', lang), parse_mode="HTML")
         return
 
-    styles = await app_context.db.get_active_styles()
+    snapshot = await app_context.style_catalog.snapshot()
+    styles = snapshot.active
     if not styles:
         await message.answer(get_text('error_general', lang))
         return
 
-    # Send first page (cards + navigation)
-    await send_styles_cards_page(message, styles, page=0, lang=lang, page_size=4)
+    if settings.STYLE_BROWSER_MODE == "carousel":
+        await send_style_card(message, styles, 0, lang, snapshot.version)
+    else:
+        # Send first page (cards + navigation)
+        await send_styles_cards_page(message, styles, page=0, lang=lang, page_size=4, version=snapshot.version)
     await state.set_state(UserStates.selecting_style)
 
 @router.callback_query(F.data.startswith("style_list:"))
@@ -271,13 +393,15 @@ async def style_list_navigation(callback: CallbackQuery, state: FSMContext, app_
     action = parts[1]
     if action == "page":
         page = int(parts[2])
-        styles = await app_context.db.get_active_styles()
+        snapshot = await app_context.style_catalog.snapshot()
+        styles = snapshot.active
         # Try to edit the current message to show page header, then send cards
         try:
-            await callback.message.edit_text(get_text('browse_styles_page', lang, page=page+1), reply_markup=None, parse_mode="HTML")
+            total_pages = ((len(styles) - 1) // 4) + 1 if styles else 1
+            await callback.message.edit_text(get_text('browse_styles_page', lang, page=page+1, total_pages=total_pages), reply_markup=None, parse_mode="HTML")
         except Exception:
             pass
-        await send_styles_cards_page(callback.message, styles, page=page, lang=lang, page_size=4)
+        await send_styles_cards_page(callback.message, styles, page=page, lang=lang, page_size=4, version=snapshot.version)
         await callback.answer()
         return
 
@@ -310,7 +434,7 @@ async def style_view(callback: CallbackQuery, state: FSMContext, app_context: Ap
         return
     lang = user.get('language', 'en')
 
-    style = await app_context.db.get_style(style_id)
+    style = await app_context.style_catalog.get(style_id)
     if not style:
         await callback.answer(get_text('error_general', lang), show_alert=True)
         return
@@ -367,12 +491,12 @@ async def style_choose(callback: CallbackQuery, state: FSMContext, app_context:
         await callback.answer(get_text('already_pending', lang), show_alert=True)
         return
 
-    style = await app_context.db.get_style(style_id)
+    style = await app_context.style_catalog.get(style_id)
     if not style:
         await callback.answer(get_text('error_general', lang), show_alert=True)
         return
 
-    await state.update_data(selected_style=style)
+    await state.update_data(selected_style=dict(style))
     await state.set_state(UserStates.uploading_photo)
 
     await callback.message.answer(
@@ -404,23 +528,32 @@ async def _generate_with_retry(ai_service, image_bytes: bytes, prompt: str, retr
     """
     last_error = None
     for attempt in range(retries + 1):
+        started = time.perf_counter()
         try:
             result_bytes, error, provider, processing_time = await ai_service.generate_image(image_bytes, prompt)
             # If API returned an error string but also bytes, treat as success if bytes present
             if result_bytes:
+                PROVIDER_SECONDS.labels(provider, "ok").observe(time.perf_counter() - started)
+                provider_health.record(True)
                 return result_bytes, None, provider, processing_time
             # If no bytes, capture error and possibly retry
+            PROVIDER_SECONDS.labels(provider, "error").observe(time.perf_counter() - started)
+            PROVIDER_ERRORS.labels(provider).inc()
             last_error = error or "No image returned"
+            provider_health.record(False, last_error)
             logger.warning(f"[_generate_with_retry] attempt={attempt} provider={provider} error={last_error}")
         except Exception as exc:
+            PROVIDER_SECONDS.labels("unknown", "exception").observe(time.perf_counter() - started)
+            PROVIDER_ERRORS.labels("unknown").inc()
             last_error = str(exc)
+            provider_health.record(False, last_error)
             logger.exception(f"[_generate_with_retry] exception on attempt={attempt}: {last_error}")
         if attempt < retries:
             await asyncio.sleep(delay_s)
     # final return: no bytes
     return None, last_error, "manual", 0
 
-@router.message(UserStates.uploading_photo, F.photo)
+@router.message(UserStates.uploading_photo, F.photo, flags={"rate_limit": "upload"})
 async def photo_received(message: Message, state: FSMContext, app_context: AppContext):
     """
     Handles user photo upload after they selected a style.
@@ -451,6 +584,10 @@ async def photo_received(message: Message, state: FSMContext, app_context: AppCo
 
     processing_msg = await message.answer(get_text('processing', lang), parse_mode='Markdown', reply_markup=get_main_menu_keyboard(lang) )
 
+    GENERATIONS_IN_FLIGHT.inc()
+    shutdown.started("generation")
+    generation_id = None
+    charged = False
     try:
         # 1) Download original photo bytes
         photo = message.photo[-1]
@@ -465,6 +602,7 @@ async def photo_received(message: Message, state: FSMContext, app_context: AppCo
             await processing_msg.edit_text(get_text('error_general', lang), parse_mode='Markdown')
             await state.set_state(UserStates.main_menu)
             return
+        charged = True
 
         # 3) Create generation record (store original file_id so admins can preview)
         generation_id = await app_context.db.create_generation(
@@ -473,25 +611,24 @@ async def photo_received(message: Message, state: FSMContext, app_context: AppCo
             original_photo_url=photo.file_id,
             credits_spent=credit_cost
         )
+        bind_log_context(generation_id=generation_id)
         logger.info(f"[photo_received] created generation id={generation_id}")
 
         # 4) Build prompt and call AI (with one retry)
         prompt = style.get('prompt_template') or style.get('prompt') or ""
         logger.debug(f"[photo_received] prompt head: {prompt[:200]}")
 
-        result_bytes, error, provider, processing_time = await _generate_with_retry(
+        result_bytes, error, provider, processing_time = await shutdown.until_deadline(_generate_with_retry(
             app_context.ai_service,
             original_bytes,
             prompt,
             retries=1,
             delay_s=1.0
-        )
+        ))
 
         # 5) Success path: send generated image and update DB
         if result_bytes:
-            buf = io.BytesIO(result_bytes)
-            buf.seek(0)
-            input_file = InputFile(buf, filename="result.jpg")
+            input_file = BufferedInputFile(result_bytes, filename="result.jpg")
 
             # Send success message + image (include localized success text)
             new_user = await app_context.db.get_user(message.from_user.id)
@@ -513,6 +650,7 @@ async def photo_received(message: Message, state: FSMContext, app_context: AppCo
                 api_provider=provider,
                 processing_time_ms=processing_time
             )
+            GENERATIONS.labels("completed").inc()
             logger.info(f"[photo_received] generation {generation_id} completed provider={provider} time={processing_time}ms")
 
         # 6) Failure path: queue for manual processing and update DB
@@ -526,8 +664,9 @@ async def photo_received(message: Message, state: FSMContext, app_context: AppCo
                 processing_time_ms=processing_time
             )
             gen = await app_context.db.get_generation(generation_id)
+            GENERATIONS.labels("manual_queue").inc()
             logger.info(f"[photo_received] generation {generation_id} queued for manual processing: {error}")
-            await notify_admin_manual_queue(message.bot, gen, user, style, app_context)
+            notify_admin_manual_queue(message.bot, gen, user, style, app_context)
 
             # Inform user and keep processing message visible (edit)
             try:
@@ -546,13 +685,44 @@ async def photo_received(message: Message, state: FSMContext, app_context: AppCo
                 parse_mode="HTML"
             )
 
+    except (ShutdownDeadline, asyncio.CancelledError) as exc:
+        # credits are already spent: hand the generation to admins instead of dropping it.
+        # Cancelled means the re-queue window ran out as well (webhook_handler.stop).
+        GENERATIONS.labels("interrupted").inc()
+        logger.warning(f"[photo_received] shutdown interrupted generation {generation_id}, moving it to the manual queue")
+        if generation_id:
+            await app_context.db.update_generation(
+                generation_id=generation_id,
+                status='manual_queue',
+                error_message="Interrupted by restart",
+                api_provider="manual"
+            )
+            gen = await app_context.db.get_generation(generation_id)
+            notify_admin_manual_queue(message.bot, gen, user, style, app_context)
+        elif charged:
+            # charged but no generation row to hand over: give the credits back
+            await app_context.db.add_credits(message.from_user.id, credit_cost, 'refund')
+            logger.warning(f"[photo_received] refunded {credit_cost} credit(s) to user={message.from_user.id}, interrupted before the generation was created")
+        try:
+            text = get_text('manual_queue', lang) if generation_id else get_text('error_general', lang)
+            await processing_msg.edit_text(text, parse_mode='Markdown')
+        except Exception:
+            pass
+        await state.set_state(UserStates.main_menu)
+        if isinstance(exc, asyncio.CancelledError):
+            raise
+
     except Exception as exc:
+        GENERATIONS.labels("error").inc()
         logger.exception(f"[photo_received] unexpected error: {exc}")
         try:
             await processing_msg.edit_text(get_text('error_general', lang), parse_mode='Markdown')
         except Exception:
             pass
         await state.set_state(UserStates.main_menu)
+    finally:
+        GENERATIONS_IN_FLIGHT.dec()
+        shutdown.finished("generation")
 
 @router.message(F.text.in_(['🧾 My Credits', '🧾 የእኔ ክሬዲቶች']))
 async def show_credits(message: Message, app_context: AppContext):
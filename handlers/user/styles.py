@@ -17,12 +17,12 @@ async def style_selected(callback: CallbackQuery, state: FSMContext, app_context
     user = await app_context.db.get_user(callback.from_user.id)
     lang = user['language']
 
-    style = await app_context.db.get_style(style_id)
+    style = await app_context.style_catalog.get(style_id)
     if not style:
         await callback.answer(get_text('error_general', lang), show_alert=True)
         return
 
-    await state.update_data(selected_style=style)
+    await state.update_data(selected_style=dict(style))
 
     style_name = style['name_am'] if lang == 'am' else style['name_en']
     desc = style['description_am'] if lang == 'am' else style['description_en']
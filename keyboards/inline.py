@@ -1,6 +1,7 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from typing import List, Dict, Any
 from config.settings import settings
+from keyboards.render_cache import render_cache
 
 
 def get_styles_keyboard(styles: List[Dict[str, Any]], lang: str = 'en') -> InlineKeyboardMarkup:
@@ -13,6 +14,11 @@ def get_styles_keyboard(styles: List[Dict[str, Any]], lang: str = 'en') -> Inlin
 
 
 def get_packages_keyboard(lang: str = 'en') -> InlineKeyboardMarkup:
+    # call render_cache.invalidate("packages") after changing settings.CREDIT_PACKAGES
+    return render_cache.get("packages", (lang, "packages"), lambda: _build_packages_keyboard(lang))
+
+
+def _build_packages_keyboard(lang: str) -> InlineKeyboardMarkup:
     buttons = []
     for package_key, package_info in settings.CREDIT_PACKAGES.items():
         name = package_info['name_am'] if lang == 'am' else package_info['name_en']
@@ -23,13 +29,12 @@ def get_packages_keyboard(lang: str = 'en') -> InlineKeyboardMarkup:
 
 
 def get_language_keyboard() -> InlineKeyboardMarkup:
-    keyboard = [
+    return render_cache.get("static", "language", lambda: InlineKeyboardMarkup(inline_keyboard=[
         [
             InlineKeyboardButton(text='🇬🇧 English', callback_data='lang_en'),
             InlineKeyboardButton(text='🇪🇹 አማርኛ', callback_data='lang_am')
         ]
-    ]
-    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+    ]))
 
 
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
@@ -0,0 +1,66 @@
+# keyboards/render_cache.py
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class RenderCache:
+    """
+    Memoizes rendered keyboards and captions.
+
+    Entries live in a namespace ("static", "styles", "packages") and are keyed
+    by (namespace, version, key), where `key` normally starts with the language.
+    `invalidate(namespace)` bumps the version and drops that namespace's
+    entries, so nothing rendered from old data is handed out again.
+    Callers rendering from a versioned source (a StyleSnapshot) pass its
+    version: a render from a snapshot older than the namespace's version is
+    returned but not stored, so a reload during the caller's awaits cannot
+    leave stale entries under the new version.
+    Cached objects are shared: never mutate them.
+    """
+
+    def __init__(self, max_entries: int = 20_000):
+        self.max_entries = max_entries
+        self._versions: Dict[str, int] = {}
+        self._entries: Dict[Tuple[str, int, Hashable], Any] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, namespace: str) -> int:
+        return self._versions.get(namespace, 0)
+
+    def get(self, namespace: str, key: Hashable, build: Callable[[], Any], version: Optional[int] = None) -> Any:
+        current = self._versions.get(namespace, 0)
+        if version is None:
+            version = current
+        full_key = (namespace, version, key)
+        value = self._entries.get(full_key)
+        if value is None:
+            self.misses += 1
+            value = build()
+            if version < current:
+                return value
+            if len(self._entries) >= self.max_entries:
+                # rendered values are cheap to rebuild; start over rather than track recency
+                self._entries.clear()
+            self._entries[full_key] = value
+        else:
+            self.hits += 1
+        return value
+
+    def invalidate(self, namespace: str) -> None:
+        self._set_version(namespace, self._versions.get(namespace, 0) + 1)
+
+    def _set_version(self, namespace: str, version: int) -> None:
+        self._versions[namespace] = version
+        # renders from this version may already be stored if a caller saw the snapshot first
+        for key in [k for k in self._entries if k[0] == namespace and k[1] < version]:
+            del self._entries[key]
+
+    async def on_styles_changed(self, snapshot) -> None:
+        """StyleCatalog subscriber: the catalog owns the "styles" version, renders are keyed by it."""
+        self._set_version("styles", snapshot.version)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+render_cache = RenderCache()
@@ -1,17 +1,18 @@
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
 from utils.helpers import get_button
+from keyboards.render_cache import render_cache
 
 
 def get_main_menu_keyboard(lang: str = 'en') -> ReplyKeyboardMarkup:
-    keyboard = [
+    return render_cache.get("static", (lang, "main_menu"), lambda: ReplyKeyboardMarkup(keyboard=[
         [KeyboardButton(text=get_button('generate_photo', lang))],
         [KeyboardButton(text=get_button('my_credits', lang)), KeyboardButton(text=get_button('buy_credits', lang))],
         [KeyboardButton(text=get_button('help', lang)), KeyboardButton(text=get_button('settings', lang))]
-    ]
-    return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
+    ], resize_keyboard=True))
 
 
 
 def get_cancel_keyboard(lang: str = 'en') -> ReplyKeyboardMarkup:
-    keyboard = [[KeyboardButton(text=get_button('cancel', lang))]]
-    return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
+    return render_cache.get("static", (lang, "cancel"), lambda: ReplyKeyboardMarkup(
+        keyboard=[[KeyboardButton(text=get_button('cancel', lang))]], resize_keyboard=True
+    ))
@@ -0,0 +1,204 @@
+# loadtest/fake_bot_api.py
+"""
+Local stand-in for the Telegram Bot API.
+
+Answers `/bot<token>/<method>` with minimal valid results, so aiogram can
+parse them. It also serves `/file/bot<token>/<path>` downloads from a
+sample image. Every call is recorded per chat, so the load generator can
+wait for the bot's reply to an update and read the keyboards it sent.
+
+    python -m loadtest.fake_bot_api --port 8081 --latency-ms 40
+
+Point the bot at it with TELEGRAM_API_URL=http://127.0.0.1:8081.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+BOT_USER = {"id": 1000001, "is_bot": True, "first_name": "Flexa AI", "username": "flexa_loadtest_bot"}
+SAMPLE_IMAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample.jpg")
+
+
+@dataclass
+class Call:
+    seq: int
+    method: str
+    params: Dict[str, Any]
+    result: Any
+    at: float
+
+
+@dataclass
+class ChatLog:
+    calls: List[Call] = field(default_factory=list)
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def callback_data(self) -> List[str]:
+        """callback_data of the most recent inline keyboard sent to this chat."""
+        for call in reversed(self.calls):
+            markup = call.params.get("reply_markup")
+            if isinstance(markup, dict) and "inline_keyboard" in markup:
+                return [b["callback_data"] for row in markup["inline_keyboard"] for b in row if b.get("callback_data")]
+        return []
+
+    def last_message(self) -> Optional[Dict[str, Any]]:
+        """The most recent message the bot sent or edited in this chat, as returned to it."""
+        for call in reversed(self.calls):
+            if isinstance(call.result, dict) and "message_id" in call.result and "chat" in call.result:
+                return call.result
+        return None
+
+
+class FakeBotAPI:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, member_status: str = "member",
+                 image_path: str = SAMPLE_IMAGE):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.member_status = member_status
+        self.chats: Dict[int, ChatLog] = defaultdict(ChatLog)
+        self.methods: Counter = Counter()
+        self._seq = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        with open(image_path, "rb") as f:
+            self.image = f.read()
+
+    # --- result builders ---
+    def _message(self, chat_id: int, message_id: Optional[int] = None, **extra) -> Dict[str, Any]:
+        chat_type = "private" if chat_id > 0 else "supergroup"
+        return {"message_id": message_id or next(self._message_ids), "date": int(time.time()),
+                "chat": {"id": chat_id, "type": chat_type}, "from": BOT_USER, **extra}
+
+    def _photo(self) -> List[Dict[str, Any]]:
+        file_id = f"fake-photo-{next(self._seq)}"
+        return [{"file_id": file_id, "file_unique_id": file_id, "width": 1024, "height": 1024, "file_size": len(self.image)}]
+
+    def result(self, method: str, params: Dict[str, Any]) -> Any:
+        """The `result` field a real Bot API would answer `method` with."""
+        chat_id = params.get("chat_id")
+        if method == "getMe":
+            return BOT_USER
+        if method == "getFile":
+            return {"file_id": params["file_id"], "file_unique_id": params["file_id"],
+                    "file_size": len(self.image), "file_path": f"photos/{params['file_id']}.jpg"}
+        if method == "getChatMember":
+            return {"status": self.member_status,
+                    "user": {"id": int(params["user_id"]), "is_bot": False, "first_name": "Load"}}
+        if method in ("sendMessage", "editMessageText"):
+            if method == "editMessageText" and chat_id is None:
+                return True
+            return self._message(int(chat_id), params.get("message_id"), text=params.get("text", ""))
+        if method in ("sendPhoto", "editMessageMedia", "sendDocument"):
+            if chat_id is None:
+                return True
+            message_id = params.get("message_id") if method == "editMessageMedia" else None
+            return self._message(int(chat_id), message_id, photo=self._photo(), caption=params.get("caption"))
+        if method == "sendMediaGroup":
+            return [self._message(int(chat_id), photo=self._photo()) for _ in params.get("media", [])]
+        if method == "copyMessage":
+            return {"message_id": next(self._message_ids)}
+        return True
+
+    @staticmethod
+    async def _params(request: web.Request) -> Dict[str, Any]:
+        if request.content_type == "application/json":
+            raw = await request.json()
+        else:
+            raw = dict(await request.post())
+        params = {}
+        for key, value in raw.items():
+            if isinstance(value, str) and value[:1] in "[{":
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    pass
+            elif isinstance(value, web.FileField):
+                value = f"<file {value.filename}>"
+            params[key] = value
+        return params
+
+    async def handle_method(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = await self._params(request)
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + random.random() * self.jitter)
+        self.methods[method] += 1
+        result = self.result(method, params)
+
+        chat_id = params.get("chat_id")
+        if chat_id is not None:
+            log = self.chats[int(chat_id)]
+            log.calls.append(Call(next(self._seq), method, params, result, time.monotonic()))
+            log.changed.set()
+        return web.json_response({"ok": True, "result": result})
+
+    async def handle_file(self, request: web.Request) -> web.Response:
+        self.methods["<download>"] += 1
+        return web.Response(body=self.image, content_type="image/jpeg")
+
+    # --- used by the load generator ---
+    def mark(self, chat_id: int) -> int:
+        calls = self.chats[chat_id].calls
+        return calls[-1].seq if calls else 0
+
+    async def wait_reply(self, chat_id: int, after: int, timeout: float) -> Optional[Call]:
+        """First call to `chat_id` newer than `after`, or None on timeout."""
+        log = self.chats[chat_id]
+        deadline = time.monotonic() + timeout
+        while True:
+            log.changed.clear()
+            first = None
+            for call in reversed(log.calls):
+                if call.seq <= after:
+                    break
+                first = call
+            if first is not None:
+                return first
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                await asyncio.wait_for(log.changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return None
+
+    async def wait_idle(self, chat_id: int, quiet: float, timeout: float) -> float:
+        """Wait until `chat_id` got no calls for `quiet` seconds; returns when its last call arrived."""
+        log = self.chats[chat_id]
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            log.changed.clear()
+            try:
+                await asyncio.wait_for(log.changed.wait(), min(quiet, max(0.0, deadline - time.monotonic())))
+            except asyncio.TimeoutError:
+                break
+        return log.calls[-1].at if log.calls else time.monotonic()
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=32 * 1024 * 1024)
+        app.router.add_post("/bot{token}/{method}", self.handle_method)
+        app.router.add_get("/file/bot{token}/{path:.+}", self.handle_file)
+        return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API for load tests")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added to every Bot API call")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--member-status", default="member", help="getChatMember status for every user")
+    args = parser.parse_args()
+    api = FakeBotAPI(args.latency_ms, args.jitter_ms, args.member_status)
+    web.run_app(api.app(), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
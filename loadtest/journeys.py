@@ -0,0 +1,152 @@
+# loadtest/journeys.py
+"""
+Synthetic users. Each step posts one update to the bot's webhook and
+measures the time until the bot's first Bot API call for that chat (its
+reply). Steps that start long work (generation, payment OCR) also record
+the time until the chat goes quiet.
+"""
+import asyncio
+import itertools
+import random
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+from loadtest.fake_bot_api import BOT_USER, FakeBotAPI
+from utils.helpers import get_button
+
+_update_ids = itertools.count(1)
+_user_message_ids = itertools.count(1)
+
+
+@dataclass
+class Stats:
+    acks: List[float] = field(default_factory=list)
+    http_errors: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    steps: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    timeouts: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    skipped: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    journeys: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    updates_sent: int = 0
+
+
+class VirtualUser:
+    def __init__(self, user_id: int, session: aiohttp.ClientSession, webhook_url: str, api: FakeBotAPI,
+                 stats: Stats, think: float, reply_timeout: float, settle_timeout: float):
+        self.user_id = user_id
+        self.session = session
+        self.webhook_url = webhook_url
+        self.api = api
+        self.stats = stats
+        self.think = think
+        self.reply_timeout = reply_timeout
+        self.settle_timeout = settle_timeout
+        self.profile = {"id": user_id, "is_bot": False, "first_name": "Load", "username": f"load{user_id}", "language_code": "en"}
+
+    # --- update builders ---
+    def _chat(self) -> Dict[str, Any]:
+        return {"id": self.user_id, "type": "private", "first_name": "Load"}
+
+    def _message(self, **content) -> Dict[str, Any]:
+        return {"update_id": next(_update_ids), "message": {
+            "message_id": next(_user_message_ids), "date": int(time.time()),
+            "chat": self._chat(), "from": self.profile, **content}}
+
+    def text(self, text: str) -> Dict[str, Any]:
+        if text.startswith("/"):
+            command = text.split()[0]
+            return self._message(text=text, entities=[{"type": "bot_command", "offset": 0, "length": len(command)}])
+        return self._message(text=text)
+
+    def photo(self) -> Dict[str, Any]:
+        file_id = f"load-{self.user_id}-{next(_user_message_ids)}"
+        return self._message(photo=[{"file_id": file_id, "file_unique_id": file_id, "width": 1024, "height": 1024, "file_size": 250_000}])
+
+    def press(self, data: str) -> Optional[Dict[str, Any]]:
+        message = self.api.chats[self.user_id].last_message()
+        if message is None:
+            return None
+        return {"update_id": next(_update_ids), "callback_query": {
+            "id": str(next(_update_ids)), "from": self.profile, "chat_instance": str(self.user_id),
+            "data": data, "message": {**message, "from": BOT_USER}}}
+
+    # --- step execution ---
+    async def step(self, name: str, update: Optional[Dict[str, Any]], settle: bool = False) -> bool:
+        if update is None:
+            self.stats.skipped[name] += 1
+            return False
+        mark = self.api.mark(self.user_id)
+        started = time.monotonic()
+        try:
+            async with self.session.post(self.webhook_url, json=update) as response:
+                await response.read()
+                self.stats.acks.append(time.monotonic() - started)
+                self.stats.updates_sent += 1
+                if response.status != 200:
+                    self.stats.http_errors[str(response.status)] += 1
+                    return False
+        except aiohttp.ClientError as e:
+            self.stats.http_errors[type(e).__name__] += 1
+            return False
+
+        reply = await self.api.wait_reply(self.user_id, mark, self.reply_timeout)
+        if reply is None:
+            self.stats.timeouts[name] += 1
+            return False
+        self.stats.steps[name].append(reply.at - started)
+        if settle:
+            last = await self.api.wait_idle(self.user_id, quiet=2.0, timeout=self.settle_timeout)
+            self.stats.steps[f"{name} (complete)"].append(last - started)
+        await asyncio.sleep(self.think * random.uniform(0.5, 1.5))
+        return True
+
+    def _pick(self, prefix: str) -> Optional[str]:
+        options = [d for d in self.api.chats[self.user_id].callback_data()
+                   if d.startswith(prefix) and not d.endswith(":noop")]
+        return random.choice(options) if options else None
+
+    # --- journeys ---
+    async def onboarding(self) -> None:
+        if await self.step("start", self.text("/start")):
+            if any(d.startswith("lang_") for d in self.api.chats[self.user_id].callback_data()):
+                await self.step("choose_language", self.press("lang_en"))
+
+    async def browse(self) -> None:
+        if not await self.step("open_styles", self.text(get_button("generate_photo", "en"))):
+            return
+        for _ in range(random.randint(1, 3)):
+            data = self._pick("style_card:") or self._pick("style_list:page:")
+            if data is None:
+                break
+            await self.step("browse_styles", self.press(data))
+
+    async def generate(self) -> None:
+        await self.browse()
+        data = self._pick("style_choose:")
+        if data is None:
+            self.stats.skipped["choose_style"] += 1
+            return
+        if await self.step("choose_style", self.press(data)):
+            await self.step("upload_photo", self.photo(), settle=True)
+
+    async def buy(self) -> None:
+        if not await self.step("buy_credits", self.text(get_button("buy_credits", "en"))):
+            return
+        data = self._pick("package:")
+        if data and await self.step("choose_package", self.press(data)):
+            await self.step("upload_payment", self.photo(), settle=True)
+
+    async def check_credits(self) -> None:
+        await self.step("my_credits", self.text(get_button("my_credits", "en")))
+
+    async def run(self, until: float, mix: Dict[str, float]) -> None:
+        await self.onboarding()
+        self.stats.journeys["onboarding"] += 1
+        names, weights = zip(*mix.items())
+        while time.monotonic() < until:
+            name = random.choices(names, weights)[0]
+            await getattr(self, name)()
+            self.stats.journeys[name] += 1
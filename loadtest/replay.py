@@ -0,0 +1,360 @@
+# loadtest/replay.py
+"""
+Replays recorded updates (RECORD_UPDATES_FILE, see utils/update_recorder.py)
+through the bot's dispatcher and middlewares, in process, against
+MemoryDatabase and a local fake Bot API.
+
+    python -m loadtest.replay recordings/updates-20261019.jsonl.gz            # original timing
+    python -m loadtest.replay recordings/*.jsonl.gz --speed 5                 # 5x faster
+    python -m loadtest.replay recordings/*.jsonl.gz --speed 0 --save v1.json  # as fast as possible
+    python -m loadtest.replay recordings/*.jsonl.gz --speed 0 --compare v1.json --fail-above 0.2
+
+Updates are fed at their recorded inter-arrival times divided by --speed, at
+most --concurrency at once (the webhook worker pool size by default). Per
+update the time spent in dispatcher.feed_update is measured and grouped by
+the handler that ran it. "(throttled)" counts updates the throttling
+middleware turned away and is left out of "(all)" and --fail-above;
+"(not handled)" covers updates no handler matched.
+
+Speeding up also shortens the gaps between one user's updates, so by default
+(--throttle scaled) the throttle limits are raised by the same factor and the
+updates throttled are the ones production throttled. At --speed 0 recorded
+gaps mean nothing and nothing is throttled. --throttle production keeps the
+production limits, --throttle off never throttles.
+
+Every user in the recording is created beforehand with --credits and the
+language Telegram reported, and --styles styles are created. Style ids in
+recorded callback data are mapped onto those styles. Image generation
+takes --generation-ms and every Bot API call --latency-ms, and outgoing
+messages go through the same per-chat pacing as in production. That pacing
+is Telegram's limit and is not scaled, so a sped-up burst to one chat waits
+for it; --no-pacing leaves it out.
+Recorded admins are added to ADMIN_IDS for the run.
+
+--save writes the report as JSON. --compare prints it next to an earlier
+report, e.g. one from the previous version on the same recording.
+"""
+import os
+
+# a replay never records, traces or needs Postgres, whatever the environment says
+os.environ.update(RECORD_UPDATES_FILE="", TRACING_EXPORTER="none", THROTTLE_BACKEND="memory")
+os.environ.setdefault("BOT_TOKEN", "123456:replay")
+
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import re
+import statistics
+import sys
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+from middlewares.throttling_middleware import ThrottlingMiddleware
+
+from app_context import AppContext
+from benchmarks import doubles
+from config.settings import settings
+from database.memory import MemoryDatabase
+from loadtest.fake_bot_api import FakeBotAPI
+from loadtest.run import quantile
+from services import BroadcastService, PaymentService, StyleCatalog
+from utils.outbound import outbound
+from utils.ratelimit import TokenBucketPolicy
+from utils.update_recorder import read_recording
+
+NOT_HANDLED = "(not handled)"
+THROTTLED = "(throttled)"
+_UUID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+_current: ContextVar[Optional[Dict[str, Any]]] = ContextVar("replay_update", default=None)
+
+
+class HandlerNameMiddleware(BaseMiddleware):
+    """Innermost: notes which handler ran the update being replayed, and whether it raised."""
+
+    async def __call__(self, handler, event, data):
+        info = _current.get()
+        if info is not None:
+            info["handler"] = getattr(getattr(data.get("handler"), "callback", None), "__name__", "unknown")
+        try:
+            return await handler(event, data)
+        except Exception:
+            if info is not None:
+                info["error"] = True
+            raise
+
+
+class ReplayThrottleStore:
+    """
+    Wraps the throttling middleware's store: policies get `speed` times their
+    rate (speed None: every event is allowed), and a denied update is marked
+    as throttled.
+    """
+
+    def __init__(self, store, speed: Optional[float]):
+        self.store = store
+        self.speed = speed
+        self._scaled: Dict[TokenBucketPolicy, TokenBucketPolicy] = {}
+
+    async def hit(self, key: str, policy: TokenBucketPolicy) -> bool:
+        if self.speed is None:
+            return True
+        scaled = self._scaled.get(policy)
+        if scaled is None:
+            scaled = self._scaled[policy] = TokenBucketPolicy(rate=policy.rate * self.speed, burst=policy.burst)
+        allowed = await self.store.hit(key, scaled)
+        info = _current.get()
+        if not allowed and info is not None:
+            info["throttled"] = True
+        return allowed
+
+
+def throttle_speed(args) -> Optional[float]:
+    """Rate factor for ReplayThrottleStore; None disables throttling."""
+    if args.throttle == "off" or (args.throttle == "scaled" and args.speed <= 0):
+        return None
+    return args.speed if args.throttle == "scaled" else 1.0
+
+
+def load(paths: List[str]) -> List[Dict[str, Any]]:
+    files = sorted({f for pattern in paths for f in glob.glob(pattern)})
+    if not files:
+        raise SystemExit(f"no recordings match {' '.join(paths)}")
+    return sorted(read_recording(files), key=lambda r: r["t"])
+
+
+def sender(update: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    for key, value in update.items():
+        if isinstance(value, dict):
+            user = value.get("from") or value.get("user")
+            if isinstance(user, dict):
+                return user
+    return None
+
+
+def map_styles(update: Dict[str, Any], style_ids: List[str]) -> None:
+    """Recorded style ids do not exist here: point them at seeded styles, the same one each time."""
+    callback = update.get("callback_query")
+    if style_ids and callback and str(callback.get("data", "")).startswith("style"):
+        callback["data"] = _UUID.sub(lambda m: style_ids[int(m.group(0)[:8], 16) % len(style_ids)], callback["data"])
+
+
+async def seed(db: MemoryDatabase, records: List[Dict[str, Any]], credits: int, styles: int) -> List[str]:
+    for index in range(styles):
+        await db.create_style(f"Replay style {index + 1}", None, None, None, "Replay prompt", 1, display_order=index)
+    seen = set()
+    for record in records:
+        user = sender(record["update"])
+        if user and not user.get("is_bot") and user["id"] not in seen:
+            seen.add(user["id"])
+            language = "am" if user.get("language_code") == "am" else "en"
+            await db.create_user(user["id"], user.get("username"), user.get("first_name", "User"), language, credits)
+            if record.get("admin") and not settings.is_admin(user["id"]):
+                settings.ADMIN_IDS.append(user["id"])
+    return [str(s["id"]) for s in await db.get_all_styles()]
+
+
+def summarize(latencies: List[float], errors: int = 0) -> Dict[str, Any]:
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "mean_ms": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+        "p50_ms": round(quantile(latencies, 0.5), 2),
+        "p95_ms": round(quantile(latencies, 0.95), 2),
+        "p99_ms": round(quantile(latencies, 0.99), 2),
+    }
+
+
+async def replay(args, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    import bot as app
+
+    api = FakeBotAPI(args.latency_ms)
+    bot = doubles.make_bot(api)
+    if not args.no_pacing:
+        bot.session.middleware(outbound)
+    db = MemoryDatabase()
+    style_ids = await seed(db, records, args.credits, args.styles)
+    catalog = StyleCatalog(db)
+    await catalog.refresh()
+    app_context = AppContext(db=db, ai_service=doubles.FakeAIService(args.generation_ms / 1000),
+                             ocr_service=doubles.FakeOCRService(), payment_service=PaymentService(),
+                             broadcast_service=BroadcastService(db, bot), style_catalog=catalog)
+    app.setup_middlewares(app_context)
+    for middleware in app.dp.message.middleware:
+        if isinstance(middleware, ThrottlingMiddleware):
+            middleware.store = ReplayThrottleStore(middleware.store, throttle_speed(args))
+    for observer in (app.dp.message, app.dp.callback_query):
+        observer.middleware(HandlerNameMiddleware())
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    late: List[float] = []
+    slots = asyncio.Semaphore(args.concurrency)
+    loop = asyncio.get_running_loop()
+
+    async def feed(record: Dict[str, Any]) -> None:
+        info: Dict[str, Any] = {}
+        _current.set(info)
+        started = time.perf_counter()
+        try:
+            await app.dp.feed_update(bot, Update.model_validate(record["update"], context={"bot": bot}))
+        except Exception:
+            info["error"] = True
+        finally:
+            slots.release()
+        elapsed = (time.perf_counter() - started) * 1000
+        name = info.get("handler", THROTTLED if info.get("throttled") else NOT_HANDLED)
+        latencies[name].append(elapsed)
+        errors[name] += bool(info.get("error"))
+
+    tasks = []
+    first = records[0]["t"]
+    began = loop.time()
+    for record in records:
+        map_styles(record["update"], style_ids)
+        due = began + (record["t"] - first) / args.speed if args.speed > 0 else loop.time()
+        if due > loop.time():
+            await asyncio.sleep(due - loop.time())
+        await slots.acquire()
+        late.append((loop.time() - due) * 1000)
+        tasks.append(asyncio.create_task(feed(record)))
+    await asyncio.gather(*tasks)
+    wall = loop.time() - began
+    # admin notices run detached from the handlers; let them reach the fake API before it stops
+    await outbound.flush(5.0)
+    outbound.close()
+
+    judged = {name: values for name, values in latencies.items() if name != THROTTLED}
+    everything = [ms for values in judged.values() for ms in values]
+    return {
+        "updates": len(records),
+        "users": len({(sender(r["update"]) or {}).get("id") for r in records}),
+        "speed": args.speed,
+        "throttle": args.throttle,
+        "throttled": len(latencies.get(THROTTLED, ())),
+        "not_handled": len(latencies.get(NOT_HANDLED, ())),
+        "concurrency": args.concurrency,
+        "recorded_span_s": round(records[-1]["t"] - first, 1),
+        "wall_s": round(wall, 2),
+        "throughput_rps": round(len(records) / wall, 1) if wall else 0.0,
+        "late_ms": {"p50": round(quantile(late, 0.5), 1), "p95": round(quantile(late, 0.95), 1)},
+        "recorded": summarize([r["ms"] for r in records]),
+        "overall": summarize(everything, sum(errors[name] for name in judged)),
+        "handlers": {name: summarize(values, errors[name])
+                     for name, values in sorted(latencies.items(), key=lambda kv: -len(kv[1]))},
+        "bot_api_calls": dict(api.methods.most_common()),
+    }
+
+
+def _change(now: float, before: float) -> str:
+    return f"{now / before - 1:>+7.0%}" if before else f"{'-':>7}"
+
+
+def report_entry(report: Optional[Dict[str, Any]], name: str) -> Optional[Dict[str, Any]]:
+    if not report:
+        return None
+    return report["overall"] if name == "(all)" else report.get("handlers", {}).get(name)
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    speed = f"{report['speed']}x" if report["speed"] > 0 else "max speed"
+    print(f"\n{report['updates']} updates from {report['users']} users, recorded over {report['recorded_span_s']}s, "
+          f"replayed at {speed} in {report['wall_s']}s -> {report['throughput_rps']} updates/s")
+    print(f"throttle: {report.get('throttle', 'production')}, {report.get('throttled', '?')} throttled, "
+          f"{report.get('not_handled', '?')} not handled")
+    print(f"start lateness: p50 {report['late_ms']['p50']} ms  p95 {report['late_ms']['p95']} ms")
+    recorded = report["recorded"]
+    print(f"recorded in production: p50 {recorded['p50_ms']} ms  p95 {recorded['p95_ms']} ms  p99 {recorded['p99_ms']} ms")
+
+    before = (baseline or {}).get("handlers", {})
+    header = f"\n{'handler':32} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}"
+    print(header + (f" {'base p50':>9} {'base p95':>9} {'p95':>7}" if baseline else ""))
+    rows = list(report["handlers"].items()) + [("(all)", report["overall"])]
+    for name, s in rows:
+        line = f"{name:32} {s['count']:>6} {s['p50_ms']:>9} {s['p95_ms']:>9} {s['p99_ms']:>9} {s['errors']:>7}"
+        base = report_entry(baseline, name) if baseline else None
+        if base:
+            line += f" {base['p50_ms']:>9} {base['p95_ms']:>9} {_change(s['p95_ms'], base['p95_ms'])}"
+        elif baseline:
+            line += f" {'new':>9}"
+        print(line)
+    for name in before:
+        if name not in report["handlers"]:
+            print(f"{name:32} {0:>6} {'-':>9} {'-':>9} {'-':>9} {'-':>7} {before[name]['p50_ms']:>9} {before[name]['p95_ms']:>9}")
+    print(f"\nBot API calls: {report['bot_api_calls']}")
+
+
+def regressions(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float, min_count: int) -> List[str]:
+    slow = []
+    for name, s in list(report["handlers"].items()) + [("(all)", report["overall"])]:
+        if name == THROTTLED:
+            continue
+        base = report_entry(baseline, name)
+        if base and s["count"] >= min_count and base["p95_ms"] and s["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            slow.append(name)
+    return slow
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay recorded updates against in-process fakes")
+    parser.add_argument("files", nargs="+", help="recorded .jsonl.gz files (glob patterns allowed)")
+    parser.add_argument("--speed", type=float, default=1.0, help="time compression; 0 = as fast as possible")
+    parser.add_argument("--throttle", choices=("scaled", "production", "off"), default="scaled",
+                        help="throttle limits: raised by --speed (off at speed 0), as in production, or none")
+    parser.add_argument("--concurrency", type=int, default=settings.WEBHOOK_MAX_IN_FLIGHT,
+                        help="updates handled at once (webhook worker pool size)")
+    parser.add_argument("--limit", type=int, default=0, help="replay only the first N updates")
+    parser.add_argument("--credits", type=int, default=1000, help="starting balance of every recorded user")
+    parser.add_argument("--styles", type=int, default=8, help="active styles to create")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="fake Bot API latency")
+    parser.add_argument("--generation-ms", type=float, default=0.0, help="fake image generation time")
+    parser.add_argument("--no-pacing", action="store_true", help="skip the outbound per-chat pacing")
+    parser.add_argument("--save", default="", help="write the report as JSON to this file")
+    parser.add_argument("--compare", default="", help="an earlier --save report to compare against")
+    parser.add_argument("--fail-above", type=float, default=None,
+                        help="with --compare: exit 1 when a handler's p95 is slower by more than this, e.g. 0.2")
+    parser.add_argument("--min-count", type=int, default=20, help="handlers with fewer updates are not judged")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="keep the bot's INFO logs")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger("flexa_ai").setLevel(logging.WARNING)
+        logging.getLogger("aiogram").setLevel(logging.WARNING)
+    records = load(args.files)
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        raise SystemExit("the recordings hold no updates")
+    print(f"replaying {len(records)} updates", file=sys.stderr)
+    report = asyncio.run(replay(args, records))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, baseline)
+
+    if baseline is not None and args.fail_above is not None:
+        slow = regressions(report, baseline, args.fail_above, args.min_count)
+        if slow:
+            print(f"\np95 slower than {args.compare} by more than {args.fail_above:.0%}: {', '.join(slow)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
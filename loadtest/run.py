@@ -0,0 +1,275 @@
+# loadtest/run.py
+"""
+Load test: a fake Bot API plus synthetic users posting updates to /webhook.
+
+    # bot already running with TELEGRAM_API_URL=http://127.0.0.1:8081
+    python -m loadtest.run --users 200 --arrival-rate 10 --duration 120
+
+    # or let the runner start bot.py against the fake API
+    python -m loadtest.run --spawn --users 200 --duration 120
+
+The bot still needs a real DATABASE_URL (use a scratch Postgres, load users
+are created as 9xxxxxxxx ids). A spawned bot gets the image-provider keys
+blanked, so generations take the no-provider path to the manual queue instead of
+making paid calls for every synthetic user; --real-providers keeps them.
+OCR runs locally (Tesseract) either way. A bot you started yourself uses
+whatever keys its environment has.
+
+Reported per step: first-reply latency as seen by the user (webhook POST
+until the bot's first Bot API call to that chat), timeouts, and for photo
+uploads the time until the chat went quiet. When /metrics is reachable, the
+per-handler server-side latency (flexa_handler_seconds) and error rate
+(flexa_updates_total) for the run window are added.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import secrets
+import signal
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+from aiohttp import web
+
+from loadtest.fake_bot_api import FakeBotAPI
+from loadtest.journeys import Stats, VirtualUser
+
+DEFAULT_MIX = "browse=4,generate=3,check_credits=2,buy=1"
+# blanked for a spawned bot; set (even empty) they also win over the bot's .env
+PROVIDER_KEYS = ("GEMINI_API_KEY", "BANANA_API_KEY", "HF_API_KEY", "REPLICATE_API_TOKEN")
+FIRST_USER_ID = 900_000_000
+
+_SAMPLE = re.compile(r'^(\w+)\{(.*)\} ([0-9.eE+-]+|\+Inf)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def _unescape(value: str) -> str:
+    return re.sub(r'\\(.)', lambda m: "\n" if m.group(1) == "n" else m.group(1), value)
+
+
+def quantile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, weight = part.partition("=")
+        if not hasattr(VirtualUser, name.strip()):
+            raise SystemExit(f"unknown journey in --mix: {name}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+# --- /metrics scraping ---
+async def scrape(session: aiohttp.ClientSession, target: str, token: str) -> Dict[Tuple[str, Tuple], float]:
+    params = {"token": token} if token else None
+    try:
+        async with session.get(f"{target}/metrics", params=params) as response:
+            if response.status != 200:
+                return {}
+            text = await response.text()
+    except aiohttp.ClientError:
+        return {}
+    samples = {}
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if match and match.group(1) in ("flexa_handler_seconds_bucket", "flexa_updates_total"):
+            labels = tuple(sorted((k, _unescape(v)) for k, v in _LABEL.findall(match.group(2))))
+            samples[(match.group(1), labels)] = float(match.group(3))
+    return samples
+
+
+def server_side(before: Dict, after: Dict) -> Dict[str, Dict[str, float]]:
+    """Per-handler p50/p95/p99 and error rate from the difference of two scrapes."""
+    buckets: Dict[str, List[Tuple[float, float]]] = defaultdict(list)
+    outcomes: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    for key, value in after.items():
+        name, labels = key
+        delta = value - before.get(key, 0.0)
+        labels = dict(labels)
+        if name == "flexa_handler_seconds_bucket":
+            le = float("inf") if labels["le"] == "+Inf" else float(labels["le"])
+            buckets[labels["handler"]].append((le, delta))
+        else:
+            outcomes[labels["handler"]][labels["outcome"]] += delta
+
+    report = {}
+    for handler, rows in buckets.items():
+        rows.sort()
+        total = rows[-1][1] if rows else 0
+        if not total:
+            continue
+        entry = {"count": total}
+        for q in (0.5, 0.95, 0.99):
+            entry[f"p{int(q * 100)}"] = next(le for le, cumulative in rows if cumulative >= q * total)
+        handled = sum(outcomes[handler].values())
+        errors = handled - outcomes[handler].get("ok", 0)
+        entry["error_rate"] = errors / handled if handled else 0.0
+        report[handler] = entry
+    return report
+
+
+# --- bot process ---
+async def spawn_bot(target: str, api_url: str, stats_token: str, ready_timeout: float,
+                    real_providers: bool = False) -> asyncio.subprocess.Process:
+    port = target.rsplit(":", 1)[-1].split("/")[0]
+    env = {**os.environ, "TELEGRAM_API_URL": api_url, "WEBHOOK_BASE_URL": target, "PORT": port,
+           "STATS_TOKEN": stats_token}
+    if not real_providers:
+        env.update({key: "" for key in PROVIDER_KEYS})
+    env.setdefault("BOT_TOKEN", "123456:loadtest")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = await asyncio.create_subprocess_exec(sys.executable, "bot.py", cwd=root, env=env)
+    deadline = time.monotonic() + ready_timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            if process.returncode is not None:
+                raise SystemExit(f"bot.py exited with {process.returncode} during startup")
+            try:
+                async with session.get(f"{target}/health/ready") as response:
+                    if response.status == 200:
+                        return process
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.5)
+    process.terminate()
+    raise SystemExit(f"bot.py not ready after {ready_timeout:.0f}s")
+
+
+async def stop_bot(process: asyncio.subprocess.Process) -> None:
+    if process.returncode is None:
+        process.send_signal(signal.SIGTERM)
+        try:
+            await asyncio.wait_for(process.wait(), 40)
+        except asyncio.TimeoutError:
+            process.kill()
+
+
+# --- run ---
+async def run(args) -> Dict:
+    api = FakeBotAPI(args.latency_ms, args.jitter_ms)
+    runner = web.AppRunner(api.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.api_port).start()
+    api_url = f"http://127.0.0.1:{args.api_port}"
+
+    if args.spawn and not args.stats_token:
+        # /metrics is closed without a token
+        args.stats_token = secrets.token_hex(16)
+    process = await spawn_bot(args.target, api_url, args.stats_token, args.ready_timeout,
+                              args.real_providers) if args.spawn else None
+    stats = Stats()
+    mix = parse_mix(args.mix)
+    connector = aiohttp.TCPConnector(limit=0)
+    try:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            before = await scrape(session, args.target, args.stats_token)
+            started = time.monotonic()
+            until = started + args.duration
+            users = []
+            for i in range(args.users):
+                if time.monotonic() >= until:
+                    break
+                user = VirtualUser(FIRST_USER_ID + i, session, f"{args.target}/webhook", api, stats,
+                                   args.think, args.reply_timeout, args.settle_timeout)
+                users.append(asyncio.create_task(user.run(until, mix)))
+                await asyncio.sleep(1 / args.arrival_rate)
+            await asyncio.gather(*users)
+            elapsed = time.monotonic() - started
+            # the last generations may still be running; give their counters a moment to land
+            await asyncio.sleep(1)
+            after = await scrape(session, args.target, args.stats_token)
+    finally:
+        if process:
+            await stop_bot(process)
+        await runner.cleanup()
+
+    return {
+        "users": len(users),
+        "elapsed_s": round(elapsed, 1),
+        "updates": stats.updates_sent,
+        "throughput_rps": round(stats.updates_sent / elapsed, 2) if elapsed else 0.0,
+        "ack_ms": {f"p{int(q * 100)}": round(quantile(stats.acks, q) * 1000, 1) for q in (0.5, 0.95, 0.99)},
+        "http_errors": dict(stats.http_errors),
+        "journeys": dict(stats.journeys),
+        "steps": {
+            name: {
+                "count": len(values),
+                **{f"p{int(q * 100)}_ms": round(quantile(values, q) * 1000, 1) for q in (0.5, 0.95, 0.99)},
+                "timeouts": stats.timeouts.get(name, 0),
+            }
+            for name, values in sorted(stats.steps.items())
+        },
+        "timeouts": dict(stats.timeouts),
+        "skipped": dict(stats.skipped),
+        "server": server_side(before, after) if before or after else {},
+        "bot_api_calls": dict(api.methods.most_common()),
+    }
+
+
+def print_report(report: Dict) -> None:
+    print(f"\n{report['users']} users, {report['updates']} updates in {report['elapsed_s']}s "
+          f"-> {report['throughput_rps']} updates/s")
+    ack = report["ack_ms"]
+    print(f"webhook ack: p50 {ack['p50']} ms  p95 {ack['p95']} ms  p99 {ack['p99']} ms")
+    if report["http_errors"]:
+        print(f"webhook errors: {report['http_errors']}")
+
+    print(f"\n{'step (first reply)':32} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'timeouts':>9}")
+    for name, s in report["steps"].items():
+        print(f"{name:32} {s['count']:>6} {s['p50_ms']:>9} {s['p95_ms']:>9} {s['p99_ms']:>9} {s['timeouts']:>9}")
+    for name, n in report["timeouts"].items():
+        if name not in report["steps"]:
+            print(f"{name:32} {0:>6} {'-':>9} {'-':>9} {'-':>9} {n:>9}")
+    if report["skipped"]:
+        print(f"skipped (no keyboard to press): {report['skipped']}")
+
+    if report["server"]:
+        print(f"\n{'handler (server side)':32} {'n':>6} {'p50 s':>9} {'p95 s':>9} {'p99 s':>9} {'errors':>9}")
+        for handler, s in sorted(report["server"].items(), key=lambda kv: -kv[1]["count"]):
+            print(f"{handler:32} {int(s['count']):>6} {s['p50']:>9} {s['p95']:>9} {s['p99']:>9} {s['error_rate']:>8.1%}")
+    else:
+        print("\n/metrics not reachable; server-side numbers skipped (set --stats-token?)")
+    print(f"\nBot API calls: {report['bot_api_calls']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Flexa AI webhook load test")
+    parser.add_argument("--target", default="http://127.0.0.1:8080", help="bot base URL (webhook mode)")
+    parser.add_argument("--api-port", type=int, default=8081, help="port for the fake Bot API")
+    parser.add_argument("--spawn", action="store_true", help="start bot.py pointed at the fake API")
+    parser.add_argument("--real-providers", action="store_true",
+                        help="keep the image-provider keys for the spawned bot (paid calls per generation)")
+    parser.add_argument("--ready-timeout", type=float, default=60.0)
+    parser.add_argument("--users", type=int, default=50, help="virtual users to start")
+    parser.add_argument("--arrival-rate", type=float, default=5.0, help="new users per second")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of load")
+    # above the throttling limits (1.5s messages, 0.5s callbacks), otherwise users get throttled
+    parser.add_argument("--think", type=float, default=2.5, help="mean pause between a user's steps, seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="journey weights after onboarding")
+    parser.add_argument("--reply-timeout", type=float, default=15.0)
+    parser.add_argument("--settle-timeout", type=float, default=120.0, help="max wait for a generation/payment to finish")
+    parser.add_argument("--latency-ms", type=float, default=30.0, help="fake Bot API latency")
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--stats-token", default=os.getenv("STATS_TOKEN", ""))
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
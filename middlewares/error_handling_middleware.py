@@ -3,7 +3,7 @@ import logging
 from aiogram import BaseMiddleware
 from typing import Callable, Dict, Any, Awaitable
 from aiogram.types import TelegramObject
-from config import settings
+from utils.error_reporter import error_aggregator
 
 logger = logging.getLogger(__name__)
 
@@ -43,12 +43,8 @@ class ErrorHandlingMiddleware(BaseMiddleware):
                             "⚠️ Your request took too long. Please wait or try again."
                         )
 
-            if settings.ADMIN_ERROR_GROUP_ID and bot:
-                await bot.send_message(
-                    settings.ADMIN_ERROR_GROUP_ID,
-                    f"❌ Exception:\n{e}",
-                    parse_mode=None
-                )
+            # Admins get a periodic digest; never send to the group from the failing handler
+            error_aggregator.record(e, user_id=user.id if user else None)
 
             return None
 
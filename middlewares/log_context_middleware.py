@@ -0,0 +1,27 @@
+# middlewares/log_context_middleware.py
+from aiogram import BaseMiddleware
+from typing import Callable, Dict, Any, Awaitable
+from aiogram.types import TelegramObject
+
+from utils.logger import log_context
+
+
+class LogContextMiddleware(BaseMiddleware):
+    """
+    Outer update middleware: every record logged while an update is handled
+    carries its update_id and user_id. Handlers add more fields with
+    `bind_log_context` (e.g. generation_id).
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        token = log_context.set({"update_id": getattr(event, "update_id", None), "user_id": user.id if user else None})
+        try:
+            return await handler(event, data)
+        finally:
+            log_context.reset(token)
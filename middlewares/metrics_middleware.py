@@ -0,0 +1,43 @@
+# middlewares/metrics_middleware.py
+import time
+from aiogram import BaseMiddleware
+from typing import Callable, Dict, Any, Awaitable
+from aiogram.types import TelegramObject
+
+from utils.metrics import Counter, Gauge, Histogram
+
+HANDLER_SECONDS = Histogram("flexa_handler_seconds", "Handler latency", ["handler"])
+UPDATES = Counter("flexa_updates_total", "Updates handled, by handler and outcome", ["handler", "outcome"])
+HANDLERS_IN_PROGRESS = Gauge("flexa_handlers_in_progress", "Handlers currently running")
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Counts and times every handled update per handler.
+
+    Register it as the innermost middleware (after ErrorHandlingMiddleware),
+    so it times only the handler and still sees exceptions before they are
+    swallowed. Recording is a few dict lookups and float adds on the loop
+    thread; no locks.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        HANDLERS_IN_PROGRESS.inc()
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            return await handler(event, data)
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            HANDLERS_IN_PROGRESS.dec()
+            HANDLER_SECONDS.labels(name).observe(time.perf_counter() - started)
+            UPDATES.labels(name, outcome).inc()
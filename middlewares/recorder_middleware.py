@@ -0,0 +1,41 @@
+# middlewares/recorder_middleware.py
+import time
+from aiogram import BaseMiddleware
+from typing import Callable, Dict, Any, Awaitable
+from aiogram.types import TelegramObject
+
+from utils.update_recorder import UpdateRecorder
+
+
+class UpdateRecorderMiddleware(BaseMiddleware):
+    """
+    Outer update middleware: hands a sample of raw updates, with their arrival
+    time and handling time, to the UpdateRecorder. Register it first so the
+    time covers every other middleware. Unsampled updates cost one hash.
+    """
+
+    def __init__(self, recorder: UpdateRecorder):
+        self.recorder = recorder
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        user_id = user.id if user else None
+        if not self.recorder.sampled(user_id if user_id is not None else f"update:{getattr(event, 'update_id', '')}"):
+            return await handler(event, data)
+
+        arrived = time.time()
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            return await handler(event, data)
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            self.recorder.submit(event.model_dump(mode="json", exclude_none=True, by_alias=True), user_id,
+                                 arrived, (time.perf_counter() - started) * 1000, outcome)
@@ -1,55 +1,87 @@
 # middlewares/throttling_middleware.py
 import asyncio
-import time
 from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
 from aiogram.types import Message, CallbackQuery
-from typing import Callable, Dict, Any, Awaitable
+from typing import Callable, Dict, Any, Awaitable, Optional
 
+from config.settings import settings
+from utils.cache import user_languages
 from utils.helpers import get_text
+from utils.ratelimit import MemoryRateLimitStore, TokenBucketPolicy
+
 
 class ThrottlingMiddleware(BaseMiddleware):
-    def __init__(self, message_interval: float = 1.5, callback_interval: float = 0.5) -> None:
+    """
+    Per-user token bucket throttling.
+
+    Messages and callbacks are limited by the "message" and "callback" groups.
+    A handler can opt into its own group with `flags={"rate_limit": "<group>"}`,
+    e.g. expensive uploads get a slower bucket than menu taps. One instance is
+    meant to be shared by the message and callback_query observers.
+
+    The allow/deny decision is made before anything else and, with the memory
+    store, costs no I/O; a rejected event never reaches the database.
+    """
+
+    def __init__(
+        self,
+        message_interval: float = 1.5,
+        callback_interval: float = 0.5,
+        policies: Optional[Dict[str, TokenBucketPolicy]] = None,
+        store=None,
+        max_entries: int = 100_000,
+    ) -> None:
         super().__init__()
-        self.message_interval = message_interval
-        self.callback_interval = callback_interval
-        self._last_seen_msg: dict[int, float] = {}
-        self._last_seen_cb: dict[int, float] = {}
+        self.policies: Dict[str, TokenBucketPolicy] = {
+            "message": TokenBucketPolicy.every(message_interval),
+            "callback": TokenBucketPolicy.every(callback_interval),
+        }
+        if policies:
+            self.policies.update(policies)
+        if store is None:
+            # buckets must outlive their refill time, otherwise expiry would reset them early
+            ttl = max(60.0, max(p.refill_time for p in self.policies.values()))
+            store = MemoryRateLimitStore(ttl=ttl, max_entries=max_entries)
+        self.store = store
 
-    async def __call__(self, handler, event, data):
+    def _resolve_group(self, event, data: Dict[str, Any]) -> Optional[str]:
+        group = get_flag(data, "rate_limit")
+        if group in self.policies:
+            return group
+        if isinstance(event, Message):
+            return "message"
+        if isinstance(event, CallbackQuery):
+            return "callback"
+        return None
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any]
+    ) -> Any:
         user_id = getattr(getattr(event, "from_user", None), "id", None)
-        now = time.time()
+        group = self._resolve_group(event, data)
+        if user_id is None or group is None:
+            return await handler(event, data)
+
+        if await self.store.hit(f"{group}:{user_id}", self.policies[group]):
+            return await handler(event, data)
+
+        # Throttled events must not touch the DB: language comes from the in-process cache
+        lang = user_languages.get(user_id, settings.DEFAULT_LANGUAGE)
 
-        # Try to fetch user language from DB via app_context
-        lang = "en"
-        app_context = data.get("app_context")
-        if user_id and app_context:
+        if isinstance(event, Message):
             try:
-                db_user = await app_context.db.get_user(user_id)
-                if db_user and db_user.get("language"):
-                    lang = db_user["language"]
+                msg = await event.answer(get_text("error_throttle_message", lang))
+                await asyncio.sleep(1)
+                await msg.delete()
             except Exception:
                 pass
-
-        if isinstance(event, Message):
-            last = self._last_seen_msg.get(user_id, 0.0)
-            if (now - last) < self.message_interval:
-                try:
-                    msg = await event.answer(get_text("error_throttle_message", lang))
-                    await asyncio.sleep(1)
-                    await msg.delete()
-                except Exception:
-                    pass
-                return None
-            self._last_seen_msg[user_id] = now
-
         elif isinstance(event, CallbackQuery):
-            last = self._last_seen_cb.get(user_id, 0.0)
-            if (now - last) < self.callback_interval:
-                try:
-                    await event.answer(get_text("error_throttle_callback", lang), show_alert=False)
-                except Exception:
-                    pass
-                return None
-            self._last_seen_cb[user_id] = now
-
-        return await handler(event, data)
+            try:
+                await event.answer(get_text("error_throttle_callback", lang), show_alert=False)
+            except Exception:
+                pass
+        return None
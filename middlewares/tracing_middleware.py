@@ -0,0 +1,37 @@
+# middlewares/tracing_middleware.py
+from aiogram import BaseMiddleware
+from typing import Callable, Dict, Any, Awaitable
+from aiogram.types import TelegramObject, Update
+
+from utils.tracing import tracer
+
+
+class TracingMiddleware(BaseMiddleware):
+    """
+    Register as `dp.update.outer_middleware` to open the root span of every
+    update (throttled ones included), and as an inner message/callback
+    middleware to add a span named after the handler that ran.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if not tracer.enabled:
+            return await handler(event, data)
+
+        if isinstance(event, Update):
+            user = data.get("event_from_user")
+            with tracer.trace(
+                f"update.{event.event_type}",
+                update_id=event.update_id,
+                user_id=user.id if user else 0
+            ):
+                return await handler(event, data)
+
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        with tracer.span(f"handler.{name}"):
+            return await handler(event, data)
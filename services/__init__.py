@@ -1,5 +1,7 @@
 from .ai_image import AIImageService
 from .ocr import OCRService
 from .payment import PaymentService
+from .broadcast import BroadcastService
+from .style_catalog import StyleCatalog
 
-__all__ = ['AIImageService', 'OCRService', 'PaymentService']
+__all__ = ['AIImageService', 'OCRService', 'PaymentService', 'BroadcastService', 'StyleCatalog']
@@ -147,9 +147,56 @@
 # services/ai_image_service.py
 import time
 import asyncio
-from typing import Optional, Tuple
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
 
 from utils.logger import logger
+from utils.metrics import Counter, Histogram
+from utils.tracing import traced
+
+# Recorded per attempt by callers of generate_image, so they survive provider swaps
+PROVIDER_SECONDS = Histogram("flexa_provider_seconds", "Image provider call latency", ["provider", "outcome"])
+PROVIDER_ERRORS = Counter("flexa_provider_errors_total", "Image provider calls that failed or returned no image", ["provider"])
+
+
+class ProviderHealth:
+    """
+    Failure ratio over the last `window` provider attempts.
+
+    Readiness reports a failing provider as degraded rather than not ready:
+    generations fall back to the manual queue, and every other feature still works.
+    """
+
+    def __init__(self, window: int = 20, max_failure_ratio: float = 0.5):
+        self.max_failure_ratio = max_failure_ratio
+        self._outcomes = deque(maxlen=window)
+        self.last_error: Optional[str] = None
+        self.last_success_at: Optional[float] = None
+
+    def record(self, ok: bool, error: Optional[str] = None) -> None:
+        self._outcomes.append(ok)
+        if ok:
+            self.last_success_at = time.time()
+        else:
+            self.last_error = error
+
+    @property
+    def failure_ratio(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "healthy": self.failure_ratio <= self.max_failure_ratio,
+            "failure_ratio": round(self.failure_ratio, 3),
+            "attempts": len(self._outcomes),
+            "last_error": self.last_error,
+            "last_success_at": self.last_success_at,
+        }
+
+
+provider_health = ProviderHealth()
 
 
 class AIImageService:
@@ -164,6 +211,7 @@ class AIImageService:
         # No external client setup needed
         self._model_name = "stubbed-model"
 
+    @traced("ai.generate_image")
     async def generate_image(self, image_bytes: bytes, prompt: str) -> Tuple[Optional[bytes], Optional[str], str, int]:
         """
         Simulate image generation by waiting 5 seconds and returning failure.
@@ -181,6 +229,7 @@ class AIImageService:
 
         return None, "Image generation disabled (stubbed)", provider, processing_time
 
+    @traced("ai.download_telegram_file")
     async def download_telegram_file(self, bot, file_id: str) -> bytes:
         """
         Download a Telegram file (photo) and return raw bytes.
@@ -0,0 +1,147 @@
+# services/broadcast.py
+import asyncio
+from typing import Dict, Optional
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from utils.logger import logger
+from utils.outbound import Priority, outbound_priority
+
+
+class BroadcastService:
+    """
+    Sends one admin message to every active user.
+
+    - users are streamed in keyset pages (id > last_user_id), never loaded all at once
+    - each page is sent concurrently through the outbound scheduler's BULK lane,
+      so user replies and admin notifications always go first
+    - progress is checkpointed to `broadcasts` after every page; after a restart
+      the job resumes from the last checkpoint (at most one page is re-sent)
+    - users who blocked the bot are marked is_active = false once per page
+    - a DB lease makes sure only one instance runs a given broadcast
+    """
+
+    def __init__(self, db, bot, batch_size: int = 200, concurrency: int = 20, lease_seconds: float = 120.0):
+        self.db = db
+        self.bot = bot
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def start(self, broadcast_id: str) -> None:
+        await self.db.set_broadcast_status(broadcast_id, 'running')
+        await self.resume_pending()
+
+    async def resume_pending(self) -> int:
+        """Claim running broadcasts without a live owner and run them here."""
+        claimed = await self.db.claim_broadcasts(self.lease_seconds)
+        for broadcast in claimed:
+            bid = str(broadcast['id'])
+            if bid in self._tasks:
+                continue
+            logger.info(f"[broadcast] running {bid} from user id {broadcast['last_user_id']}")
+            task = asyncio.create_task(self._run(broadcast))
+            self._tasks[bid] = task
+            task.add_done_callback(lambda _t, bid=bid: self._tasks.pop(bid, None))
+        return len(claimed)
+
+    async def run_forever(self, interval: float = 60.0) -> None:
+        """Periodically pick up broadcasts whose owner died (lease expired)."""
+        while True:
+            try:
+                await self.resume_pending()
+            except Exception:
+                logger.exception("[broadcast] failed to resume pending broadcasts")
+            await asyncio.sleep(interval)
+
+    def running(self) -> int:
+        return len(self._tasks)
+
+    async def close(self) -> None:
+        """Stop local jobs and release their leases so another instance can resume immediately."""
+        tasks = list(self._tasks.items())
+        for _, task in tasks:
+            task.cancel()
+        for bid, task in tasks:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+            try:
+                await self.db.release_broadcast(bid)
+            except Exception:
+                logger.exception(f"[broadcast] failed to release {bid}")
+
+    async def _send_one(self, semaphore: asyncio.Semaphore, broadcast: dict, user_id: int) -> str:
+        async with semaphore:
+            try:
+                await self.bot.copy_message(
+                    chat_id=user_id,
+                    from_chat_id=broadcast['from_chat_id'],
+                    message_id=broadcast['message_id']
+                )
+                return 'sent'
+            except TelegramForbiddenError:
+                return 'blocked'
+            except TelegramBadRequest as e:
+                if "chat not found" in str(e).lower():
+                    return 'blocked'
+                logger.warning(f"[broadcast] send to {user_id} failed: {e}")
+                return 'failed'
+            except Exception as e:
+                logger.warning(f"[broadcast] send to {user_id} failed: {e}")
+                return 'failed'
+
+    async def _run(self, broadcast: dict) -> None:
+        outbound_priority.set(Priority.BULK)
+        bid = str(broadcast['id'])
+        last_id = broadcast['last_user_id'] or 0
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        try:
+            while True:
+                user_ids = await self.db.get_broadcast_user_ids(last_id, self.batch_size, broadcast.get('language'))
+                if not user_ids:
+                    await self.db.set_broadcast_status(bid, 'completed')
+                    await self._report(bid)
+                    return
+
+                results = await asyncio.gather(*(self._send_one(semaphore, broadcast, uid) for uid in user_ids))
+                blocked = [uid for uid, r in zip(user_ids, results) if r == 'blocked']
+                await self.db.deactivate_users(blocked)
+
+                last_id = user_ids[-1]
+                status = await self.db.checkpoint_broadcast(
+                    bid,
+                    last_id,
+                    sent=results.count('sent'),
+                    failed=results.count('failed'),
+                    blocked=len(blocked),
+                    lease_seconds=self.lease_seconds
+                )
+                if status != 'running':
+                    logger.info(f"[broadcast] {bid} stopped with status {status}")
+                    return
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # lease expires and run_forever picks the job up again from the last checkpoint
+            logger.exception(f"[broadcast] {bid} crashed at user id {last_id}")
+
+    async def _report(self, broadcast_id: str) -> None:
+        b: Optional[dict] = await self.db.get_broadcast(broadcast_id)
+        if not b:
+            return
+        logger.info(f"[broadcast] {broadcast_id} completed: sent={b['sent']} failed={b['failed']} blocked={b['blocked']}")
+        try:
+            await self.bot.send_message(
+                b['created_by'],
+                f"📣 <b>Broadcast finished</b>\n\n"
+                f"✅ Sent: {b['sent']}\n"
+                f"🚫 Blocked (deactivated): {b['blocked']}\n"
+                f"⚠️ Failed: {b['failed']}",
+                parse_mode="HTML"
+            )
+        except Exception:
+            logger.exception("[broadcast] failed to send completion report")
@@ -1,15 +1,84 @@
-import pytesseract
-from PIL import Image
+import asyncio
 import io
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Optional
+from config.settings import settings
 from utils.logger import logger
+from utils.metrics import Counter, Gauge, Histogram
+from utils.shutdown import ShutdownDeadline, shutdown
+from utils.tracing import traced
+
+OCR_SECONDS = Histogram("flexa_ocr_seconds", "OCR time including wait for a worker")
+OCR_ERRORS = Counter("flexa_ocr_errors_total", "OCR extractions that failed")
+OCR_IN_FLIGHT = Gauge("flexa_ocr_in_flight", "OCR jobs queued or running")
+OCR_WORKERS = Gauge("flexa_ocr_workers", "OCR worker threads")
+OCR_UTILIZATION = Gauge("flexa_ocr_utilization", "Busy share of OCR workers (0-1)")
+
+
+_AMOUNT_RE = re.compile(r'(\d+)\s*Birr', re.IGNORECASE)
+_TXN_RE = re.compile(r'(?:TXN|Transaction)\s*[:\-]?\s*([A-Z0-9]+)', re.IGNORECASE)
+_SENDER_RE = re.compile(r'(?:From|Sender)\s*[:\-]?\s*(\w+)', re.IGNORECASE)
+
+
+def parse_payment_text(raw_text: str) -> Dict[str, Optional[str]]:
+    """Pick amount, transaction id and sender out of OCR text."""
+    amount_match = _AMOUNT_RE.search(raw_text)
+    txn_match = _TXN_RE.search(raw_text)
+    sender_match = _SENDER_RE.search(raw_text)
+    return {
+        'amount': amount_match.group(1) if amount_match else None,
+        'transaction_id': txn_match.group(1) if txn_match else None,
+        'sender': sender_match.group(1) if sender_match else None,
+        'raw_text': raw_text
+    }
+
 
 class OCRService:
+    """
+    Tesseract runs in a bounded thread pool so a large screenshot never blocks
+    the event loop. In-flight jobs are counted on the loop thread, so the pool
+    gauges need no locking.
+    """
+
+    def __init__(self, max_workers: int = settings.OCR_WORKERS):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ocr")
+        self.in_flight = 0
+        OCR_WORKERS.set(max_workers)
+        OCR_IN_FLIGHT.set_function(lambda: self.in_flight)
+        OCR_UTILIZATION.set_function(lambda: min(self.in_flight, self.max_workers) / self.max_workers)
+
+    @traced("ocr.extract_payment_info")
+    async def extract_payment_info(self, image_bytes: bytes) -> Dict[str, Optional[str]]:
+        logger.info("OCR extraction requested (pytesseract)")
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            with shutdown.track("ocr"):
+                try:
+                    result = await shutdown.until_deadline(
+                        loop.run_in_executor(self._executor, self._extract_sync, image_bytes)
+                    )
+                except ShutdownDeadline:
+                    # same shape as a failed OCR: the payment is still stored, as pending for manual review
+                    result = {'amount': None, 'transaction_id': None, 'sender': None, 'raw_text': None,
+                              'error': 'Interrupted by restart'}
+            if result.get('error'):
+                OCR_ERRORS.inc()
+            return result
+        finally:
+            self.in_flight -= 1
+            OCR_SECONDS.observe(time.perf_counter() - started)
+
     @staticmethod
-    async def extract_payment_info(image_bytes: bytes) -> Dict[str, Optional[str]]:
+    def _extract_sync(image_bytes: bytes) -> Dict[str, Optional[str]]:
         try:
-            logger.info("OCR extraction requested (pytesseract)")
+            # imported on first use, in the worker thread: most instances never run OCR
+            import pytesseract
+            from PIL import Image
 
             # Convert bytes to PIL image
             image = Image.open(io.BytesIO(image_bytes))
@@ -17,17 +86,7 @@ class OCRService:
             # Run OCR
             raw_text = pytesseract.image_to_string(image)
 
-            # Try to parse key fields
-            amount_match = re.search(r'(\d+)\s*Birr', raw_text, re.IGNORECASE)
-            txn_match = re.search(r'(?:TXN|Transaction)\s*[:\-]?\s*([A-Z0-9]+)', raw_text, re.IGNORECASE)
-            sender_match = re.search(r'(?:From|Sender)\s*[:\-]?\s*(\w+)', raw_text, re.IGNORECASE)
-
-            return {
-                'amount': amount_match.group(1) if amount_match else None,
-                'transaction_id': txn_match.group(1) if txn_match else None,
-                'sender': sender_match.group(1) if sender_match else None,
-                'raw_text': raw_text
-            }
+            return parse_payment_text(raw_text)
 
         except Exception as e:
             logger.error(f"OCR extraction failed: {e}")
@@ -38,3 +97,6 @@ class OCRService:
                 'raw_text': None,
                 'error': str(e)
             }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
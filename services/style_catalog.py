@@ -0,0 +1,137 @@
+# services/style_catalog.py
+import asyncio
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Awaitable, Callable, List, Mapping, Optional, Set, Tuple
+
+import asyncpg
+
+from utils.logger import logger
+
+STYLES_CHANNEL = "styles_changed"
+
+
+@dataclass(frozen=True)
+class StyleSnapshot:
+    version: int
+    active: Tuple[Mapping, ...]     # is_active styles in display order
+    by_id: Mapping[str, Mapping]    # every style, keyed by str(id)
+
+
+class StyleCatalog:
+    """
+    Process-wide, read-only copy of the `styles` table.
+
+    Readers get an immutable snapshot: rows are MappingProxyType views, the
+    active list is pre-sorted and lookups by id are a dict access. A refresh
+    builds a complete new snapshot and swaps it in with one assignment, so a
+    reader never sees a half-updated catalog.
+
+    `Database.create_style/update_style/delete_style` send
+    `NOTIFY styles_changed`; every replica LISTENs on a dedicated connection
+    and reloads on notification. After the listener reconnects the catalog is
+    reloaded too, since notifications sent while disconnected are lost.
+    """
+
+    def __init__(self, db, reconnect_delay: float = 5.0):
+        self.db = db
+        self.reconnect_delay = reconnect_delay
+        self._snapshot: Optional[StyleSnapshot] = None
+        self._version = 0
+        self._refresh_lock = asyncio.Lock()
+        self._dirty = False
+        self._subscribers: List[Callable[[StyleSnapshot], Awaitable[None]]] = []
+        self._conn: Optional[asyncpg.Connection] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    # ---- reads ----
+    @property
+    def version(self) -> int:
+        return self._snapshot.version if self._snapshot else 0
+
+    async def snapshot(self) -> StyleSnapshot:
+        while self._snapshot is None:
+            if self._refresh_lock.locked():
+                # first load already running in another task
+                async with self._refresh_lock:
+                    pass
+            else:
+                await self.refresh()
+        return self._snapshot
+
+    async def active_styles(self) -> Tuple[Mapping, ...]:
+        return (await self.snapshot()).active
+
+    async def get(self, style_id) -> Optional[Mapping]:
+        return (await self.snapshot()).by_id.get(str(style_id))
+
+    def subscribe(self, callback: Callable[[StyleSnapshot], Awaitable[None]]) -> None:
+        """Call `callback(snapshot)` after every refresh (e.g. to drop rendered keyboards)."""
+        self._subscribers.append(callback)
+
+    # ---- refresh ----
+    async def refresh(self) -> None:
+        # Notifications arriving during a reload coalesce into one more reload
+        if self._refresh_lock.locked():
+            self._dirty = True
+            return
+        async with self._refresh_lock:
+            self._dirty = True
+            while self._dirty:
+                self._dirty = False
+                rows = await self.db.get_all_styles()
+                self._version += 1
+                frozen = [MappingProxyType(dict(r)) for r in rows]
+                self._snapshot = StyleSnapshot(
+                    version=self._version,
+                    active=tuple(r for r in frozen if r.get("is_active")),
+                    by_id=MappingProxyType({str(r["id"]): r for r in frozen}),
+                )
+                logger.info(f"[styles] catalog v{self._version}: {len(frozen)} styles, {len(self._snapshot.active)} active")
+        for callback in self._subscribers:
+            try:
+                await callback(self._snapshot)
+            except Exception:
+                logger.exception("[styles] catalog subscriber failed")
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        task = asyncio.create_task(self._safe_refresh())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _safe_refresh(self) -> None:
+        try:
+            await self.refresh()
+        except Exception:
+            logger.exception("[styles] catalog refresh failed")
+
+    # ---- listener ----
+    async def run_forever(self) -> None:
+        """Keep a LISTEN connection open, reconnecting (and reloading) when it drops."""
+        while True:
+            lost = asyncio.Event()
+            try:
+                self._conn = await asyncpg.connect(self.db.database_url)
+                self._conn.add_termination_listener(lambda _conn: lost.set())
+                await self._conn.add_listener(STYLES_CHANNEL, self._on_notify)
+                await self.refresh()
+                await lost.wait()
+                logger.warning("[styles] LISTEN connection lost, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[styles] LISTEN connection failed: {e}")
+            finally:
+                await self._close_conn()
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _close_conn(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None and not conn.is_closed():
+            try:
+                await conn.close(timeout=5)
+            except Exception:
+                conn.terminate()
+
+    async def close(self) -> None:
+        await self._close_conn()
@@ -0,0 +1,77 @@
+# utils/cache.py
+import time
+from typing import Any, Callable, Hashable, Optional
+
+_MISSING = object()
+
+
+class GenerationalCache:
+    """
+    Bounded key/value store with generation-based expiry.
+
+    Entries live in two generations (young and old). Every `ttl` seconds, or as
+    soon as the young generation holds `max_entries` keys, the old generation is
+    dropped and the young one takes its place. Reading a key from the old
+    generation promotes it back, so hot keys survive while idle ones disappear
+    after one to two rotations. Memory never exceeds 2 * max_entries and every
+    operation is O(1) with no sweeper task.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_entries: int = 100_000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._young: dict = {}
+        self._old: dict = {}
+        self._rotated_at = clock()
+
+    def _maybe_rotate(self) -> None:
+        now = self._clock()
+        if now - self._rotated_at >= self.ttl or len(self._young) >= self.max_entries:
+            self._old = self._young
+            self._young = {}
+            self._rotated_at = now
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        self._maybe_rotate()
+        value = self._young.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = self._old.pop(key, _MISSING)
+        if value is _MISSING:
+            return default
+        self._young[key] = value
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._maybe_rotate()
+        self._young[key] = value
+        self._old.pop(key, None)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        value = self._young.pop(key, _MISSING)
+        old_value = self._old.pop(key, _MISSING)
+        if value is _MISSING:
+            value = old_value
+        return default if value is _MISSING else value
+
+    def clear(self) -> None:
+        self._young.clear()
+        self._old.clear()
+        self._rotated_at = self._clock()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._young or key in self._old
+
+    def __len__(self) -> int:
+        return len(self._young) + len(self._old)
+
+
+# user_id -> language code. Filled by Database whenever a user row is read or
+# written, so hot paths (e.g. throttling replies) can localize without a query.
+user_languages = GenerationalCache(ttl=6 * 3600, max_entries=200_000)
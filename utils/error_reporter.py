@@ -0,0 +1,140 @@
+# utils/error_reporter.py
+import asyncio
+import os
+import time
+import traceback
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Set
+
+from config.settings import settings
+from utils.logger import logger
+
+_TELEGRAM_TEXT_LIMIT = 4096
+
+
+@dataclass
+class _ErrorGroup:
+    exc_type: str
+    location: str
+    sample: str
+    count: int = 0
+    users: Set[int] = field(default_factory=set)
+    first_seen: float = field(default_factory=time.time)
+
+
+def fingerprint(exc: BaseException) -> tuple[str, str]:
+    """
+    (exception type, innermost project frame) for an exception.
+    Frames from site-packages are skipped so aiogram/asyncpg internals do not
+    split one bug into many groups.
+    """
+    frames = traceback.extract_tb(exc.__traceback__) if exc.__traceback__ else []
+    return type(exc).__name__, project_location(frames)
+
+
+def project_location(frames) -> str:
+    """'file.py:line in func' for the innermost frame outside site-packages."""
+    frame = None
+    for f in reversed(frames):
+        if "site-packages" not in f.filename and "/lib/python" not in f.filename:
+            frame = f
+            break
+    if frame is None and frames:
+        frame = frames[-1]
+    return f"{os.path.basename(frame.filename)}:{frame.lineno} in {frame.name}" if frame else "unknown"
+
+
+class ErrorAggregator:
+    """
+    Collects handler exceptions (and loop stalls) and reports them as a periodic digest.
+
+    `record` is synchronous and never does I/O, so a failing handler is not
+    slowed down by reporting. Occurrences are grouped by fingerprint and
+    counted; `run` flushes one digest message per `interval` to the admin
+    error group, however many exceptions happened in between.
+    """
+
+    def __init__(self, interval: float = 60.0, max_groups: int = 200, max_users_per_group: int = 20):
+        self.interval = interval
+        self.max_groups = max_groups
+        self.max_users_per_group = max_users_per_group
+        self._groups: Dict[tuple[str, str], _ErrorGroup] = {}
+        self._dropped = 0
+        self._window_started = time.time()
+
+    def record(self, exc: BaseException, user_id: Optional[int] = None) -> None:
+        kind, location = fingerprint(exc)
+        self.record_event(kind, location, str(exc), user_id)
+
+    def record_event(self, kind: str, location: str, sample: str, user_id: Optional[int] = None) -> None:
+        """Count a problem that is not an exception (e.g. a blocked event loop) in the same digest."""
+        key = (kind, location)
+        group = self._groups.get(key)
+        if group is None:
+            if len(self._groups) >= self.max_groups:
+                self._dropped += 1
+                return
+            group = _ErrorGroup(exc_type=kind, location=location, sample=sample[:300])
+            self._groups[key] = group
+        group.count += 1
+        if user_id is not None and len(group.users) < self.max_users_per_group:
+            group.users.add(user_id)
+
+    def pending(self) -> int:
+        return sum(g.count for g in self._groups.values()) + self._dropped
+
+    def render_digest(self, groups: Dict[tuple[str, str], _ErrorGroup], dropped: int, window_started: float) -> str:
+        window = int(time.time() - window_started)
+        total = sum(g.count for g in groups.values()) + dropped
+        lines = [f"❌ Error digest: {total} exception(s) in {len(groups)} group(s) over the last {window}s", ""]
+        for g in sorted(groups.values(), key=lambda g: g.count, reverse=True):
+            users = ", ".join(str(u) for u in sorted(g.users)[:5]) or "—"
+            lines.append(f"• {g.count}× {g.exc_type} at {g.location} (first {int(time.time() - g.first_seen)}s ago)")
+            lines.append(f"  {g.sample}")
+            lines.append(f"  users: {users}")
+        if dropped:
+            lines.append(f"• {dropped}× in groups over the limit of {self.max_groups}")
+
+        text = "\n".join(lines)
+        if len(text) > _TELEGRAM_TEXT_LIMIT:
+            text = text[:_TELEGRAM_TEXT_LIMIT - 20] + "\n… (truncated)"
+        return text
+
+    async def flush(self, bot) -> None:
+        if not self._groups and not self._dropped:
+            return
+        groups, dropped, window_started = self._groups, self._dropped, self._window_started
+        self._groups, self._dropped, self._window_started = {}, 0, time.time()
+
+        if not settings.ADMIN_ERROR_GROUP_ID:
+            return
+        try:
+            await bot.send_message(
+                settings.ADMIN_ERROR_GROUP_ID,
+                self.render_digest(groups, dropped, window_started),
+                parse_mode=None
+            )
+        except Exception:
+            logger.exception("Failed to send error digest to admin group")
+            # keep the counts for the next attempt
+            for key, g in groups.items():
+                current = self._groups.get(key)
+                if current is None and len(self._groups) < self.max_groups:
+                    self._groups[key] = g
+                elif current is not None:
+                    # the failed batch is older: keep its sample and first_seen, add what came since
+                    g.count += current.count
+                    g.users.update(sorted(current.users)[:max(0, self.max_users_per_group - len(g.users))])
+                    self._groups[key] = g
+                else:
+                    self._dropped += g.count
+            self._dropped += dropped
+            self._window_started = min(self._window_started, window_started)
+
+    async def run(self, bot) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush(bot)
+
+
+error_aggregator = ErrorAggregator(interval=settings.ERROR_DIGEST_INTERVAL)
@@ -0,0 +1,125 @@
+# utils/health.py
+"""
+Liveness and readiness for the webhook app.
+
+/health/live only proves the process and event loop answer. /health/ready
+answers "should this instance receive updates right now":
+
+- database: a `SELECT 1` through the pool with a short acquire timeout,
+  cached for a couple of seconds so frequent probes don't take connections
+  from handlers. An exhausted pool fails the check.
+- generations: photos being processed against READY_MAX_GENERATIONS.
+- event_loop: recent loop lag against READY_MAX_LOOP_LAG_MS.
+- background_tasks: supervised tasks waiting to be restarted (degraded).
+- provider: image provider failure ratio. This is only reported as
+  "degraded": failed generations go to the manual queue, so the instance
+  is still useful.
+
+Status is "ready" or "degraded" (HTTP 200), or "starting" / "not_ready" /
+"draining" (HTTP 503).
+"""
+import asyncio
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config.settings import settings
+from utils.logger import logger
+
+
+class ReadinessProbe:
+    def __init__(
+        self,
+        db,
+        loop_monitor,
+        generations: Callable[[], float],
+        provider=None,
+        backlog: Optional[Callable[[], Dict[str, int]]] = None,
+        draining: Callable[[], bool] = lambda: False,
+        supervisor=None,
+    ):
+        self.db = db
+        self.loop_monitor = loop_monitor
+        self.generations = generations
+        self.provider = provider
+        self.backlog = backlog
+        self.draining = draining
+        self.supervisor = supervisor
+        self._db_result: Optional[Dict[str, Any]] = None
+        self._db_checked_at = 0.0
+        self._db_lock = asyncio.Lock()
+
+    async def _ping_db(self) -> Dict[str, Any]:
+        pool = self.db.pool
+        if pool is None:
+            return {"healthy": False, "error": "not connected"}
+        result: Dict[str, Any] = {"size": pool.get_size(), "idle": pool.get_idle_size(), "max": pool.get_max_size()}
+        started = time.perf_counter()
+        try:
+            async with pool.acquire(timeout=settings.READY_DB_TIMEOUT) as conn:
+                await conn.fetchval("SELECT 1")
+        except asyncio.TimeoutError:
+            result.update(healthy=False, error="pool exhausted or database not answering")
+        except Exception as e:
+            result.update(healthy=False, error=f"{type(e).__name__}: {e}"[:200])
+        else:
+            result.update(healthy=True)
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    async def check_db(self) -> Dict[str, Any]:
+        # one ping per cache period, however many probes arrive
+        async with self._db_lock:
+            if self._db_result is None or time.monotonic() - self._db_checked_at >= settings.READY_DB_CACHE_SECONDS:
+                self._db_result = await self._ping_db()
+                self._db_checked_at = time.monotonic()
+                if not self._db_result["healthy"]:
+                    logger.warning(f"[health] database check failed: {self._db_result.get('error')}")
+        return dict(self._db_result, age_s=round(time.monotonic() - self._db_checked_at, 2))
+
+    async def check(self) -> Tuple[int, Dict[str, Any]]:
+        if self.draining():
+            return 503, {"status": "draining", "failing": ["shutdown"], "degraded": [], "checks": {}}
+        if self.supervisor is not None and not self.supervisor.started:
+            return 503, {"status": "starting", "failing": ["startup"], "degraded": [], "checks": {"startup": self.supervisor.status()}}
+        checks: Dict[str, Dict[str, Any]] = {"database": await self.check_db()}
+
+        in_flight = int(self.generations())
+        checks["generations"] = {
+            "healthy": in_flight < settings.READY_MAX_GENERATIONS,
+            "in_flight": in_flight,
+            "limit": settings.READY_MAX_GENERATIONS,
+        }
+
+        lag_ms = self.loop_monitor.max_lag * 1000
+        checks["event_loop"] = {
+            "healthy": lag_ms < settings.READY_MAX_LOOP_LAG_MS,
+            "lag_ms": round(self.loop_monitor.lag * 1000, 1),
+            "max_lag_ms": round(lag_ms, 1),
+            "limit_ms": settings.READY_MAX_LOOP_LAG_MS,
+        }
+
+        if self.backlog is not None:
+            checks["outbound"] = {"healthy": True, "backlog": self.backlog()}
+
+        degraded = []
+        if self.supervisor is not None:
+            # a crashed background task is restarted with backoff; updates are still served meanwhile
+            tasks = self.supervisor.status()["tasks"]
+            restarting = sorted(name for name, t in tasks.items() if t["state"] == "backoff")
+            checks["background_tasks"] = {"healthy": not restarting, "restarting": restarting, "tasks": tasks}
+            if restarting:
+                degraded.append("background_tasks")
+        if self.provider is not None:
+            checks["provider"] = self.provider.status()
+            if not checks["provider"]["healthy"]:
+                degraded.append("provider")
+
+        failing = [name for name, c in checks.items() if not c["healthy"] and name not in degraded]
+        if failing:
+            status = "not_ready"
+        elif degraded:
+            status = "degraded"
+        else:
+            status = "ready"
+        body = {"status": status, "failing": failing, "degraded": degraded, "checks": checks}
+        return (503 if failing else 200), body
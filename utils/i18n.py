@@ -0,0 +1,181 @@
+# utils/i18n.py
+"""
+Localization catalog.
+
+Strings live in `locales/<lang>.json` as {"texts": {...}, "buttons": {...}}.
+At load time every template is parsed once and compiled into a `Template`,
+so rendering no longer re-parses the format string on each call.
+Loading fails fast when the same key uses different placeholders in two
+languages, and `check_call_sites` flags `get_text(...)` calls that do not
+pass a placeholder the template needs.
+
+Lookups go through one flat dict keyed by interned (key, lang) tuples, with
+the English fallback already resolved.
+"""
+import ast
+import json
+import os
+import sys
+from string import Formatter
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+LOCALES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "locales")
+FALLBACK_LANG = "en"
+
+_formatter = Formatter()
+
+
+class Template:
+    """
+    A template parsed once. Templates that only use plain `{name}` fields are
+    compiled into a function built around a single f-string, e.g.
+    "Hi {name}!" -> lambda kw: 'Hi ' f"{kw['name']}" '!'
+    Anything fancier (format specs, conversions, indexing) uses format_map.
+    """
+    __slots__ = ("source", "fields", "render")
+
+    def __init__(self, source: str):
+        self.source = source
+        pieces = []
+        fields = set()
+        simple = True
+        for literal, field, spec, conversion in _formatter.parse(source):
+            if literal:
+                pieces.append(repr(literal))
+            if field is None:
+                continue
+            if spec or conversion or not field.isidentifier():
+                simple = False
+                field = field.split(".", 1)[0].split("[", 1)[0]
+            fields.add(field)
+            pieces.append('f"{kw[%r]}"' % field)
+        self.fields: FrozenSet[str] = frozenset(fields)
+        if simple:
+            self.render = eval("lambda kw: " + (" ".join(pieces) or "''"), {})
+        else:
+            self.render = source.format_map
+
+
+class Catalog:
+    def __init__(self, directory: str = LOCALES_DIR):
+        self.directory = directory
+        self.languages: Tuple[str, ...] = ()
+        self.texts: Dict[str, Dict[str, str]] = {}
+        self.buttons: Dict[str, Dict[str, str]] = {}
+        self._texts: Dict[Tuple[str, str], Template] = {}
+        self._buttons: Dict[Tuple[str, str], str] = {}
+
+    def load(self) -> "Catalog":
+        texts: Dict[str, Dict[str, str]] = {}
+        buttons: Dict[str, Dict[str, str]] = {}
+        languages = []
+        for filename in sorted(os.listdir(self.directory)):
+            if not filename.endswith(".json"):
+                continue
+            lang = sys.intern(filename[:-5])
+            languages.append(lang)
+            with open(os.path.join(self.directory, filename), encoding="utf-8") as f:
+                data = json.load(f)
+            for key, value in data.get("texts", {}).items():
+                texts.setdefault(sys.intern(key), {})[lang] = value
+            for key, value in data.get("buttons", {}).items():
+                buttons.setdefault(sys.intern(key), {})[lang] = value
+        if FALLBACK_LANG not in languages:
+            raise ValueError(f"No {FALLBACK_LANG}.json in {self.directory}")
+
+        compiled: Dict[Tuple[str, str], Template] = {}
+        errors = []
+        for key, by_lang in texts.items():
+            templates = {lang: Template(source) for lang, source in by_lang.items()}
+            reference = templates.get(FALLBACK_LANG)
+            for lang, template in templates.items():
+                if reference is not None and template.fields != reference.fields:
+                    errors.append(
+                        f"{key!r}: {lang} uses {sorted(template.fields)}, {FALLBACK_LANG} uses {sorted(reference.fields)}"
+                    )
+            for lang in languages:
+                template = templates.get(lang) or reference
+                if template is not None:
+                    compiled[(key, lang)] = template
+        if errors:
+            raise ValueError("Placeholder mismatch between languages:\n" + "\n".join(errors))
+
+        flat_buttons: Dict[Tuple[str, str], str] = {}
+        for key, by_lang in buttons.items():
+            for lang in languages:
+                flat_buttons[(key, lang)] = by_lang.get(lang, by_lang.get(FALLBACK_LANG, ""))
+
+        self.languages = tuple(languages)
+        self.texts, self.buttons = texts, buttons
+        self._texts, self._buttons = compiled, flat_buttons
+        return self
+
+    def template(self, key: str, lang: str) -> Optional[Template]:
+        template = self._texts.get((key, lang))
+        if template is None and lang != FALLBACK_LANG:
+            template = self._texts.get((key, FALLBACK_LANG))
+        return template
+
+    def text(self, key: str, lang: str = FALLBACK_LANG, **kwargs) -> str:
+        template = self.template(key, lang)
+        if template is None:
+            return ''
+        if kwargs:
+            return template.render(kwargs)
+        return template.source
+
+    def button(self, key: str, lang: str = FALLBACK_LANG) -> str:
+        value = self._buttons.get((key, lang))
+        if value is None:
+            value = self._buttons.get((key, FALLBACK_LANG), '')
+        return value
+
+    def check_call_sites(self, paths: Iterable[str]) -> List[str]:
+        """
+        Statically find `get_text("key", lang, a=..., b=...)` calls whose keyword
+        arguments miss a placeholder of that key. Calls without keyword arguments
+        return the raw template and calls using `**kwargs` cannot be checked, so
+        both are skipped.
+        """
+        problems = []
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                try:
+                    tree = ast.parse(f.read(), filename=path)
+                except SyntaxError:
+                    continue
+            for node in ast.walk(tree):
+                if not (isinstance(node, ast.Call) and getattr(node.func, "id", getattr(node.func, "attr", None)) == "get_text"):
+                    continue
+                if not node.args or not isinstance(node.args[0], ast.Constant) or not isinstance(node.args[0].value, str):
+                    continue
+                if not node.keywords or any(kw.arg is None for kw in node.keywords):
+                    continue
+                key = node.args[0].value
+                if key not in self.texts:
+                    problems.append(f"{path}:{node.lineno}: unknown text key {key!r}")
+                    continue
+                passed = {kw.arg for kw in node.keywords} - {"lang"}
+                needed = self.template(key, FALLBACK_LANG).fields
+                missing = needed - passed
+                if missing:
+                    problems.append(f"{path}:{node.lineno}: get_text({key!r}) is missing {sorted(missing)}")
+        return problems
+
+
+def python_sources(root: str) -> List[str]:
+    sources = []
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith((".", "__")) and d != "venv"]
+        sources.extend(os.path.join(directory, name) for name in filenames if name.endswith(".py"))
+    return sources
+
+
+catalog = Catalog().load()
+
+
+if __name__ == "__main__":
+    root = os.path.dirname(LOCALES_DIR)
+    issues = catalog.check_call_sites(python_sources(root))
+    print("\n".join(issues) or f"OK: {len(catalog.texts)} texts, {len(catalog.buttons)} buttons, {catalog.languages}")
+    sys.exit(1 if issues else 0)
@@ -0,0 +1,82 @@
+# utils/import_profile.py
+"""
+Import-time report for the bot's cold start.
+
+    python -m utils.import_profile                  # profile `import bot`
+    python -m utils.import_profile --budget-ms 3000 --top 30
+
+Runs the import in a fresh interpreter with `-X importtime` and prints the
+slowest top-level packages and modules. It also lists heavy modules that
+should only load on first use (OCR, imaging, the second Telegram framework).
+Exits with status 1 when the total exceeds the budget or a deferred module
+was imported, so it can run in CI before a deploy.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# Modules that must not be imported when the bot starts
+DEFERRED = ("pytesseract", "PIL", "telegram")
+
+
+def profile(module: str = "bot", cwd: str = ".") -> List[Tuple[str, int, int, int]]:
+    """[(module, self_us, cumulative_us, depth)] in import order."""
+    env = dict(os.environ)
+    env.setdefault("BOT_TOKEN", "0:import-profile")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def report(rows: List[Tuple[str, int, int, int]], top: int = 25) -> Tuple[float, List[str], str]:
+    total_ms = sum(r[1] for r in rows) / 1000
+    by_package: Dict[str, int] = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+    deferred = sorted({name for name, *_ in rows if name.split(".")[0] in DEFERRED})
+
+    lines = [f"Total import time: {total_ms:.0f} ms ({len(rows)} modules)", "", "By top-level package (self time):"]
+    for package, us in sorted(by_package.items(), key=lambda kv: kv[1], reverse=True)[:top]:
+        lines.append(f"  {us / 1000:9.1f} ms  {package}")
+    lines += ["", "Slowest modules (self time):"]
+    for name, self_us, cumulative_us, _ in sorted(rows, key=lambda r: r[1], reverse=True)[:top]:
+        lines.append(f"  {self_us / 1000:9.1f} ms  (cumulative {cumulative_us / 1000:7.1f})  {name}")
+    if deferred:
+        lines += ["", "Imported at startup but should load lazily:"] + [f"  {name}" for name in deferred]
+    return total_ms, deferred, "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("module", nargs="?", default="bot")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "0")),
+                        help="fail when total import time exceeds this (0: report only)")
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    total_ms, deferred, text = report(profile(args.module, cwd=root), top=args.top)
+    print(text)
+    failed = bool(deferred)
+    if args.budget_ms and total_ms > args.budget_ms:
+        print(f"\nOver budget: {total_ms:.0f} ms > {args.budget_ms:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+# utils/loop_monitor.py
+"""
+Event loop lag and blocking-call detection.
+
+`run()` sleeps for `interval` in a loop and records how late each wakeup
+was in a histogram. A blocked loop delays every update, webhook response and
+DB callback, so readiness also reports the recent maximum.
+
+Lag only becomes measurable once the loop is free again. By then the
+blocking call is gone, so a watchdog thread checks the loop's heartbeat as
+well. When the heartbeat is older than LOOP_BLOCK_THRESHOLD_MS, the watchdog
+captures the loop thread's current stack with `sys._current_frames()`. That
+stack is the call doing the blocking. When the loop recovers, the stall is
+logged with the full stack and counted in the admin error digest, grouped by
+the innermost project frame.
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+from config.settings import settings
+from utils.error_reporter import error_aggregator, project_location
+from utils.logger import logger
+from utils.metrics import Counter, Histogram
+
+LOOP_LAG = Histogram(
+    "flexa_event_loop_lag_seconds", "How late the event loop woke up from a timed sleep",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+LOOP_STALLS = Counter("flexa_event_loop_stalls_total", "Times the loop was blocked past the threshold")
+
+
+class LoopMonitor:
+    def __init__(self, interval: float = 0.25, window: float = 30.0, block_threshold: float = 0.3):
+        self.interval = interval
+        self.window = window
+        self.block_threshold = block_threshold
+        self.lag = 0.0
+        self._recent: Deque[Tuple[float, float]] = deque()
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._captured_for = 0.0
+        self._stalls: Deque[List[traceback.FrameSummary]] = deque(maxlen=20)
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    @property
+    def max_lag(self) -> float:
+        cutoff = time.monotonic() - self.window
+        while self._recent and self._recent[0][0] < cutoff:
+            self._recent.popleft()
+        return max((lag for _, lag in self._recent), default=self.lag)
+
+    def _record(self, lag: float) -> None:
+        now = time.monotonic()
+        self.lag = lag
+        LOOP_LAG.observe(lag)
+        self._recent.append((now, lag))
+        if len(self._recent) > self.window / self.interval * 2:
+            self._recent.popleft()
+
+    def _watch(self) -> None:
+        # runs in its own thread; only reads the heartbeat and appends to a deque
+        check_every = min(self.interval, self.block_threshold) / 2
+        while not self._stop.wait(check_every):
+            heartbeat = self._heartbeat
+            blocked = time.monotonic() - heartbeat - self.interval
+            if blocked < self.block_threshold or heartbeat == self._captured_for:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            self._captured_for = heartbeat
+            self._stalls.append(traceback.extract_stack(frame))
+            del frame
+
+    def _report(self, stack: List[traceback.FrameSummary], lag: float) -> None:
+        LOOP_STALLS.inc()
+        location = project_location(stack)
+        logger.warning(
+            f"[loop] event loop blocked for {lag * 1000:.0f} ms at {location}; stack at capture:\n"
+            + "".join(traceback.format_list(stack[-15:]))
+        )
+        error_aggregator.record_event("EventLoopBlocked", location, f"loop blocked for {lag * 1000:.0f} ms")
+
+    async def run(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        if self._watchdog is None:
+            self._stop.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+        try:
+            while True:
+                self._heartbeat = started = time.monotonic()
+                await asyncio.sleep(self.interval)
+                lag = max(0.0, time.monotonic() - started - self.interval)
+                self._record(lag)
+                while self._stalls:
+                    self._report(self._stalls.popleft(), lag)
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._watchdog = None
+
+
+loop_monitor = LoopMonitor(block_threshold=settings.LOOP_BLOCK_THRESHOLD_MS / 1000)
@@ -0,0 +1,98 @@
+# utils/membership.py
+import asyncio
+import time
+from typing import Dict, Optional
+
+from aiogram.exceptions import TelegramBadRequest
+
+from utils.cache import GenerationalCache
+from utils.logger import logger
+from utils.metrics import Counter
+
+MEMBER_STATUSES = ("member", "administrator", "creator")
+
+MEMBERSHIP_CHECKS = Counter(
+    "flexa_membership_checks_total", "Channel membership checks by how they were answered", ["source"]
+)
+
+
+class MembershipCache:
+    """
+    Caches `get_chat_member` results for one channel.
+
+    - members are remembered for `positive_ttl`, non-members only for
+      `negative_ttl`, so someone who just joined is not locked out for long
+    - concurrent checks for the same user share one Bot API call; if the
+      caller making it is cancelled, one of the others makes it instead
+    - `chat_member` updates (see handlers) write joins/leaves straight into
+      the cache, which keeps long positive TTLs safe
+    - API errors are not cached
+    """
+
+    def __init__(self, channel: str, positive_ttl: float = 3600.0, negative_ttl: float = 10.0, max_entries: int = 200_000):
+        self.channel = channel
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        # entries carry their own expiry; the cache ttl only bounds memory
+        self._entries = GenerationalCache(ttl=positive_ttl, max_entries=max_entries)
+        self._inflight: Dict[int, asyncio.Future] = {}
+
+    def get(self, user_id: int) -> Optional[bool]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        is_member, expires_at = entry
+        if time.monotonic() >= expires_at:
+            self._entries.pop(user_id)
+            return None
+        return is_member
+
+    def set(self, user_id: int, is_member: bool) -> None:
+        ttl = self.positive_ttl if is_member else self.negative_ttl
+        self._entries.set(user_id, (is_member, time.monotonic() + ttl))
+
+    async def check(self, bot, user_id: int) -> bool:
+        while True:
+            cached = self.get(user_id)
+            if cached is not None:
+                MEMBERSHIP_CHECKS.labels("cache").inc()
+                return cached
+
+            future = self._inflight.get(user_id)
+            if future is None:
+                break
+            MEMBERSHIP_CHECKS.labels("shared").inc()
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # the leading check was cancelled, not us: take over, or join whoever already did
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[user_id] = future
+        try:
+            # _fetch never raises except on cancellation
+            is_member = await self._fetch(bot, user_id)
+            future.set_result(is_member)
+            return is_member
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        finally:
+            if self._inflight.get(user_id) is future:
+                del self._inflight[user_id]
+
+    async def _fetch(self, bot, user_id: int) -> bool:
+        MEMBERSHIP_CHECKS.labels("api").inc()
+        try:
+            member = await bot.get_chat_member(self.channel, user_id)
+        except TelegramBadRequest as e:
+            logger.warning(f"TelegramBadRequest while checking membership: {e}")
+            return False
+        except Exception as e:
+            logger.warning(f"Unexpected error while checking membership: {e}")
+            return False
+        is_member = member.status in MEMBER_STATUSES
+        self.set(user_id, is_member)
+        return is_member
@@ -0,0 +1,338 @@
+# utils/outbound.py
+import asyncio
+import time
+from collections import Counter as Tally, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Union
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    CopyMessage,
+    ForwardMessage,
+    SendAnimation,
+    SendAudio,
+    SendDocument,
+    SendMediaGroup,
+    SendMessage,
+    SendPhoto,
+    SendSticker,
+    SendVideo,
+    SendVoice,
+)
+
+from utils.cache import GenerationalCache
+from utils.logger import logger
+from utils.metrics import Counter, Gauge, Histogram
+
+# Methods that deliver a new message and therefore count against Bot API send limits
+_SEND_METHODS = (
+    SendMessage, SendPhoto, SendDocument, SendVideo, SendAnimation, SendAudio,
+    SendVoice, SendSticker, SendMediaGroup, CopyMessage, ForwardMessage,
+)
+
+
+class Priority(IntEnum):
+    USER = 0    # replies to a user who is waiting
+    ADMIN = 1   # admin group notifications and digests
+    BULK = 2    # broadcasts and other background fan-out
+
+
+# Overrides the lane chosen from the chat id, e.g. a broadcast job sets BULK
+outbound_priority: ContextVar[Optional[Priority]] = ContextVar("outbound_priority", default=None)
+
+OUTBOUND_WAIT = Histogram(
+    "flexa_outbound_wait_seconds", "Time a send spent queued before reaching the Bot API", ["lane"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+OUTBOUND_BACKLOG = Gauge("flexa_outbound_backlog", "Sends waiting for a global send slot", ["lane"])
+OUTBOUND_SENT = Counter("flexa_outbound_sent_total", "Sends passed to the Bot API", ["lane"])
+OUTBOUND_RETRY_AFTER = Counter("flexa_outbound_retry_after_total", "429 RetryAfter responses received")
+OUTBOUND_CHATS = Gauge("flexa_outbound_active_chats", "Chats with sends queued or in flight")
+OUTBOUND_DETACHED = Gauge("flexa_outbound_detached", "Background sends (submit) queued or in flight")
+OUTBOUND_DETACHED_DROPPED = Counter("flexa_outbound_detached_dropped_total", "Background sends dropped, by kind and reason", ["kind", "reason"])
+
+
+class _Bucket:
+    """Token bucket that hands out reservations, so queued senders sleep exactly as long as needed."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated_at", "paused_until")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self) -> float:
+        """Seconds until one token is available (0 if available now)."""
+        now = time.monotonic()
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1.0 else (1.0 - self.tokens) / self.rate
+        return max(wait, self.paused_until - now)
+
+    def take(self) -> None:
+        self._refill(time.monotonic())
+        self.tokens -= 1.0
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class _PriorityGate:
+    """Global token bucket that grants slots to the highest-priority waiter first."""
+
+    def __init__(self, rate: float, burst: float):
+        self.bucket = _Bucket(rate, burst)
+        self.lanes: List[Deque[asyncio.Future]] = [deque() for _ in Priority]
+        self._wakeup = asyncio.Event()
+        self._pump_task: Optional[asyncio.Task] = None
+
+    def backlog(self, priority: Priority) -> int:
+        return sum(1 for f in self.lanes[priority] if not f.done())
+
+    async def acquire(self, priority: Priority) -> None:
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        future = asyncio.get_running_loop().create_future()
+        self.lanes[priority].append(future)
+        self._wakeup.set()
+        await future
+
+    def _pop_next(self) -> Optional[asyncio.Future]:
+        for lane in self.lanes:
+            while lane:
+                future = lane.popleft()
+                if not future.done():
+                    return future
+        return None
+
+    def _has_waiters(self) -> bool:
+        return any(not f.done() for lane in self.lanes for f in lane)
+
+    async def _pump(self) -> None:
+        while True:
+            if not self._has_waiters():
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            delay = self.bucket.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            future = self._pop_next()
+            if future is not None:
+                self.bucket.take()
+                future.set_result(None)
+
+    def close(self) -> None:
+        if self._pump_task:
+            self._pump_task.cancel()
+
+
+class _ChatQueue:
+    __slots__ = ("lock", "waiters")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()  # FIFO: sends to one chat go out in call order
+        self.waiters = 0
+
+
+class OutboundScheduler(BaseRequestMiddleware):
+    """
+    Bot session middleware that paces every outgoing message.
+
+    - per-chat FIFO queues, each with its own bucket: ~1 msg/s with small
+      bursts for private chats, under 20 msg/min for groups and channels
+    - one global bucket (30 msg/s) shared by all chats, granted by priority
+      lane: user replies, then admin notifications, then bulk sends
+    - a 429 RetryAfter pauses only the affected chat and the send is retried
+
+    Registered with `bot.session.middleware(...)`, so handlers keep calling
+    `bot.send_*` / `message.answer*` as before. Non-send methods (edits,
+    answers to callbacks, getFile, ...) pass straight through.
+
+    Awaiting a send waits for its pacing, which is fine for a reply to the
+    chat being handled. Admin notices and other sends nobody waits on go
+    through `submit()`. They run in the background on their lane, so a
+    handler never sits in a group's 19/min queue. At shutdown `flush()`
+    lifts the per-chat pacing (not a 429 pause), so notices queued for an
+    admin group, such as the ones for interrupted generations, still go out.
+    Every background send that is dropped is counted and logged by kind.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 25.0,
+        global_burst: float = 5.0,
+        private_rate: float = 1.0,
+        private_burst: float = 5.0,
+        group_per_minute: float = 19.0,
+        max_retries: int = 3,
+        max_detached: int = 1000,
+    ):
+        self.private_rate = private_rate
+        self.private_burst = private_burst
+        self.group_rate = group_per_minute / 60.0
+        self.max_retries = max_retries
+        self.max_detached = max_detached
+        self._global_rate = global_rate
+        self._global_burst = global_burst
+        self._gate: Optional[_PriorityGate] = None
+        self._chats: Dict[Union[int, str], _ChatQueue] = {}
+        # per-chat buckets outlive the queues: a group's minute budget must survive idle gaps
+        self._buckets = GenerationalCache(ttl=120.0, max_entries=50_000)
+        # background sends and what they are ("manual_queue", ...), for drop reports
+        self._detached: Dict[asyncio.Task, str] = {}
+        self._unpaced: Optional[asyncio.Event] = None
+
+        for lane in Priority:
+            OUTBOUND_BACKLOG.labels(lane.name.lower()).set_function(
+                lambda lane=lane: self._gate.backlog(lane) if self._gate else 0
+            )
+        OUTBOUND_CHATS.set_function(lambda: len(self._chats))
+        OUTBOUND_DETACHED.set_function(lambda: len(self._detached))
+
+    @staticmethod
+    def _is_group(chat_id: Union[int, str]) -> bool:
+        return isinstance(chat_id, str) or chat_id < 0
+
+    def _priority(self, chat_id: Union[int, str]) -> Priority:
+        override = outbound_priority.get()
+        if override is not None:
+            return override
+        return Priority.ADMIN if self._is_group(chat_id) else Priority.USER
+
+    def _bucket(self, chat_id: Union[int, str]) -> _Bucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            if self._is_group(chat_id):
+                bucket = _Bucket(self.group_rate, 1.0)
+            else:
+                bucket = _Bucket(self.private_rate, self.private_burst)
+            self._buckets.set(chat_id, bucket)
+        return bucket
+
+    @asynccontextmanager
+    async def _chat_queue(self, chat_id: Union[int, str]):
+        queue = self._chats.get(chat_id)
+        if queue is None:
+            queue = self._chats[chat_id] = _ChatQueue()
+        queue.waiters += 1
+        try:
+            async with queue.lock:
+                yield
+        finally:
+            queue.waiters -= 1
+            if queue.waiters == 0:
+                self._chats.pop(chat_id, None)
+
+    def backlog(self) -> Dict[str, int]:
+        return {lane.name.lower(): (self._gate.backlog(lane) if self._gate else 0) for lane in Priority}
+
+    async def __call__(self, make_request, bot, method):
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None or not isinstance(method, _SEND_METHODS):
+            return await make_request(bot, method)
+
+        if self._gate is None:
+            self._gate = _PriorityGate(self._global_rate, self._global_burst)
+            self._unpaced = asyncio.Event()
+        priority = self._priority(chat_id)
+        lane = priority.name.lower()
+        queued_at = time.monotonic()
+
+        async with self._chat_queue(chat_id):
+            bucket = self._bucket(chat_id)
+            for attempt in range(self.max_retries + 1):
+                await self._wait_for_slot(bucket)
+                bucket.take()
+                await self._gate.acquire(priority)
+                if attempt == 0:
+                    OUTBOUND_WAIT.labels(lane).observe(time.monotonic() - queued_at)
+                OUTBOUND_SENT.labels(lane).inc()
+                try:
+                    return await make_request(bot, method)
+                except TelegramRetryAfter as e:
+                    OUTBOUND_RETRY_AFTER.inc()
+                    if attempt >= self.max_retries:
+                        raise
+                    logger.warning(f"[outbound] 429 for chat {chat_id}, retrying in {e.retry_after}s")
+                    bucket.pause(e.retry_after)
+
+    async def _wait_for_slot(self, bucket: _Bucket) -> None:
+        while True:
+            if self._unpaced is not None and self._unpaced.is_set():
+                # shutting down: skip the chat's rate, but still honour a 429 pause
+                delay = bucket.paused_until - time.monotonic()
+                if delay <= 0:
+                    return
+                await asyncio.sleep(delay)
+                continue
+            delay = bucket.delay()
+            if delay <= 0:
+                return
+            try:
+                # woken early when flush() lifts the pacing
+                await asyncio.wait_for(self._unpaced.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def submit(self, send: Callable[[], Awaitable[Any]], priority: Priority = Priority.ADMIN,
+               kind: str = "notice") -> bool:
+        """
+        Run `send` (a coroutine function making Bot API calls) in the background
+        on the `priority` lane and return at once. False, and nothing is sent,
+        when max_detached background sends are already pending.
+        """
+        if len(self._detached) >= self.max_detached:
+            OUTBOUND_DETACHED_DROPPED.labels(kind, "backlog").inc()
+            logger.error(f"[outbound] {len(self._detached)} background sends pending, dropped a {kind} send")
+            return False
+        task = asyncio.create_task(self._run_detached(send, priority, kind))
+        self._detached[task] = kind
+        task.add_done_callback(lambda t: self._detached.pop(t, None))
+        return True
+
+    @staticmethod
+    async def _run_detached(send: Callable[[], Awaitable[Any]], priority: Priority, kind: str) -> None:
+        # the task runs in a copy of the caller's context, so this only affects its own sends
+        outbound_priority.set(priority)
+        try:
+            await send()
+        except Exception:
+            OUTBOUND_DETACHED_DROPPED.labels(kind, "failed").inc()
+            logger.exception(f"[outbound] background {kind} send failed")
+
+    async def flush(self, timeout: float) -> None:
+        """
+        Shutdown: lift per-chat pacing so queued background sends go out now,
+        wait up to `timeout` seconds for them, then cancel and report the rest.
+        """
+        if self._unpaced is not None:
+            self._unpaced.set()
+        if not self._detached:
+            return
+        _, pending = await asyncio.wait(set(self._detached), timeout=timeout)
+        if pending:
+            kinds = Tally(self._detached.get(task, "notice") for task in pending)
+            for kind, n in kinds.items():
+                OUTBOUND_DETACHED_DROPPED.labels(kind, "shutdown").inc(n)
+            logger.error(f"[outbound] background sends not delivered within {timeout}s of shutdown, dropped: {dict(kinds)}")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def close(self) -> None:
+        if self._gate:
+            self._gate.close()
+
+
+outbound = OutboundScheduler()
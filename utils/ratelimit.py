@@ -0,0 +1,125 @@
+# utils/ratelimit.py
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from utils.cache import GenerationalCache
+from utils.logger import logger
+
+
+@dataclass(frozen=True)
+class TokenBucketPolicy:
+    """
+    Token bucket: `burst` tokens max, refilled at `rate` tokens per second.
+    Every event spends one token; an event that finds the bucket empty is throttled.
+    """
+    rate: float
+    burst: float = 1.0
+
+    @classmethod
+    def every(cls, interval: float, burst: float = 1.0) -> "TokenBucketPolicy":
+        """One event per `interval` seconds, with up to `burst` back-to-back."""
+        return cls(rate=1.0 / interval, burst=burst)
+
+    @property
+    def refill_time(self) -> float:
+        """Seconds for an empty bucket to become full again."""
+        return self.burst / self.rate
+
+
+class MemoryRateLimitStore:
+    """
+    In-process token buckets kept in a GenerationalCache.
+
+    A bucket that is evicted is indistinguishable from a full one as long as
+    `ttl` is at least the longest policy refill time, so expiry never lets a
+    user through early. Memory is capped by `max_entries`.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 100_000):
+        self._buckets = GenerationalCache(ttl=ttl, max_entries=max_entries)
+
+    def hit_nowait(self, key: str, policy: TokenBucketPolicy) -> bool:
+        now = time.monotonic()
+        state = self._buckets.get(key)
+        if state is None:
+            tokens = policy.burst
+        else:
+            tokens, updated_at = state
+            tokens = min(policy.burst, tokens + (now - updated_at) * policy.rate)
+
+        allowed = tokens >= 1.0
+        if allowed:
+            tokens -= 1.0
+        self._buckets.set(key, (tokens, now))
+        return allowed
+
+    async def hit(self, key: str, policy: TokenBucketPolicy) -> bool:
+        return self.hit_nowait(key, policy)
+
+    def set_tokens(self, key: str, tokens: float, at: float) -> None:
+        """Overwrite a bucket with a known level (as of monotonic time `at`)."""
+        self._buckets.set(key, (tokens, at))
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class PostgresRateLimitStore:
+    """
+    Token buckets shared by every replica through the UNLOGGED `rate_limits`
+    table. Refill and spend happen in one atomic upsert, using the database
+    clock so replicas with skewed clocks still agree. Idle rows are deleted
+    once per `ttl`.
+
+    A local in-memory bucket is consulted first. After every database answer
+    it is set to the shared bucket's level, timed from before the query was
+    sent. Other replicas can only lower the shared level after that, so while
+    the local bucket is empty the shared one is empty too. The local denial
+    is correct, and repeated events from a throttled user (a flood) are
+    rejected without a database round trip. If the database is unavailable
+    the local decision is used on its own; that is logged once per outage.
+    """
+
+    _HIT_SQL = """
+        INSERT INTO rate_limits AS rl (key, tokens, updated_at, allowed)
+        VALUES ($1, $2 - 1, extract(epoch FROM clock_timestamp()), $2 >= 1)
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = LEAST($2, rl.tokens + (EXCLUDED.updated_at - rl.updated_at) * $3)
+                     - CASE WHEN LEAST($2, rl.tokens + (EXCLUDED.updated_at - rl.updated_at) * $3) >= 1
+                            THEN 1 ELSE 0 END,
+            updated_at = EXCLUDED.updated_at,
+            allowed = LEAST($2, rl.tokens + (EXCLUDED.updated_at - rl.updated_at) * $3) >= 1
+        RETURNING allowed, tokens
+    """
+
+    def __init__(self, db, ttl: float = 60.0, fallback: Optional[MemoryRateLimitStore] = None):
+        self.db = db
+        self.ttl = ttl
+        self.fallback = fallback or MemoryRateLimitStore(ttl=ttl)
+        self._next_sweep = time.monotonic() + ttl
+        self._unavailable = False
+
+    async def hit(self, key: str, policy: TokenBucketPolicy) -> bool:
+        if not self.fallback.hit_nowait(key, policy):
+            return False
+        sent_at = time.monotonic()
+        try:
+            async with self.db.pool.acquire() as conn:
+                row = await conn.fetchrow(self._HIT_SQL, key, float(policy.burst), float(policy.rate))
+                if time.monotonic() >= self._next_sweep:
+                    self._next_sweep = time.monotonic() + self.ttl
+                    await conn.execute(
+                        "DELETE FROM rate_limits WHERE updated_at < extract(epoch FROM clock_timestamp()) - $1",
+                        float(self.ttl),
+                    )
+        except Exception as e:
+            if not self._unavailable:
+                self._unavailable = True
+                logger.warning(f"[ratelimit] shared store unavailable, using local buckets until it is back: {e}")
+            return True
+        if self._unavailable:
+            self._unavailable = False
+            logger.info("[ratelimit] shared store available again")
+        self.fallback.set_tokens(key, row["tokens"], sent_at)
+        return bool(row["allowed"])
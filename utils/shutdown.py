@@ -0,0 +1,116 @@
+# utils/shutdown.py
+"""
+Graceful shutdown.
+
+Render sends SIGTERM and kills the process about 30 seconds later. Before
+this module existed, cleanup ran as an unawaited task. In-flight
+generations could die after credits were already deducted.
+
+Long jobs (generations, OCR) are tracked:
+
+    with shutdown.track("ocr"):
+        result = await shutdown.until_deadline(run_ocr())
+
+On shutdown, `drain()` waits up to SHUTDOWN_GRACE_SECONDS for tracked jobs
+and for any extra waiters (the webhook queue). Jobs still running after
+that see `ShutdownDeadline` raised from `until_deadline()`. They then have
+SHUTDOWN_REQUEUE_SECONDS to save their work for later (a generation goes
+to the manual queue and admins are notified, a payment is stored for
+review) while the database is still open. Work still running after that is
+reported in the error digest. `drain()` does not cancel it: its owner does,
+and the owner reports what it cancelled (webhook_handler.stop in bot.py).
+"""
+import asyncio
+from collections import Counter as Tally
+from contextlib import contextmanager
+from typing import Awaitable, Dict, Optional, TypeVar
+
+from config.settings import settings
+from utils.error_reporter import error_aggregator
+from utils.logger import logger
+
+T = TypeVar("T")
+
+
+class ShutdownDeadline(Exception):
+    """The shutdown grace period ran out before the job finished."""
+
+
+class ShutdownCoordinator:
+    def __init__(self, grace: float = 12.0, requeue: float = 4.0):
+        self.grace = grace
+        self.requeue = requeue
+        self.draining = False
+        self._jobs: Tally = Tally()
+        self._idle: Optional[asyncio.Event] = None
+        self._expired: Optional[asyncio.Event] = None
+
+    def _events(self):
+        if self._idle is None:
+            self._idle, self._expired = asyncio.Event(), asyncio.Event()
+            if not sum(self._jobs.values()):
+                self._idle.set()
+        return self._idle, self._expired
+
+    def active(self) -> Dict[str, int]:
+        return {kind: n for kind, n in self._jobs.items() if n}
+
+    def started(self, kind: str) -> None:
+        self._jobs[kind] += 1
+        self._events()[0].clear()
+
+    def finished(self, kind: str) -> None:
+        self._jobs[kind] -= 1
+        if not sum(self._jobs.values()):
+            self._events()[0].set()
+
+    @contextmanager
+    def track(self, kind: str):
+        self.started(kind)
+        try:
+            yield
+        finally:
+            self.finished(kind)
+
+    async def until_deadline(self, awaitable: Awaitable[T]) -> T:
+        """Await `awaitable`; raise ShutdownDeadline instead if the grace period ends first."""
+        expired = self._events()[1]
+        if expired.is_set():
+            raise ShutdownDeadline()
+        work = asyncio.ensure_future(awaitable)
+        deadline = asyncio.ensure_future(expired.wait())
+        try:
+            await asyncio.wait({work, deadline}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            deadline.cancel()
+            if not work.done():
+                work.cancel()
+        if not work.done() or work.cancelled():
+            raise ShutdownDeadline()
+        return work.result()
+
+    def begin(self) -> None:
+        if not self.draining:
+            self.draining = True
+            logger.info(f"[shutdown] draining, running jobs: {self.active() or 'none'}")
+
+    async def drain(self, *waiters: Awaitable) -> bool:
+        """Wait for tracked jobs and `waiters`; True when everything finished within the grace period."""
+        self.begin()
+        idle, expired = self._events()
+        everything = asyncio.ensure_future(asyncio.gather(idle.wait(), *waiters))
+        done, _ = await asyncio.wait({everything}, timeout=self.grace)
+        if done:
+            return True
+
+        logger.warning(f"[shutdown] grace period of {self.grace}s over, re-queueing: {self.active() or 'queued updates'}")
+        expired.set()
+        done, _ = await asyncio.wait({everything}, timeout=self.requeue)
+        if not done:
+            logger.error(f"[shutdown] jobs still running after re-queue window: {self.active()}")
+            error_aggregator.record_event("ShutdownOverrun", "utils/shutdown.py drain",
+                                          f"still running {self.grace + self.requeue:.0f}s after SIGTERM: {self.active() or 'queued updates'}")
+        return False
+
+
+shutdown = ShutdownCoordinator(grace=settings.SHUTDOWN_GRACE_SECONDS, requeue=settings.SHUTDOWN_REQUEUE_SECONDS)
@@ -0,0 +1,170 @@
+# utils/singleflight.py
+"""
+Request coalescing for async read methods.
+
+    @single_flight(reads=("styles",))             # share identical concurrent calls
+    @single_flight(reads=("styles",), ttl=1.0)    # ...and reuse the result for one second
+
+Concurrent calls with the same arguments on the same object await one
+execution. Every caller gets its own copy of dict/list results, so callers
+that modify their result do not affect each other.
+
+A read must never return data older than a write the same process already
+finished. Reads name the tables they depend on, writes the tables they
+change, and a read's key includes a write epoch per table: after a write,
+new reads of that table start a fresh query instead of joining one that
+may predate the write. With `per_user=True` the first argument is a user
+id. A per-user read is only invalidated by writes for the same user, or
+by writes that do not say which user they touch:
+
+    @single_flight(reads=("users",), per_user=True)
+    async def get_user(self, user_id): ...
+
+    @invalidates_flights("users", per_user=True)    # bumps users and (users, user_id)
+    async def add_credits(self, user_id, amount, transaction_type): ...
+
+    @invalidates_flights("payments", "users")       # bumps every reader of both
+    async def approve_payment(self, payment_id, admin_id): ...
+
+`@invalidates_flights()` without tables invalidates every read.
+"""
+import asyncio
+import functools
+import itertools
+import time
+from typing import Any, Dict, Hashable, Tuple
+
+from utils.metrics import Counter
+
+SINGLE_FLIGHT_CALLS = Counter(
+    "flexa_db_singleflight_total",
+    "Coalesced read calls by outcome (executed, coalesced, cached)",
+    ["method", "outcome"],
+)
+
+_EPOCHS_ATTR = "_flight_epochs"
+# key for writes that do not name a user, and for "everything"
+_ANY_USER = object()
+_ALL = object()
+# per-user epochs are dropped past this many; dropping them invalidates everything
+MAX_EPOCHS = 100_000
+_next_epoch = itertools.count(1)
+
+
+def _copy(value: Any) -> Any:
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_copy(v) for v in value)
+    return value
+
+
+def _epochs(obj) -> Dict[Hashable, int]:
+    epochs = obj.__dict__.get(_EPOCHS_ATTR)
+    if epochs is None:
+        epochs = {}
+        setattr(obj, _EPOCHS_ATTR, epochs)
+    return epochs
+
+
+def invalidate_flights(obj, tables: Tuple[str, ...] = (), user_id: Any = _ANY_USER) -> None:
+    epochs = _epochs(obj)
+    if len(epochs) >= MAX_EPOCHS:
+        epochs.clear()
+        tables = ()
+    if not tables:
+        epochs[_ALL] = next(_next_epoch)
+    for table in tables:
+        # epochs only ever grow (one global counter), so a dropped entry never repeats an old key
+        epochs[table] = epochs[(table, user_id)] = next(_next_epoch)
+
+
+def invalidates_flights(*tables: str, per_user: bool = False):
+    """Mark a write method: reads of `tables` issued after it returns never join older flights."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(self, *args, **kwargs):
+            try:
+                return await fn(self, *args, **kwargs)
+            finally:
+                invalidate_flights(self, tables, args[0] if per_user and args else _ANY_USER)
+        return wrapper
+    return decorator
+
+
+def _read_epochs(obj, tables: Tuple[str, ...], user_id: Any) -> Tuple[int, ...]:
+    epochs = obj.__dict__.get(_EPOCHS_ATTR)
+    if not epochs:
+        return ()
+    if user_id is _ANY_USER:
+        return (epochs.get(_ALL, 0),) + tuple(epochs.get(t, 0) for t in tables)
+    return (epochs.get(_ALL, 0),) + tuple(
+        max(epochs.get((t, _ANY_USER), 0), epochs.get((t, user_id), 0)) for t in tables
+    )
+
+
+def single_flight(reads: Tuple[str, ...] = (), per_user: bool = False, ttl: float = 0.0, max_entries: int = 10_000):
+    def decorator(fn):
+        method = fn.__name__
+        executed = SINGLE_FLIGHT_CALLS.labels(method, "executed")
+        coalesced = SINGLE_FLIGHT_CALLS.labels(method, "coalesced")
+        cached = SINGLE_FLIGHT_CALLS.labels(method, "cached")
+        inflight: Dict[Tuple, asyncio.Future] = {}
+        results: Dict[Tuple, Tuple[float, Any]] = {}
+
+        @functools.wraps(fn)
+        async def wrapper(self, *args, **kwargs):
+            epochs = _read_epochs(self, reads, args[0] if per_user and args else _ANY_USER)
+            key = (self, epochs, args, tuple(sorted(kwargs.items())) if kwargs else ())
+            try:
+                hash(key)
+            except TypeError:
+                executed.inc()
+                return await fn(self, *args, **kwargs)
+
+            if ttl:
+                hit = results.get(key)
+                if hit is not None:
+                    if hit[0] > time.monotonic():
+                        cached.inc()
+                        return _copy(hit[1])
+                    del results[key]
+
+            future = inflight.get(key)
+            if future is not None:
+                coalesced.inc()
+                try:
+                    return _copy(await asyncio.shield(future))
+                except asyncio.CancelledError:
+                    if not future.cancelled():
+                        raise
+                    # the leading caller was cancelled, not us: run the query ourselves
+
+            future = asyncio.get_running_loop().create_future()
+            inflight[key] = future
+            executed.inc()
+            try:
+                result = await fn(self, *args, **kwargs)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                future.exception()  # retrieved: no "never retrieved" warning if nobody joined
+                raise
+            finally:
+                if inflight.get(key) is future:
+                    del inflight[key]
+
+            # `result` itself stays private to the future and cache; every caller gets a copy
+            future.set_result(result)
+            if ttl:
+                if len(results) >= max_entries:
+                    results.clear()
+                results[key] = (time.monotonic() + ttl, result)
+            return _copy(result)
+
+        return wrapper
+    return decorator
@@ -0,0 +1,137 @@
+# utils/supervisor.py
+"""
+Startup phases and long-lived background tasks.
+
+    await supervisor.run_phases([
+        Phase("database", db.connect, timeout=30),
+        Phase("commands", set_commands, timeout=20, required=False),
+    ])
+    supervisor.supervise("error_digest", lambda: error_aggregator.run(bot))
+
+Phases run in order, each under its own timeout. A failing required phase
+raises StartupError, so the process exits instead of serving traffic half
+initialised. An optional phase is logged and skipped.
+
+Supervised tasks are restarted when they crash, with exponential backoff
+(reset once a run stays up for `healthy_after` seconds). A task that returns
+normally is considered finished. `status()` feeds readiness, and `stop()`
+cancels everything at shutdown.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from utils.error_reporter import error_aggregator
+from utils.logger import logger
+
+
+class StartupError(Exception):
+    pass
+
+
+@dataclass
+class Phase:
+    name: str
+    run: Callable[[], Any]
+    timeout: float = 30.0
+    required: bool = True
+
+
+@dataclass
+class _TaskState:
+    name: str
+    factory: Callable[[], Awaitable[Any]]
+    state: str = "starting"
+    restarts: int = 0
+    last_error: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+    task: Optional[asyncio.Task] = None
+
+
+class Supervisor:
+    def __init__(self, initial_backoff: float = 1.0, max_backoff: float = 60.0, healthy_after: float = 60.0):
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.healthy_after = healthy_after
+        self.phases: Dict[str, Dict[str, Any]] = {}
+        self.started = False
+        self._tasks: Dict[str, _TaskState] = {}
+
+    async def run_phases(self, phases: List[Phase]) -> None:
+        for phase in phases:
+            started = time.perf_counter()
+            try:
+                result = phase.run()
+                if asyncio.iscoroutine(result):
+                    await asyncio.wait_for(result, phase.timeout)
+            except Exception as e:
+                elapsed = time.perf_counter() - started
+                error = "timed out" if isinstance(e, asyncio.TimeoutError) else f"{type(e).__name__}: {e}"
+                self.phases[phase.name] = {"ok": False, "ms": round(elapsed * 1000), "error": error[:200]}
+                if phase.required:
+                    logger.error(f"[startup] phase {phase.name} failed after {elapsed:.1f}s: {error}")
+                    raise StartupError(f"startup phase {phase.name} failed: {error}") from e
+                logger.warning(f"[startup] optional phase {phase.name} failed after {elapsed:.1f}s: {error}")
+                continue
+            elapsed = time.perf_counter() - started
+            self.phases[phase.name] = {"ok": True, "ms": round(elapsed * 1000)}
+            logger.info(f"[startup] {phase.name} done in {elapsed * 1000:.0f} ms")
+        self.started = True
+
+    def supervise(self, name: str, factory: Callable[[], Awaitable[Any]]) -> None:
+        """Run `factory()` as a long-lived task, restarting it with backoff when it raises."""
+        if name in self._tasks and self._tasks[name].task and not self._tasks[name].task.done():
+            return
+        state = _TaskState(name=name, factory=factory)
+        state.task = asyncio.create_task(self._keep_running(state), name=f"supervised:{name}")
+        self._tasks[name] = state
+
+    async def _keep_running(self, state: _TaskState) -> None:
+        backoff = self.initial_backoff
+        while True:
+            state.state = "running"
+            state.started_at = time.time()
+            try:
+                await state.factory()
+            except asyncio.CancelledError:
+                state.state = "stopped"
+                raise
+            except Exception as e:
+                state.last_error = f"{type(e).__name__}: {e}"[:300]
+                if time.time() - state.started_at >= self.healthy_after:
+                    backoff = self.initial_backoff
+                state.restarts += 1
+                state.state = "backoff"
+                logger.exception(f"[supervisor] task {state.name} crashed, restart #{state.restarts} in {backoff:.0f}s")
+                error_aggregator.record(e)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            state.state = "finished"
+            logger.info(f"[supervisor] task {state.name} finished")
+            return
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "started": self.started,
+            "phases": self.phases,
+            "tasks": {
+                name: {
+                    "state": s.state,
+                    "restarts": s.restarts,
+                    "last_error": s.last_error,
+                    "up_s": round(time.time() - s.started_at) if s.state == "running" else 0,
+                }
+                for name, s in self._tasks.items()
+            },
+        }
+
+    async def stop(self) -> None:
+        tasks = [s.task for s in self._tasks.values() if s.task and not s.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+supervisor = Supervisor()
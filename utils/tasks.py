@@ -3,6 +3,7 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 import app_context
 from app_context.context import AppContext
 from utils.logger import logger
+from utils.outbound import outbound
 
 ADMIN_MANUAL_GROUP_ID = int(os.getenv("ADMIN_MANUAL_GROUP_ID", "-5084517269"))
 
@@ -18,7 +19,13 @@ def build_manual_task_keyboard(task_id: str) -> InlineKeyboardMarkup:
         ],
     ])
 
-async def notify_admin_manual_queue(bot, gen, user, style, app_context: AppContext):
+# Admin notifiers return at once: the group's 19 msg/min pacing happens in the
+# background (outbound.submit), not in the handler that triggered the notice.
+def notify_admin_manual_queue(bot, gen, user, style, app_context: AppContext) -> None:
+    outbound.submit(lambda: _send_manual_queue_alert(bot, gen, user, style, app_context), kind="manual_queue")
+
+
+async def _send_manual_queue_alert(bot, gen, user, style, app_context: AppContext):
     queue_count = await app_context.db.get_stats() 
     manual_queue_total = queue_count['manual_queue']
     caption = (
@@ -68,7 +75,11 @@ def build_payment_keyboard(payment_id: str) -> InlineKeyboardMarkup:
     ])
     
     
-async def notify_admins_new_payment(bot, payment_id: str, payment: dict, user: dict, ocr_data: dict):
+def notify_admins_new_payment(bot, payment_id: str, payment: dict, user: dict, ocr_data: dict) -> None:
+    outbound.submit(lambda: _send_new_payment(bot, payment_id, payment, user, ocr_data), kind="new_payment")
+
+
+async def _send_new_payment(bot, payment_id: str, payment: dict, user: dict, ocr_data: dict):
     caption = (
         f"💳 <b>New Payment #{payment_id[:8]}</b>\n\n"
         f"👤 User: <b>{user['first_name']}</b> (@{user.get('username','—')})\n"
@@ -108,7 +119,11 @@ async def notify_admins_new_payment(bot, payment_id: str, payment: dict, user: d
 
 ADMIN_NEWUSER_GROUP_ID = int(os.getenv("ADMIN_NEWUSER_GROUP_ID", "-5164704172"))
 
-async def notify_admins_new_user(bot, user: dict):
+def notify_admins_new_user(bot, user: dict) -> None:
+    outbound.submit(lambda: _send_new_user(bot, user), kind="new_user")
+
+
+async def _send_new_user(bot, user: dict):
     username = user.get('username', 'N/A')
     caption = (
         f"👋 <b>New User Joined</b>\n\n"
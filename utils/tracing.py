@@ -0,0 +1,256 @@
+# utils/tracing.py
+"""
+Lightweight per-update tracing.
+
+A root span is opened for every update (middlewares/tracing_middleware.py);
+Database methods, Bot API requests, image generation and OCR open child
+spans through `tracer.span(...)` / `@traced(...)`. The active span lives in a
+ContextVar, so nothing has to be passed around.
+
+Sampling is decided when the root span ends: a trace is kept when it was
+picked by TRACE_SAMPLE_RATE, or when it failed or took longer than
+TRACE_SLOW_MS. Kept traces are queued and written in batches by `run()`,
+either as JSON lines to a file or as OTLP/JSON to an HTTP collector.
+Outside a trace `span()` costs one ContextVar lookup.
+"""
+import asyncio
+import functools
+import json
+import os
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional
+
+import aiohttp
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+from config.settings import settings
+from utils.logger import logger
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start", "end", "attributes", "error")
+
+    def __init__(self, trace: "_Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.end = 0.0
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end - self.start) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _Trace:
+    __slots__ = ("trace_id", "spans", "finished", "max_spans")
+
+    def __init__(self, max_spans: int):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List[Span] = []
+        self.finished = False
+        self.max_spans = max_spans
+
+
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class JsonlExporter:
+    def __init__(self, path: str):
+        self.path = path
+
+    def _write(self, lines: List[str]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    async def export(self, traces: List[List[Span]]) -> None:
+        lines = [json.dumps(s.to_dict(), default=str, ensure_ascii=False) for spans in traces for s in spans]
+        await asyncio.get_running_loop().run_in_executor(None, self._write, lines)
+
+
+class OtlpHttpExporter:
+    """POSTs OTLP/JSON (`/v1/traces` shape) to a collector."""
+
+    def __init__(self, endpoint: str, service_name: str = "flexa-ai-bot", timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @staticmethod
+    def _attribute(key: str, value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    def _span(self, span: Span) -> Dict[str, Any]:
+        body = {
+            "traceId": span.trace.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(int(span.start * 1e9)),
+            "endTimeUnixNano": str(int(span.end * 1e9)),
+            "attributes": [self._attribute(k, v) for k, v in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            body["parentSpanId"] = span.parent_id
+        return body
+
+    async def export(self, traces: List[List[Span]]) -> None:
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [self._attribute("service.name", self.service_name)]},
+            "scopeSpans": [{"scope": {"name": "flexa.tracing"}, "spans": [self._span(s) for spans in traces for s in spans]}],
+        }]}
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        async with self._session.post(self.endpoint, json=payload) as response:
+            if response.status >= 300:
+                raise RuntimeError(f"collector returned {response.status}")
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+
+class Tracer:
+    def __init__(self, exporter=None, sample_rate: float = 0.01, slow_ms: float = 1000.0,
+                 max_queue: int = 2000, max_spans_per_trace: int = 200, flush_interval: float = 5.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.max_spans_per_trace = max_spans_per_trace
+        self.flush_interval = flush_interval
+        self._queue: Deque[List[Span]] = deque(maxlen=max_queue)
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    @contextmanager
+    def trace(self, name: str, **attributes):
+        """Open a root span; the trace is exported when it closes (if sampled)."""
+        if not self.enabled:
+            yield None
+            return
+        root = Span(_Trace(self.max_spans_per_trace), name, None, attributes)
+        root.trace.spans.append(root)
+        token = current_span.set(root)
+        try:
+            yield root
+        except BaseException as e:
+            root.error = f"{type(e).__name__}: {e}"[:300]
+            raise
+        finally:
+            current_span.reset(token)
+            root.end = time.time()
+            root.trace.finished = True
+            if (
+                root.error
+                or root.duration_ms >= self.slow_ms
+                or any(s.error for s in root.trace.spans)
+                or random.random() < self.sample_rate
+            ):
+                self._queue.append(root.trace.spans)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        parent = current_span.get()
+        if parent is None or parent.trace.finished or len(parent.trace.spans) >= parent.trace.max_spans:
+            yield None
+            return
+        span = Span(parent.trace, name, parent.span_id, attributes)
+        parent.trace.spans.append(span)
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"[:300]
+            raise
+        finally:
+            current_span.reset(token)
+            span.end = time.time()
+
+    def pending(self) -> int:
+        return len(self._queue)
+
+    async def flush(self) -> None:
+        if not self._queue or not self.enabled:
+            return
+        batch = list(self._queue)
+        self._queue.clear()
+        try:
+            await self.exporter.export(batch)
+        except Exception as e:
+            logger.warning(f"[tracing] export of {len(batch)} trace(s) failed: {e}")
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def close(self) -> None:
+        await self.flush()
+        if hasattr(self.exporter, "close"):
+            await self.exporter.close()
+
+
+def traced(name: str):
+    """Decorator: run an async function inside a child span."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TracingRequestMiddleware(BaseRequestMiddleware):
+    """Bot session middleware: one span per Bot API call, including time queued for pacing."""
+
+    async def __call__(self, make_request, bot, method):
+        with tracer.span(f"bot.{method.__api_method__}", chat_id=getattr(method, "chat_id", None) or ""):
+            return await make_request(bot, method)
+
+
+def _build_exporter():
+    if settings.TRACING_EXPORTER == "jsonl":
+        return JsonlExporter(settings.TRACING_FILE)
+    if settings.TRACING_EXPORTER == "otlp":
+        return OtlpHttpExporter(settings.TRACING_ENDPOINT)
+    return None
+
+
+tracer = Tracer(
+    exporter=_build_exporter(),
+    sample_rate=settings.TRACE_SAMPLE_RATE,
+    slow_ms=settings.TRACE_SLOW_MS,
+)
@@ -0,0 +1,240 @@
+# utils/update_recorder.py
+"""
+Records a sample of incoming updates for replay (loadtest/replay.py).
+
+Sampling is per user: a user's updates are either all recorded or not at
+all, so replayed journeys stay complete. Each record is one JSON line:
+
+    {"t": <arrival, unix seconds>, "ms": <handling time>, "outcome": "ok"|"error",
+     "update": {...}, "admin": true}                      # admin only when set
+
+Updates are anonymized before they are written. User and chat ids become
+stable pseudonyms: a keyed hash with RECORD_SALT, so the same person keeps
+one id across the file, also where ids appear in callback data
+(user_view:<id>). Names and signatures are replaced. In free text and captions
+every character except whitespace becomes "x". Lengths stay the same, and
+commands and the bot's own button labels are kept. File ids are hashed,
+and contacts, locations and URLs are dropped.
+
+The event loop only serializes the update and puts it on a bounded queue.
+When the queue is full the record is dropped. A writer thread anonymizes
+the records and appends them in batches to gzip files. Each batch is its
+own gzip member, so a crash loses at most the last second of records. The
+file name goes through strftime, e.g. recordings/updates-%Y%m%d.jsonl.gz,
+which rotates the file daily.
+"""
+import gzip
+import hashlib
+import json
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from config.settings import settings
+from utils.logger import logger
+from utils.metrics import Counter
+
+RECORDED = Counter("flexa_recorded_updates_total", "Sampled updates, by what happened to them", ["result"])
+
+# pseudonymous ids live in a range no real Telegram account uses yet
+PSEUDONYM_BASE = 9_000_000_000_000
+BATCH_SIZE = 500
+BATCH_SECONDS = 1.0
+
+_DROPPED_KEYS = frozenset({"contact", "location", "venue", "url", "invite_link", "bio", "phone_number",
+                           "email", "vcard", "shipping_address", "order_info", "story"})
+_ID_KEYS = frozenset({"user_id", "chat_id", "sender_chat_id"})
+_TEXT_KEYS = frozenset({"text", "caption", "query", "quote"})
+_HASHED_KEYS = frozenset({"file_id", "file_unique_id", "chat_instance"})
+_CALLBACK_KEYS = frozenset({"data", "callback_data"})
+_NAME_KEYS = frozenset({"first_name", "forward_sender_name", "sender_user_name", "author_signature",
+                        "forward_signature"})
+_COMMAND = re.compile(r"^(/\w+(?:@\w+)?)(.*)$", re.S)
+# numeric callback_data segments this long are Telegram ids (user_view:<id>); shorter ones are pages, indexes
+_CALLBACK_ID = re.compile(r"(?<![\w-])-?\d{5,}(?![\w-])")
+
+
+class Anonymizer:
+    def __init__(self, salt: str, keep_texts: Iterable[str] = ()):
+        self._key = hashlib.sha256(salt.encode()).digest()
+        self.keep_texts = frozenset(keep_texts)
+
+    def _hash(self, value: Any) -> int:
+        digest = hashlib.blake2b(str(value).encode(), key=self._key, digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+
+    def fraction(self, value: Any) -> float:
+        """Stable number in [0, 1) for `value`; used to sample users."""
+        return self._hash(value) / 2 ** 64
+
+    def id(self, value: int) -> int:
+        pseudonym = PSEUDONYM_BASE + self._hash(abs(value)) % PSEUDONYM_BASE
+        return -pseudonym if value < 0 else pseudonym
+
+    def token(self, value: str) -> str:
+        return f"{self._hash(value):016x}"
+
+    def text(self, value: str) -> str:
+        if value in self.keep_texts:
+            return value
+        # same UTF-16 length, so entity offsets still fit
+        command = _COMMAND.match(value)
+        if command:
+            return command.group(1) + _blank(command.group(2))
+        return _blank(value)
+
+    def callback_data(self, value: str) -> str:
+        return _CALLBACK_ID.sub(lambda m: str(self.id(int(m.group(0)))), value)
+
+    def update(self, raw: Dict[str, Any]) -> Dict[str, Any]:
+        return self._walk(raw)
+
+    def _walk(self, value: Any) -> Any:
+        if isinstance(value, list):
+            return [self._walk(v) for v in value]
+        if not isinstance(value, dict):
+            return value
+        out = {}
+        # users and chats carry an "id" next to is_bot/type; messages use message_id
+        is_account = isinstance(value.get("id"), int) and ("is_bot" in value or "type" in value)
+        for key, item in value.items():
+            if key in _DROPPED_KEYS:
+                continue
+            if key == "id" and is_account and not value.get("is_bot"):
+                out[key] = self.id(item)
+            elif key in _ID_KEYS and isinstance(item, int):
+                out[key] = self.id(item)
+            elif key in _TEXT_KEYS and isinstance(item, str):
+                out[key] = self.text(item)
+            elif key in _HASHED_KEYS and isinstance(item, str):
+                out[key] = self.token(item)
+            elif key in _CALLBACK_KEYS and isinstance(item, str):
+                out[key] = self.callback_data(item)
+            elif key in _NAME_KEYS:
+                out[key] = "User"
+            elif key == "title":
+                out[key] = "Chat"
+            elif key == "username" and not value.get("is_bot"):
+                out[key] = f"u{self.token(item)[:10]}"
+            elif key == "last_name":
+                continue
+            else:
+                out[key] = self._walk(item)
+        return out
+
+
+def _blank(text: str) -> str:
+    # whitespace stays, so commands keep their arguments apart
+    return "".join(c if c.isspace() else "xx" if ord(c) > 0xFFFF else "x" for c in text)
+
+
+def _button_labels() -> List[str]:
+    from utils.i18n import catalog
+    return [label for by_lang in catalog.buttons.values() for label in by_lang.values()]
+
+
+class UpdateRecorder:
+    def __init__(self, path: str, sample_rate: float, salt: str = "", queue_size: int = 10000):
+        self.path = path
+        self.sample_rate = sample_rate
+        # without a configured salt pseudonyms change on every restart
+        self.anonymizer = Anonymizer(salt or secrets.token_hex(16))
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path) and self.sample_rate > 0
+
+    def sampled(self, key: Any) -> bool:
+        return self.enabled and self.anonymizer.fraction(key) < self.sample_rate
+
+    def submit(self, raw_update: Dict[str, Any], user_id: Optional[int], arrived: float,
+               handling_ms: float, outcome: str) -> None:
+        """Called on the event loop: never blocks, drops the record when the writer is behind."""
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait((raw_update, user_id, arrived, handling_ms, outcome))
+        except queue.Full:
+            RECORDED.labels("dropped").inc()
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="update-recorder", daemon=True)
+                self._thread.start()
+
+    # --- writer thread ---
+    def _record(self, raw_update, user_id, arrived, handling_ms, outcome) -> str:
+        record = {"t": round(arrived, 4), "ms": round(handling_ms, 2), "outcome": outcome,
+                  "update": self.anonymizer.update(raw_update)}
+        if user_id is not None and settings.is_admin(user_id):
+            record["admin"] = True
+        return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+
+    def _write(self, lines: List[str]) -> None:
+        path = datetime.now(timezone.utc).strftime(self.path)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "ab") as f:
+            f.write(gzip.compress(("\n".join(lines) + "\n").encode()))
+
+    def _run(self) -> None:
+        # loaded here, off the loop: labels are only needed once records are written
+        self.anonymizer.keep_texts = frozenset(_button_labels())
+        stopping = False
+        while not stopping:
+            lines: List[str] = []
+            deadline = time.monotonic() + BATCH_SECONDS
+            while len(lines) < BATCH_SIZE:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                try:
+                    lines.append(self._record(*item))
+                except Exception:
+                    RECORDED.labels("failed").inc()
+                    logger.exception("[recorder] could not anonymize an update")
+            if not lines:
+                continue
+            try:
+                self._write(lines)
+                RECORDED.labels("written").inc(len(lines))
+            except Exception:
+                RECORDED.labels("failed").inc(len(lines))
+                logger.exception("[recorder] could not write recorded updates")
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Write what is queued and stop the writer; blocking, run it off the loop."""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+
+def read_recording(paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Records from recorded files, file by file. A truncated last batch (crash) ends its file."""
+    for path in paths:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+            except (EOFError, gzip.BadGzipFile, json.JSONDecodeError):
+                logger.warning(f"[recorder] {path} ends in an incomplete batch; later records skipped")
+
+
+update_recorder = UpdateRecorder(settings.RECORD_UPDATES_FILE, settings.RECORD_SAMPLE_RATE, settings.RECORD_SALT)
@@ -0,0 +1,216 @@
+# utils/webhook.py
+"""
+Webhook handler that answers Telegram at once and processes updates in a
+bounded worker pool.
+
+aiogram's background mode starts one unbounded task per update. Under a
+burst, every slow handler (downloads, OCR, generation) runs at the same
+time and competes for the DB pool. Here accepted updates go into a queue of
+WEBHOOK_QUEUE_SIZE, and WEBHOOK_MAX_IN_FLIGHT workers process it. When the
+queue is full, the overflow policy decides what happens:
+
+- "wait":   hold the HTTP request up to WEBHOOK_OVERFLOW_TIMEOUT for room,
+            then answer 503
+- "reject": answer 503 immediately
+
+Telegram redelivers updates answered with an error, so an update is either
+queued or still Telegram's responsibility. Once answered 200 it is ours: on
+shutdown the handler stops accepting (503) and keeps working through the
+queue for the grace period. After that it starts no new updates, and
+`stop()` hands back the ones that never started. bot.py stores them with
+`db.defer_updates`, and `replay_deferred` on a running instance feeds them
+back into its queue.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Set, Tuple
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+
+from utils.error_reporter import error_aggregator
+from utils.logger import logger
+from utils.metrics import Counter, Gauge, Histogram
+
+WEBHOOK_QUEUE_DEPTH = Gauge("flexa_webhook_queue_depth", "Accepted updates waiting for a worker")
+WEBHOOK_IN_FLIGHT = Gauge("flexa_webhook_in_flight", "Updates being processed by webhook workers")
+WEBHOOK_QUEUE_WAIT = Histogram("flexa_webhook_queue_wait_seconds", "Time from acceptance to processing start")
+WEBHOOK_REJECTED = Counter("flexa_webhook_rejected_total", "Webhook requests answered 503 (400 without update_id), by reason", ["reason"])
+WEBHOOK_DEFERRED = Counter("flexa_webhook_deferred_total", "Accepted updates handed over at shutdown or replayed, by direction", ["direction"])
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        max_in_flight: int = 32,
+        queue_size: int = 500,
+        overflow: str = "wait",
+        overflow_timeout: float = 5.0,
+        drain_timeout: float = 25.0,
+        **data: Any,
+    ) -> None:
+        super().__init__(dispatcher=dispatcher, bot=bot, handle_in_background=True, **data)
+        if overflow not in ("wait", "reject"):
+            raise ValueError(f"Unknown webhook overflow policy: {overflow}")
+        self.max_in_flight = max_in_flight
+        self.overflow = overflow
+        self.overflow_timeout = overflow_timeout
+        self.drain_timeout = drain_timeout
+        self.accepting = True
+        # set once the shutdown grace period is over: queued updates are no longer started
+        self.paused = False
+        self._queue: asyncio.Queue[Tuple[Bot, Dict[str, Any], float]] = asyncio.Queue(maxsize=queue_size)
+        # accepted but not started, and started but not finished, by update_id
+        self._waiting: Dict[int, Dict[str, Any]] = {}
+        self._running: Set[int] = set()
+        self._workers: List[asyncio.Task] = []
+        WEBHOOK_QUEUE_DEPTH.set_function(lambda: len(self._waiting))
+        WEBHOOK_IN_FLIGHT.set_function(lambda: len(self._running))
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._running)
+
+    def queue_depth(self) -> int:
+        return len(self._waiting)
+
+    def _start_workers(self) -> None:
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_in_flight)]
+
+    async def _worker(self) -> None:
+        while True:
+            bot, update, accepted_at = await self._queue.get()
+            update_id = update.get("update_id")
+            try:
+                # paused: the update stays in _waiting and stop() hands it over
+                if self.paused or self._waiting.pop(update_id, None) is None:
+                    continue
+                WEBHOOK_QUEUE_WAIT.observe(time.monotonic() - accepted_at)
+                self._running.add(update_id)
+                try:
+                    await self._background_feed_update(bot=bot, update=update)
+                except Exception:
+                    logger.exception(f"[webhook] processing update {update_id} failed")
+                finally:
+                    self._running.discard(update_id)
+            finally:
+                self._queue.task_done()
+
+    def _busy(self, reason: str, text: str) -> web.Response:
+        WEBHOOK_REJECTED.labels(reason).inc()
+        return web.Response(status=503, text=text, headers={"Retry-After": "5"})
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        if not self.accepting:
+            return self._busy("draining", "Shutting down")
+        update = await request.json(loads=bot.session.json_loads)
+        update_id = update.get("update_id")
+        # update_ids key the dedupe and the shutdown hand-over; Telegram always sends one
+        if not isinstance(update_id, int):
+            WEBHOOK_REJECTED.labels("no_update_id").inc()
+            return web.Response(status=400, text="update_id required")
+        # Telegram redelivers an update whose answer it did not see, also one still being processed
+        if update_id in self._waiting or update_id in self._running:
+            return web.json_response({}, dumps=bot.session.json_dumps)
+        item = (bot, update, time.monotonic())
+        self._start_workers()
+        # registered before it is queued: a worker only starts updates it finds here
+        self._waiting[update_id] = update
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            if self.overflow == "reject":
+                del self._waiting[update_id]
+                return self._busy("queue_full", "Busy")
+            try:
+                # Queue.put is cancellation safe: on timeout the update is not enqueued
+                await asyncio.wait_for(self._queue.put(item), self.overflow_timeout)
+            except asyncio.TimeoutError:
+                self._waiting.pop(update_id, None)
+                logger.warning(f"[webhook] queue full for {self.overflow_timeout}s, update {update_id} left to redelivery")
+                return self._busy("queue_full", "Busy")
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def replay_deferred(self, bot: Bot, take: Callable[[int], Awaitable[List[Dict[str, Any]]]],
+                              interval: float = 30.0) -> None:
+        """
+        Supervised task: queue updates that a stopping instance deferred (`take` is
+        db.take_deferred_updates). Polls, because during a rolling deploy the old
+        instance defers its updates after this one has started.
+        """
+        while True:
+            room = self._queue.maxsize - self._queue.qsize()
+            if self.accepting and room > 0:
+                updates = await take(room)
+                if updates:
+                    self._start_workers()
+                    for update in updates:
+                        if update["update_id"] not in self._waiting and update["update_id"] not in self._running:
+                            self._waiting[update["update_id"]] = update
+                            self._queue.put_nowait((bot, update, time.monotonic()))
+                    WEBHOOK_DEFERRED.labels("replayed").inc(len(updates))
+                    logger.info(f"[webhook] replaying {len(updates)} deferred update(s): {[u.get('update_id') for u in updates][:20]}")
+            await asyncio.sleep(interval)
+
+    async def join(self) -> None:
+        """Wait until every accepted update has been processed (or, once paused, set aside)."""
+        if self._workers:
+            await self._queue.join()
+
+    async def drain(self, grace: float) -> None:
+        """
+        Stop accepting and keep processing queued updates for up to `grace` seconds.
+        Then start no new ones and wait for the running ones to finish.
+        """
+        self.accepting = False
+        if not self._workers:
+            return
+        if self._waiting or self._running:
+            logger.info(f"[webhook] draining {len(self._waiting)} queued and {len(self._running)} running update(s)")
+        try:
+            await asyncio.wait_for(self.join(), grace)
+        except asyncio.TimeoutError:
+            logger.warning(f"[webhook] grace period of {grace}s over, {len(self._waiting)} queued update(s) not started")
+        self.paused = True
+        await self.join()
+
+    async def stop(self, timeout: float = 3.0) -> List[Dict[str, Any]]:
+        """
+        Stop the workers and return the accepted updates that never started,
+        oldest first; the caller must store them or they are lost. Updates
+        still running are cancelled and reported in the error digest; their
+        handlers get `timeout` seconds to hand their work over (a generation
+        goes to the manual queue).
+        """
+        self.accepting = False
+        self.paused = True
+        running = sorted(self._running)
+        if running:
+            logger.error(f"[webhook] cancelling {len(running)} running update(s): {running[:20]}")
+            error_aggregator.record_event("UpdateCancelled", "utils/webhook.py stop",
+                                          f"{len(running)} update(s) cancelled at shutdown: {running[:20]}")
+        for worker in self._workers:
+            worker.cancel()
+        if self._workers:
+            _, stuck = await asyncio.wait(self._workers, timeout=timeout)
+            if stuck:
+                logger.error(f"[webhook] {len(self._running)} cancelled update(s) still busy after {timeout}s: {sorted(self._running)[:20]}")
+        self._workers = []
+        unstarted = [self._waiting[update_id] for update_id in sorted(self._waiting)]
+        self._waiting.clear()
+        if unstarted:
+            WEBHOOK_DEFERRED.labels("deferred").inc(len(unstarted))
+        return unstarted
+
+    async def close(self) -> None:
+        # on_shutdown hook; bot.on_shutdown normally drained and stopped the workers already
+        if self._workers:
+            await self.drain(self.drain_timeout)
+            lost = [u.get("update_id") for u in await self.stop()]
+            if lost:
+                logger.error(f"[webhook] {len(lost)} accepted update(s) not processed: {lost[:20]}")
+        await super().close()